@@ -0,0 +1,108 @@
+"""
+Analytics Module for Quiz System
+Per-quiz running aggregates over the stored attempts: attempt count, score
+sum and sum of squares, and per question the answer, correct and per-choice
+selection counts. Aggregates are updated incrementally as attempts are
+saved, so a report costs O(questions) instead of a scan of every attempt.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+
+def new_quiz_stats(quiz_id: str) -> Dict:
+    """Create empty aggregates for a quiz"""
+    return {
+        'id': quiz_id,
+        'attempts': 0,
+        'score_sum': 0,
+        'score_sq_sum': 0,
+        'questions': {},
+    }
+
+
+def add_attempt(stats: Dict, attempt: Dict, sign: int = 1):
+    """Add an attempt to the aggregates of its quiz (sign=-1 removes it again)"""
+    score = attempt.get('score') or 0
+    stats['attempts'] += sign
+    stats['score_sum'] += sign * score
+    stats['score_sq_sum'] += sign * score * score
+    
+    for answer in attempt.get('answers', []):
+        question = stats['questions'].setdefault(
+            answer['question_id'], {'answers': 0, 'correct': 0, 'points_earned': 0, 'choices': {}})
+        question['answers'] += sign
+        question['correct'] += sign if answer.get('is_correct') else 0
+        question['points_earned'] += sign * (answer.get('points_earned') or 0)
+        
+        user_answer = answer.get('user_answer') or {}
+        choices = question['choices']
+        for choice_id in user_answer.get('selected_choices', []):
+            choices[choice_id] = choices.get(choice_id, 0) + sign
+
+
+def build_stats(attempts: Iterable[Dict]) -> Dict[str, Dict]:
+    """Build the aggregates of every quiz from scratch"""
+    stats = {}
+    for attempt in attempts:
+        quiz_id = attempt.get('quiz_id')
+        if quiz_id not in stats:
+            stats[quiz_id] = new_quiz_stats(quiz_id)
+        add_attempt(stats[quiz_id], attempt)
+    return stats
+
+
+def summarize(stats: Optional[Dict], quiz: Dict, questions: List[Dict]) -> Dict:
+    """
+    Turn the aggregates of a quiz into a report: mean score and standard
+    deviation, and per question (in quiz order) its difficulty (p-value,
+    the share of correct answers) and how often each choice was picked.
+    """
+    stats = stats or new_quiz_stats(quiz['id'])
+    count = stats['attempts']
+    mean = stats['score_sum'] / count if count else None
+    std_dev = None
+    if count:
+        # Clamp rounding noise below zero
+        std_dev = math.sqrt(max(stats['score_sq_sum'] / count - mean * mean, 0))
+    
+    questions_by_id = {question['id']: question for question in questions}
+    report_questions = []
+    for q in quiz.get('questions', []):
+        question_id = q.get('id') or q.get('question_id')
+        question_data = questions_by_id.get(question_id)
+        if question_data is None:
+            continue
+        
+        question_stats = stats['questions'].get(question_id, {})
+        answers = question_stats.get('answers', 0)
+        selections = question_stats.get('choices', {})
+        report_questions.append({
+            'id': question_id,
+            'question_text': question_data.get('question_text', ''),
+            'question_type': question_data.get('question_type'),
+            'points': q.get('points', 1),
+            'answers': answers,
+            'correct': question_stats.get('correct', 0),
+            'p_value': question_stats.get('correct', 0) / answers if answers else None,
+            'mean_points': question_stats.get('points_earned', 0) / answers if answers else None,
+            'choices': [
+                {
+                    'id': choice['id'],
+                    'option_text': choice.get('option_text', ''),
+                    'is_correct': choice.get('is_correct', False),
+                    'selected': selections.get(choice['id'], 0),
+                    'rate': selections.get(choice['id'], 0) / answers if answers else None,
+                }
+                for choice in question_data.get('choices', [])
+            ],
+        })
+    
+    return {
+        'quiz_id': quiz['id'],
+        'title': quiz.get('title', ''),
+        'attempts': count,
+        'mean_score': mean,
+        'std_dev': std_dev,
+        'questions': report_questions,
+    }
@@ -1,6 +1,41 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuizAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz_app'
+    
+    def ready(self):
+        """
+        Preload the hot subjects (QUIZ_WARM_UP_SUBJECTS) in the background,
+        and start the submission worker when submissions are queued
+        """
+        if not self.serves_requests():
+            return
+        
+        subjects = getattr(settings, 'QUIZ_WARM_UP_SUBJECTS', [])
+        if subjects:
+            from .storage import warm_up
+            threading.Thread(target=warm_up, args=(subjects,), name='quiz-storage-warm-up', daemon=True).start()
+        
+        if getattr(settings, 'QUIZ_SUBMISSION_QUEUE', False):
+            # Submissions queued before a restart are saved without waiting for a new one
+            from .submissions import get_queue, start_worker
+            start_worker(get_queue())
+    
+    @staticmethod
+    def serves_requests() -> bool:
+        """
+        Whether this process serves requests: runserver's serving process, or
+        a WSGI/ASGI server that loaded quiz_system/wsgi.py or asgi.py (they
+        set QUIZ_SERVER_PROCESS). Management commands, scripts and tests don't.
+        """
+        if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] == ['runserver']:
+            # With autoreload the requests are served by the child process
+            return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
+        return os.environ.get('QUIZ_SERVER_PROCESS') == '1'
@@ -0,0 +1,96 @@
+"""
+Catalog Module for Quiz System
+Manifests summarizing a subject's data (record counts, questions per type
+and per category, last modification times and the most recent attempts)
+and their aggregation into one cross-subject view. Storages keep each
+subject's manifest up to date as records are saved, so dashboards read one
+small record per subject instead of parsing every subject's files.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COLLECTIONS = ('questions', 'quizzes', 'categories', 'attempts')
+RECENT_ATTEMPTS = 5
+
+
+def latest_timestamp(records: Iterable[Dict], *fields: str) -> Optional[str]:
+    """Get the latest ISO timestamp found in the given fields of the records"""
+    latest = None
+    for record in records:
+        for field in fields:
+            value = record.get(field)
+            if value and (latest is None or value > latest):
+                latest = value
+    return latest
+
+
+def group_counts(groups: Dict[Optional[str], List]) -> Dict[str, int]:
+    """Count the records of each non-empty group (records without a value count under '')"""
+    return {key or '': len(records) for key, records in groups.items() if records}
+
+
+def recent_attempt(attempt: Dict, quiz_title: Optional[str]) -> Dict:
+    """Get the fields of an attempt shown in recent activity"""
+    return {
+        'id': attempt['id'],
+        'quiz_id': attempt.get('quiz_id'),
+        'quiz_title': quiz_title if quiz_title is not None else 'Deleted quiz',
+        'score': attempt.get('score'),
+        'completed_at': attempt.get('completed_at') or attempt.get('started_at'),
+    }
+
+
+def add_recent_attempt(recent: List[Dict], attempt: Dict, quiz_title: Optional[str]) -> List[Dict]:
+    """Get the recent attempts list with a saved attempt added (or replaced)"""
+    entry = recent_attempt(attempt, quiz_title)
+    recent = [a for a in recent if a['id'] != entry['id']] + [entry]
+    recent.sort(key=lambda a: a['completed_at'] or '', reverse=True)
+    return recent[:RECENT_ATTEMPTS]
+
+
+def latest_attempts(attempts: Iterable[Dict], quiz_titles: Dict[str, str]) -> List[Dict]:
+    """Get the most recently completed attempts for a manifest built from scratch"""
+    recent = sorted(attempts, key=lambda a: a.get('completed_at') or a.get('started_at') or '', reverse=True)
+    return [recent_attempt(a, quiz_titles.get(a.get('quiz_id'))) for a in recent[:RECENT_ATTEMPTS]]
+
+
+def aggregate(manifests: Dict[Optional[str], Dict]) -> Dict:
+    """
+    Combine subject manifests into the cross-subject overview: totals, one
+    row per subject (most recently active first) and the most recent
+    attempts of all subjects
+    """
+    subjects = []
+    for subject, manifest in manifests.items():
+        row = {name: manifest[name] for name in COLLECTIONS}
+        row['subject'] = subject
+        row['last_activity'] = max(filter(None, manifest['modified'].values()), default=None)
+        subjects.append(row)
+    subjects.sort(key=lambda s: s['last_activity'] or '', reverse=True)
+    
+    recent = [dict(attempt, subject=subject)
+              for subject, manifest in manifests.items() for attempt in manifest['recent_attempts']]
+    recent.sort(key=lambda a: a['completed_at'] or '', reverse=True)
+    return {
+        'totals': {name: sum(s[name] for s in subjects) for name in COLLECTIONS},
+        'subjects': subjects,
+        'recent_attempts': recent[:RECENT_ATTEMPTS * 2],
+    }
+
+
+def merge_rankings(rankings: Dict[Optional[str], List[Dict]], limit: int) -> List[Tuple[Optional[str], Dict]]:
+    """
+    Merge per-subject search results (each ranked best first) into one list
+    of (subject, question) pairs. Scores aren't comparable across subjects,
+    so the results are interleaved by rank: every subject's best match,
+    then every subject's second best, and so on.
+    """
+    merged = []
+    depth = max((len(ranked) for ranked in rankings.values()), default=0)
+    for rank in range(depth):
+        for subject, ranked in rankings.items():
+            if rank < len(ranked):
+                merged.append((subject, ranked[rank]))
+                if len(merged) == limit:
+                    return merged
+    return merged
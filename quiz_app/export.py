@@ -0,0 +1,179 @@
+"""
+Export Module for Quiz System
+Streams quiz attempts as CSV or JSON Lines, either one row per attempt or
+one row per answer (joined with the question text and category). Rows are
+generated one attempt at a time from the storage's iter_attempts(), which
+reads attempts.json record by record (or the database in batches), so the
+memory an export needs doesn't grow with the number of attempts.
+"""
+
+import csv
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .serialization import dumps
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+ROW_LEVELS = ('attempts', 'answers')
+
+# Rows are sent in chunks of about this size rather than one write per row
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+ATTEMPT_FIELDS = [
+    'attempt_id', 'quiz_id', 'quiz_title', 'student_name', 'started_at', 'completed_at',
+    'score', 'earned_points', 'total_points', 'answered', 'correct',
+]
+ANSWER_FIELDS = [
+    'attempt_id', 'quiz_id', 'quiz_title', 'student_name', 'completed_at',
+    'question_id', 'question_text', 'question_type', 'category_id', 'category_name',
+    'user_answer', 'is_correct', 'points_earned',
+]
+
+
+class QuestionLookup:
+    """
+    Question text and category by question id. Holds the quiz's questions
+    (or the whole bank), fetching questions that were removed from the quiz
+    since an attempt one by one.
+    """
+    
+    def __init__(self, subject_storage, quiz: Optional[Dict] = None):
+        self.storage = subject_storage
+        if quiz is not None:
+            question_ids = [q.get('id') or q.get('question_id') for q in quiz.get('questions', [])]
+            questions = subject_storage.get_questions_by_ids([i for i in question_ids if i])
+        else:
+            questions = subject_storage.get_questions()
+        self.questions = {q['id']: self.summary(q) for q in questions}
+        self.category_names = {c['id']: c.get('name') for c in subject_storage.get_categories()}
+    
+    @staticmethod
+    def summary(question: Optional[Dict]) -> Dict:
+        if question is None:
+            return {'question_text': None, 'question_type': None, 'category_id': None}
+        return {
+            'question_text': question.get('question_text'),
+            'question_type': question.get('question_type'),
+            'category_id': question.get('category_id'),
+        }
+    
+    def get(self, question_id: str) -> Dict:
+        info = self.questions.get(question_id)
+        if info is None:
+            info = self.questions[question_id] = self.summary(self.storage.get_question(question_id))
+        return dict(info, category_name=self.category_names.get(info['category_id']))
+
+
+def attempt_rows(attempts: Iterable[Dict], quiz_titles: Dict[str, str]) -> Iterator[Dict]:
+    """One row per attempt"""
+    for attempt in attempts:
+        answers = attempt.get('answers') or []
+        yield {
+            'attempt_id': attempt['id'],
+            'quiz_id': attempt.get('quiz_id'),
+            'quiz_title': quiz_titles.get(attempt.get('quiz_id')),
+            'student_name': attempt.get('student_name'),
+            'started_at': attempt.get('started_at'),
+            'completed_at': attempt.get('completed_at'),
+            'score': attempt.get('score'),
+            'earned_points': attempt.get('earned_points'),
+            'total_points': attempt.get('total_points'),
+            'answered': len(answers),
+            'correct': sum(1 for answer in answers if answer.get('is_correct')),
+        }
+
+
+def answer_rows(attempts: Iterable[Dict], quiz_titles: Dict[str, str], questions: QuestionLookup) -> Iterator[Dict]:
+    """One row per answer, with the question text and category"""
+    for attempt in attempts:
+        for answer in attempt.get('answers') or []:
+            row = {
+                'attempt_id': attempt['id'],
+                'quiz_id': attempt.get('quiz_id'),
+                'quiz_title': quiz_titles.get(attempt.get('quiz_id')),
+                'student_name': attempt.get('student_name'),
+                'completed_at': attempt.get('completed_at'),
+                'question_id': answer.get('question_id'),
+            }
+            row.update(questions.get(answer.get('question_id')))
+            row['user_answer'] = answer.get('user_answer')
+            row['is_correct'] = answer.get('is_correct')
+            row['points_earned'] = answer.get('points_earned')
+            yield row
+
+
+class Echo:
+    """File-like object whose write() returns the written line, for csv.writer"""
+    
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(rows: Iterable[Dict], fields: List[str]) -> Iterator[bytes]:
+    """Encode rows as CSV, one line at a time, starting with the header"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields).encode('utf-8')
+    for row in rows:
+        values = []
+        for field in fields:
+            value = row.get(field)
+            # Nested answers (matching pairs, choice lists) go into one JSON cell
+            if isinstance(value, (dict, list)):
+                value = dumps(value).decode('utf-8')
+            values.append(value)
+        yield writer.writerow(values).encode('utf-8')
+
+
+def jsonl_lines(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as JSON Lines"""
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+
+def chunked(lines: Iterable[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Join encoded rows into chunks of at least `size` bytes (except the last one)"""
+    buffer, buffered = [], 0
+    for line in lines:
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_attempts(subject_storage, quiz: Optional[Dict] = None, level: str = 'attempts',
+                    file_format: str = 'csv') -> Iterator[bytes]:
+    """
+    Stream the attempts of a quiz (or of every quiz) in the given format,
+    as chunks of whole rows
+    """
+    if level not in ROW_LEVELS:
+        raise ValueError(f'Unknown export rows: {level}')
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {file_format}')
+    
+    if quiz is not None:
+        quiz_titles = {quiz['id']: quiz.get('title')}
+        attempts = subject_storage.iter_attempts(quiz['id'])
+    else:
+        quiz_titles = {q['id']: q.get('title') for q in subject_storage.get_quizzes()}
+        attempts = subject_storage.iter_attempts()
+    
+    if level == 'attempts':
+        rows, fields = attempt_rows(attempts, quiz_titles), ATTEMPT_FIELDS
+    else:
+        rows, fields = answer_rows(attempts, quiz_titles, QuestionLookup(subject_storage, quiz)), ANSWER_FIELDS
+    
+    lines = csv_lines(rows, fields) if file_format == 'csv' else jsonl_lines(rows)
+    return chunked(lines)
+
+
+def export_filename(quiz: Dict, level: str, file_format: str) -> str:
+    """File name of a download, e.g. 'quiz-3f2a1c9b-answers.csv'"""
+    return f'quiz-{quiz["id"][:8]}-{level}.{file_format}'
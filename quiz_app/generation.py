@@ -0,0 +1,386 @@
+"""
+Generation Module for Quiz System
+Quizzes are generated from indexes of the question bank that are built once
+per version of the bank: the question ids of each (category, type) group,
+and how often and how recently each question was used by a quiz.
+
+A generation request is a GenerationSpec of constraints: questions per
+category, the type mix, the point total and the questions of recent
+quizzes to leave out. The number of questions each group gives is solved
+as a small flow problem over categories and types, then each group is
+sampled with weighted sampling without replacement (questions used by
+fewer quizzes are more likely to be picked). The cost of a generation
+grows with the number of questions it picks, not with the size of the bank.
+"""
+
+import heapq
+from collections import Counter
+from typing import Dict, Hashable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .storage import VersionedCache
+
+QUESTION_TYPES = ('single_choice', 'multiple_choice', 'matching')
+# 'usage': questions used by fewer quizzes are more likely, 'uniform': all are as likely
+WEIGHTINGS = ('usage', 'uniform')
+
+DEFAULT_COUNT = 50
+DEFAULT_POINTS = 10
+MAX_VARIANTS = 50
+
+# Constraints of the generation types offered by the quiz list
+GENERATION_PRESETS = {
+    'random': {},
+    'category': {'categories': 5},
+}
+
+# Questions left to allocate per chunk pushed at once are (left // CHUNKS),
+# so quizzes of up to 2 * CHUNKS questions are split one question at a time
+CHUNKS = 64
+
+# Random draws per question to pick before ranking the whole group instead
+DRAWS_PER_QUESTION = 4
+
+# (category id, question type) of a group of questions
+GroupKey = Tuple[Optional[str], Optional[str]]
+
+SOURCE, SINK = 'source', 'sink'
+OTHER_CATEGORIES, OTHER_TYPES = 'other categories', 'other types'
+
+
+class GenerationError(ValueError):
+    """Raised for invalid constraints or constraints the question bank can't meet"""
+
+
+def _number(data: Dict, field: str, default: Optional[int] = None, minimum: int = 0) -> Optional[int]:
+    value = data.get(field)
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise GenerationError(f'{field} must be a number')
+    if number < minimum:
+        raise GenerationError(f'{field} must be at least {minimum}')
+    return number
+
+
+def _counts(data: Dict, field: str) -> Dict[str, int]:
+    value = data.get(field) or {}
+    if not isinstance(value, dict):
+        raise GenerationError(f'{field} must map ids to numbers of questions')
+    return {str(key): _number(value, key, minimum=0) for key in value}
+
+
+class GenerationSpec(NamedTuple):
+    """Constraints of a generated quiz"""
+    # Number of questions; by default what the categories and types ask for, or DEFAULT_COUNT
+    count: Optional[int] = None
+    # Up to this many questions from every category, or an exact number per category id
+    categories: Union[None, int, Dict[str, int]] = None
+    # Exact number of questions per question type
+    types: Optional[Dict[str, int]] = None
+    points_per_question: int = DEFAULT_POINTS
+    # Split over the questions instead of points_per_question
+    total_points: Optional[int] = None
+    # Leave out the questions of the N most recently created quizzes
+    exclude_recent: int = 0
+    weighting: str = 'usage'
+    # Number of quizzes to generate, and whether they may share questions
+    variants: int = 1
+    disjoint: bool = False
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GenerationSpec':
+        """Read the constraints of a generation request, raises GenerationError if invalid"""
+        categories = data.get('categories')
+        if not isinstance(categories, dict):
+            categories = _number(data, 'categories')
+        else:
+            categories = _counts(data, 'categories')
+        types = _counts(data, 'types')
+        unknown = set(types) - set(QUESTION_TYPES)
+        if unknown:
+            raise GenerationError(f'Unknown question type: {", ".join(sorted(unknown))}')
+        weighting = data.get('weighting') or 'usage'
+        if weighting not in WEIGHTINGS:
+            raise GenerationError(f'weighting must be one of {", ".join(WEIGHTINGS)}')
+        variants = _number(data, 'variants', 1, minimum=1)
+        if variants > MAX_VARIANTS:
+            raise GenerationError(f'At most {MAX_VARIANTS} variants can be generated at once')
+        return cls(
+            count=_number(data, 'count', minimum=1),
+            categories=categories,
+            types=types,
+            points_per_question=_number(data, 'points_per_question', DEFAULT_POINTS, minimum=1),
+            total_points=_number(data, 'total_points', minimum=1),
+            exclude_recent=_number(data, 'exclude_recent', 0),
+            weighting=weighting,
+            variants=variants,
+            disjoint=bool(data.get('disjoint')),
+        )
+    
+    def points(self, count: int) -> List[int]:
+        """Points of each of count questions: the total split as evenly as possible"""
+        if self.total_points is None:
+            return [self.points_per_question] * count
+        base, extra = divmod(self.total_points, count)
+        if base < 1:
+            raise GenerationError(f'{self.total_points} points can\'t be split over {count} questions')
+        return [base + 1 if i < extra else base for i in range(count)]
+
+
+class BankIndex:
+    """Question ids of a bank grouped by (category, type), in bank order"""
+    
+    def __init__(self, rows: List[Tuple[str, Optional[str], Optional[str]]]):
+        self.groups: Dict[GroupKey, List[str]] = {}
+        self.group_of: Dict[str, GroupKey] = {}
+        for question_id, category_id, question_type in rows:
+            key = (category_id or None, question_type)
+            self.groups.setdefault(key, []).append(question_id)
+            self.group_of[question_id] = key
+
+
+class UsageIndex:
+    """How many quizzes use each question, and the questions of each quiz, newest first"""
+    
+    def __init__(self, quizzes: List[List[str]]):
+        self.quizzes = quizzes
+        self.uses = Counter(question_id for question_ids in quizzes for question_id in set(question_ids))
+    
+    def recent_questions(self, count: int) -> Set[str]:
+        """Questions used by the count most recently created quizzes"""
+        return {question_id for question_ids in self.quizzes[:count] for question_id in question_ids}
+
+
+def allocate(count: int, category_quotas: Dict[Optional[str], int], type_quotas: Dict[str, int],
+             available: Dict[GroupKey, int], rng) -> Dict[GroupKey, int]:
+    """
+    Split count questions over the (category, type) groups so that every
+    category and type gets its quota and no group gives more than it has
+    available. Solved as a max flow from the categories to the types, one
+    question at a time along a path picked at random in proportion to the
+    questions left, so questions not bound by a quota spread over the bank
+    like a random sample would. Raises GenerationError if there is no
+    such split.
+    """
+    category_totals, type_totals = Counter(), Counter()
+    for (category_id, question_type), n in available.items():
+        category_totals[category_id] += n
+        type_totals[question_type] += n
+    for category_id, quota in category_quotas.items():
+        if quota > category_totals[category_id]:
+            raise GenerationError(f'Category {category_id} has {category_totals[category_id]} questions '
+                                  f'available, {quota} were asked for')
+    for question_type, quota in type_quotas.items():
+        if quota > type_totals[question_type]:
+            raise GenerationError(f'There are {type_totals[question_type]} {question_type} questions '
+                                  f'available, {quota} were asked for')
+    free_categories = count - sum(category_quotas.values())
+    free_types = count - sum(type_quotas.values())
+    if free_categories < 0 or free_types < 0:
+        raise GenerationError(f'The questions asked for per {"category" if free_categories < 0 else "type"} '
+                              f'add up to more than {count}')
+    
+    # Residual capacities of the flow network, and which edges undo earlier pushes
+    residual: Dict[Hashable, Dict[Hashable, int]] = {}
+    reverse: Set[Tuple[Hashable, Hashable]] = set()
+    
+    def edge(node, to, capacity):
+        if capacity > 0:
+            residual.setdefault(node, {})[to] = capacity
+            residual.setdefault(to, {}).setdefault(node, 0)
+            reverse.add((to, node))
+    
+    for category_id, total in category_totals.items():
+        if category_id in category_quotas:
+            edge(SOURCE, ('category', category_id), category_quotas[category_id])
+        else:
+            edge(OTHER_CATEGORIES, ('category', category_id), total)
+    edge(SOURCE, OTHER_CATEGORIES, free_categories)
+    for (category_id, question_type), n in available.items():
+        edge(('category', category_id), ('type', question_type), n)
+    for question_type, total in type_totals.items():
+        if question_type in type_quotas:
+            edge(('type', question_type), SINK, type_quotas[question_type])
+        else:
+            edge(('type', question_type), OTHER_TYPES, total)
+    edge(OTHER_TYPES, SINK, free_types)
+    
+    def edges_from(node, visited):
+        # Edges of the network before reverse edges, each kind in random order
+        # weighted by the capacity left (successive weighted draws)
+        for undo in (False, True):
+            edges = [(to, left) for to, left in residual[node].items()
+                     if left > 0 and to not in visited and ((node, to) in reverse) == undo]
+            total = sum(left for _, left in edges)
+            while edges:
+                draw = rng.random() * total
+                for i, (to, left) in enumerate(edges):
+                    draw -= left
+                    if draw < 0:
+                        break
+                yield edges.pop(i)
+                total -= left
+    
+    def augment(node, visited, limit) -> int:
+        # Push up to limit questions along a path to the sink
+        if node == SINK:
+            return limit
+        visited.add(node)
+        for to, left in edges_from(node, visited):
+            pushed = augment(to, visited, min(limit, left))
+            if pushed:
+                residual[node][to] -= pushed
+                residual[to][node] += pushed
+                return pushed
+        return 0
+    
+    allocated = 0
+    while allocated < count:
+        # One question at a time keeps the split random; big quizzes go in chunks
+        pushed = augment(SOURCE, set(), max(1, (count - allocated) // CHUNKS))
+        if not pushed:
+            break
+        allocated += pushed
+    if allocated < count:
+        raise GenerationError(f'Only {allocated} questions meet the constraints, {count} were asked for')
+    
+    # The flow on a category -> type edge is what its reverse edge received
+    allocation = {}
+    for key in available:
+        n = residual.get(('type', key[1]), {}).get(('category', key[0]), 0)
+        if n:
+            allocation[key] = n
+    return allocation
+
+
+class Generator:
+    """Generates question selections from the indexes of one question bank"""
+    
+    def __init__(self, bank: BankIndex, usage: UsageIndex):
+        self.bank = bank
+        self.usage = usage
+        # Questions of each group used by some quiz
+        self.used = Counter(bank.group_of[question_id] for question_id in usage.uses
+                            if question_id in bank.group_of)
+    
+    def weight(self, question_id: str) -> float:
+        return 1.0 / (1 + self.usage.uses.get(question_id, 0))
+    
+    def available(self, excluded: Set[str]) -> Dict[GroupKey, int]:
+        """Number of questions of each group that may be picked"""
+        available = {key: len(question_ids) for key, question_ids in self.bank.groups.items()}
+        for question_id in excluded:
+            key = self.bank.group_of.get(question_id)
+            if key is not None:
+                available[key] -= 1
+        return available
+    
+    def sample(self, key: GroupKey, k: int, eligible: int, excluded: Set[str], weighted: bool, rng) -> List[str]:
+        """
+        Pick k questions of a group without replacement, each pick in
+        proportion to the weight of the questions left. While most of the
+        group is eligible, questions are drawn at random and accepted with
+        probability weight / top weight; otherwise every eligible question
+        is ranked by an Efraimidis-Spirakis key, random() ** (1 / weight).
+        """
+        question_ids = self.bank.groups[key]
+        weight = self.weight if weighted else None
+        chosen: Dict[str, None] = {}
+        if 2 * k <= eligible:
+            top = 1.0
+            if weight is not None and self.used[key] >= len(question_ids):
+                # Every question of the group is used: none has weight 1
+                top = max(map(weight, question_ids))
+            size = len(question_ids)
+            for _ in range(DRAWS_PER_QUESTION * k + 32):
+                question_id = question_ids[int(rng.random() * size)]
+                if question_id in chosen or question_id in excluded:
+                    continue
+                if weight is None or rng.random() * top < weight(question_id):
+                    chosen[question_id] = None
+                    if len(chosen) == k:
+                        return list(chosen)
+        
+        candidates = [i for i in question_ids if i not in excluded and i not in chosen]
+        left = k - len(chosen)
+        if weight is None:
+            return list(chosen) + rng.sample(candidates, left)
+        return list(chosen) + heapq.nlargest(left, candidates, key=lambda i: rng.random() ** (1.0 / weight(i)))
+    
+    def quotas(self, spec: GenerationSpec, available: Dict[GroupKey, int]) -> Tuple[int, Dict, Dict]:
+        """The number of questions and the category and type quotas a spec asks for"""
+        category_totals = Counter()
+        for (category_id, _), n in available.items():
+            category_totals[category_id] += n
+        if isinstance(spec.categories, int):
+            category_quotas = {category_id: min(spec.categories, total)
+                               for category_id, total in category_totals.items() if category_id is not None}
+        else:
+            category_quotas = dict(spec.categories or {})
+        type_quotas = dict(spec.types or {})
+        
+        count = spec.count
+        if count is None:
+            if spec.categories is not None:
+                count = max(sum(category_quotas.values()), sum(type_quotas.values()))
+            else:
+                count = max(sum(type_quotas.values()), min(DEFAULT_COUNT, sum(available.values())))
+        return count, category_quotas, type_quotas
+    
+    def generate(self, spec: GenerationSpec, rng) -> List[List[Tuple[str, int]]]:
+        """
+        Pick the questions of spec.variants quizzes, as lists of
+        (question id, points). Raises GenerationError if the constraints
+        can't be met.
+        """
+        if not self.bank.group_of:
+            raise GenerationError('No questions available in question bank')
+        excluded = self.usage.recent_questions(spec.exclude_recent)
+        # Every variant has the same number of questions per category and type
+        count, category_quotas, type_quotas = self.quotas(spec, self.available(excluded))
+        if count == 0:
+            raise GenerationError('Could not generate quiz with selected criteria')
+        points = spec.points(count)
+        
+        variants = []
+        available = self.available(excluded)
+        for number in range(1, spec.variants + 1):
+            try:
+                allocation = allocate(count, category_quotas, type_quotas, available, rng)
+            except GenerationError as e:
+                if number == 1:
+                    raise
+                raise GenerationError(f'Variant {number}: {e}')
+            selection = []
+            for key, k in allocation.items():
+                selection.extend(self.sample(key, k, available[key], excluded, spec.weighting == 'usage', rng))
+            # Mix the groups
+            rng.shuffle(selection)
+            variants.append(list(zip(selection, points)))
+            if spec.disjoint:
+                excluded = excluded | set(selection)
+                for key, k in allocation.items():
+                    available[key] -= k
+        return variants
+
+
+# Indexes shared by every storage instance in this process
+_indexes = VersionedCache()
+
+
+def get_generator(subject_storage) -> Generator:
+    """
+    Get the generator of a subject's question bank. The bank index is
+    rebuilt only after questions change, the usage index after quizzes do.
+    """
+    questions_version, quizzes_version = subject_storage.get_bank_version()
+    # The data folder of JSON storage, the subject of the database
+    source = (type(subject_storage).__name__, str(getattr(subject_storage, 'storage_dir', subject_storage.subject)))
+    bank = _indexes.get(source + ('bank',), questions_version,
+                        lambda: BankIndex(subject_storage.get_question_strata()))
+    usage = _indexes.get(source + ('usage',), quizzes_version,
+                         lambda: UsageIndex(subject_storage.get_quiz_question_ids()))
+    return _indexes.get(source + ('generator',), (questions_version, quizzes_version),
+                        lambda: Generator(bank, usage))
@@ -0,0 +1,177 @@
+"""
+Grading Module for Quiz System
+A quiz is compiled once into an answer key holding, per question, the
+correct choice ids, the matching map and the points. Grading a submission
+is then a single loop over the key with no storage access.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class QuestionKey(NamedTuple):
+    """Everything needed to grade the answer to one quiz question"""
+    question_id: str
+    question_type: str
+    points: int
+    correct_choices: FrozenSet[str]
+    # Matching answers as posted by the quiz form: term index -> definition index
+    matching: Optional[Dict[str, str]]
+    # Older submissions match term text to definition text
+    matching_by_text: Optional[Dict[str, str]]
+
+
+class AnswerKey:
+    """Compiled grading key of a quiz"""
+    
+    def __init__(self, quiz_id: str, questions: List[QuestionKey]):
+        self.quiz_id = quiz_id
+        self.questions = tuple(questions)
+        self.total_points = sum(q.points for q in self.questions)
+    
+    def grade(self, answers: Dict) -> Tuple[List[Dict], int, int]:
+        """Grade submitted answers, returns (graded answers, earned points, total points)"""
+        graded_answers = []
+        earned_points = 0
+        
+        for key in self.questions:
+            user_answer = answers.get(key.question_id, {})
+            is_correct = False
+            
+            if key.question_type == 'single_choice':
+                selected = user_answer.get('selected_choices', [])
+                is_correct = len(selected) == 1 and selected[0] in key.correct_choices
+            elif key.question_type == 'multiple_choice':
+                is_correct = frozenset(user_answer.get('selected_choices', [])) == key.correct_choices
+            elif key.question_type == 'matching':
+                user_pairs = user_answer.get('matching_answer', {})
+                is_correct = user_pairs == key.matching or user_pairs == key.matching_by_text
+            
+            if is_correct:
+                earned_points += key.points
+            
+            graded_answers.append({
+                'question_id': key.question_id,
+                'user_answer': user_answer,
+                'is_correct': is_correct,
+                'points_earned': key.points if is_correct else 0
+            })
+        
+        return graded_answers, earned_points, self.total_points
+    
+    def score(self, earned_points: int) -> float:
+        """Get the score percentage for a number of earned points"""
+        return (earned_points / self.total_points * 100) if self.total_points > 0 else 0
+    
+    def attempt(self, attempt_id: str, answers: Dict, student_name: str, completed_at: str) -> Dict:
+        """Grade submitted answers into a new attempt record"""
+        graded_answers, earned_points, total_points = self.grade(answers)
+        return {
+            'id': attempt_id,
+            'quiz_id': self.quiz_id,
+            'student_name': student_name,
+            'completed_at': completed_at,
+            'score': self.score(earned_points),
+            'total_points': total_points,
+            'earned_points': earned_points,
+            'answers': graded_answers,
+        }
+    
+    def regrade(self, attempt: Dict) -> Optional[Dict]:
+        """
+        Grade the stored answers of an attempt again against this key.
+        Returns an updated copy of the attempt, or None if its grades are
+        unchanged. Questions added to the quiz since count as unanswered.
+        """
+        answers = {a['question_id']: a.get('user_answer', {}) for a in attempt.get('answers', [])}
+        graded_answers, earned_points, total_points = self.grade(answers)
+        if (earned_points == attempt.get('earned_points') and total_points == attempt.get('total_points')
+                and graded_answers == attempt.get('answers')):
+            return None
+        return dict(attempt, answers=graded_answers, earned_points=earned_points,
+                    total_points=total_points, score=self.score(earned_points))
+
+
+def valid_answers(answers) -> bool:
+    """
+    Check that submitted answers have the shape the quiz form posts:
+    question id -> {'selected_choices': [choice id, ...]} or
+    {'matching_answer': {term index: definition index}}
+    """
+    if not isinstance(answers, dict):
+        return False
+    for answer in answers.values():
+        if not isinstance(answer, dict):
+            return False
+        selected = answer.get('selected_choices', [])
+        if not isinstance(selected, list) or not all(isinstance(choice, str) for choice in selected):
+            return False
+        matching = answer.get('matching_answer', {})
+        if not isinstance(matching, dict) or not all(isinstance(value, str) for value in matching.values()):
+            return False
+    return True
+
+
+def compile_question_key(question_data: Dict, points: int) -> QuestionKey:
+    """Compile the grading key of one question"""
+    question_type = question_data['question_type']
+    correct_choices = frozenset(c['id'] for c in question_data.get('choices', []) if c['is_correct'])
+    matching = matching_by_text = None
+    if question_type == 'matching':
+        pairs = question_data.get('matching_pairs', [])
+        matching = {str(i): str(p.get('correct_match', 0)) for i, p in enumerate(pairs)}
+        matching_by_text = {p['left_item']: p['right_item'] for p in pairs}
+    return QuestionKey(question_data['id'], question_type, points, correct_choices, matching, matching_by_text)
+
+
+def compile_answer_key(quiz: Dict, questions: List[Dict]) -> AnswerKey:
+    """
+    Compile the grading key of a quiz.
+    Questions are given as full question records; quiz entries whose
+    question is missing from them are skipped, as when taking the quiz.
+    """
+    questions_by_id = {question['id']: question for question in questions}
+    keys = []
+    for q in quiz.get('questions', []):
+        # Handle both 'id' and 'question_id' for backward compatibility
+        question_data = questions_by_id.get(q.get('id') or q.get('question_id'))
+        if question_data is not None:
+            keys.append(compile_question_key(question_data, q.get('points', 1)))
+    return AnswerKey(quiz['id'], keys)
+
+
+# Histories at least this long are regraded in a process pool
+PARALLEL_REGRADE_THRESHOLD = 20000
+
+
+def _regrade_batch(answer_key: AnswerKey, attempts: List[Dict]) -> List[Dict]:
+    """Regrade a batch of attempts, returns the ones whose grades changed"""
+    regraded = []
+    for attempt in attempts:
+        updated = answer_key.regrade(attempt)
+        if updated is not None:
+            regraded.append(updated)
+    return regraded
+
+
+def regrade_attempts(answer_key: AnswerKey, attempts: List[Dict], batch_size: int = 1000,
+                     workers: Optional[int] = None) -> Iterator[Tuple[int, List[Dict]]]:
+    """
+    Regrade attempts in batches. Yields (batch size, changed attempts) per
+    batch, in order. With workers > 1 the batches are graded in a process
+    pool; by default a pool is only used for long histories.
+    """
+    batches = [attempts[i:i + batch_size] for i in range(0, len(attempts), batch_size)]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(attempts) >= PARALLEL_REGRADE_THRESHOLD else 1
+    
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = pool.map(_regrade_batch, itertools.repeat(answer_key), batches)
+            for batch, regraded in zip(batches, results):
+                yield len(batch), regraded
+    else:
+        for batch in batches:
+            yield len(batch), _regrade_batch(answer_key, batch)
@@ -0,0 +1,247 @@
+"""
+Image Module for Quiz System
+Question images are stored content-addressed: an upload is streamed to disk
+in chunks while it is hashed, and named after its SHA-256 digest, so the
+same image uploaded twice is stored once. Resized WebP and JPEG variants
+are generated by a background worker after the upload. As the content
+behind a digest never changes, variants are served with immutable cache
+headers.
+
+Layout below MEDIA_ROOT:
+- question_images/<digest>.<ext>: the original
+- question_images/variants/<digest>/<width>.<format>: the resized variants
+Images uploaded before (question_images/<question id>_<file name>) are
+served from MEDIA_URL as they are.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .storage import atomic_write, file_lock, get_available_subjects, get_storage
+
+IMAGE_DIR = 'question_images'
+VARIANT_DIR = f'{IMAGE_DIR}/variants'
+
+# Accepted upload formats (as detected by Pillow) and their file extensions
+IMAGE_FORMATS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Width of the <img> fallback and the sizes attribute of the srcsets
+DEFAULT_WIDTH = 640
+IMAGE_SIZES = '(max-width: 800px) 100vw, 768px'
+
+CHUNK_SIZE = 64 * 1024
+# Seconds an uploaded image is kept by remove_unused before its question is saved
+UPLOAD_GRACE = 60
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+NAME_PATTERN = re.compile(rf'{IMAGE_DIR}/({DIGEST_PATTERN.pattern})\.[a-z]+')
+
+# Variants are generated off the request thread
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='quiz-images')
+
+
+class InvalidImage(ValueError):
+    """Raised for an upload that is not an image in an accepted format"""
+
+
+def media_path(name: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / name
+
+
+def image_digest(name: Optional[str]) -> Optional[str]:
+    """The digest of a content-addressed image name, None for other names"""
+    match = NAME_PATTERN.fullmatch(name or '')
+    return match.group(1) if match else None
+
+
+def original_path(digest: str) -> Optional[Path]:
+    """Path of the stored original of a digest, None if there is none"""
+    for extension in IMAGE_FORMATS.values():
+        path = media_path(f'{IMAGE_DIR}/{digest}.{extension}')
+        if path.exists():
+            return path
+    return None
+
+
+def variant_path(digest: str, width: int, variant_format: str) -> Path:
+    return media_path(f'{VARIANT_DIR}/{digest}/{width}.{variant_format}')
+
+
+def store_upload(upload, schedule_variants: bool = True) -> str:
+    """
+    Store an uploaded image (or any django File) under the digest of its
+    content and schedule its variants. Returns the image name to keep in
+    the question, raises InvalidImage if it is not an accepted image.
+    """
+    directory = media_path(IMAGE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in upload.chunks(CHUNK_SIZE):
+                hasher.update(chunk)
+                f.write(chunk)
+        try:
+            with Image.open(tmp_path) as image:
+                image_format = image.format
+                image.verify()
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            raise InvalidImage(f'{upload.name} is not a valid image')
+        if image_format not in IMAGE_FORMATS:
+            raise InvalidImage(f'{image_format} images are not supported')
+        
+        name = f'{IMAGE_DIR}/{hasher.hexdigest()}.{IMAGE_FORMATS[image_format]}'
+        # Under the lock of remove_unused, so the file can't be deleted between the check and the touch
+        with file_lock(directory):
+            if media_path(name).exists():
+                # Already uploaded (by this or another question): mark it as fresh for remove_unused
+                os.utime(media_path(name))
+                os.unlink(tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, media_path(name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    if schedule_variants:
+        _executor.submit(make_variants, hasher.hexdigest())
+    return name
+
+
+def encode_variant(image: Image.Image, variant_format: str) -> bytes:
+    pil_format, _, options = VARIANT_FORMATS[variant_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no transparency: flatten onto white
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif pil_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def make_variants(digest: str) -> List[Path]:
+    """
+    Generate the missing variants of an image, each width in each format.
+    The original is decoded once and resized from the largest width down.
+    Widths above the original's are stored at the original size.
+    """
+    missing = [(width, fmt) for width in VARIANT_WIDTHS for fmt in VARIANT_FORMATS
+               if not variant_path(digest, width, fmt).exists()]
+    source = original_path(digest)
+    if not missing or source is None:
+        return []
+    
+    media_path(f'{VARIANT_DIR}/{digest}').mkdir(parents=True, exist_ok=True)
+    written = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        for width in sorted({width for width, _ in missing}, reverse=True):
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            for fmt in [fmt for w, fmt in missing if w == width]:
+                path = variant_path(digest, width, fmt)
+                atomic_write(path, encode_variant(image, fmt))
+                written.append(path)
+    return written
+
+
+def get_variant(digest: str, width: int, variant_format: str) -> Optional[Path]:
+    """Path of a variant, generated now if the background worker hasn't got to it yet"""
+    if not DIGEST_PATTERN.fullmatch(digest):
+        return None
+    path = variant_path(digest, width, variant_format)
+    if not path.exists():
+        make_variants(digest)
+    return path if path.exists() else None
+
+
+def image_sources(name: Optional[str]) -> Optional[Dict]:
+    """
+    What a template needs to show a question image: 'src', plus the WebP
+    and JPEG srcsets and 'sizes' for content-addressed images
+    """
+    if not name:
+        return None
+    digest = image_digest(name)
+    if digest is None:
+        return {'src': default_storage.url(name)}
+    
+    def url(width, fmt):
+        return reverse('question_image', args=[digest, width, fmt])
+    
+    return {
+        'src': url(DEFAULT_WIDTH, 'jpeg'),
+        'webp_srcset': ', '.join(f'{url(width, "webp")} {width}w' for width in VARIANT_WIDTHS),
+        'jpeg_srcset': ', '.join(f'{url(width, "jpeg")} {width}w' for width in VARIANT_WIDTHS),
+        'sizes': IMAGE_SIZES,
+    }
+
+
+def images_in_use() -> set:
+    """Image names referenced by a question of any subject"""
+    names = set()
+    for subject in [None] + get_available_subjects():
+        names.update(q['image'] for q in get_storage(subject).get_questions() if q.get('image'))
+    return names
+
+
+def remove_unused(names: Iterable[str]) -> List[str]:
+    """
+    Delete the given images (and their variants) that no question uses any
+    more. Images stored or reused by an upload in the last UPLOAD_GRACE
+    seconds are kept, as their question may not be saved yet.
+    """
+    candidates = {name for name in names if name and name.startswith(f'{IMAGE_DIR}/')}
+    if not candidates:
+        return []
+    fresh_after = time.time() - UPLOAD_GRACE
+    removed = []
+    for name in candidates - images_in_use():
+        path = media_path(name)
+        with file_lock(media_path(IMAGE_DIR)):
+            try:
+                if path.stat().st_mtime > fresh_after:
+                    continue
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            else:
+                removed.append(name)
+            digest = image_digest(name)
+            if digest:
+                shutil.rmtree(media_path(f'{VARIANT_DIR}/{digest}'), ignore_errors=True)
+    return removed
+
+
+def release_images(names: Iterable[str]):
+    """Schedule the cleanup of images whose questions were deleted or changed"""
+    names = [name for name in names if name]
+    if names:
+        _executor.submit(remove_unused, names)
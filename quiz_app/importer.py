@@ -0,0 +1,334 @@
+"""
+Import Module for Quiz System
+Bulk import of questions from JSON (an array of questions), JSON Lines or
+CSV. Input is parsed one record at a time, each record is validated against
+the single_choice / multiple_choice / matching schema, questions whose
+normalized text is already in the bank (or earlier in the input) are
+skipped, and everything is stored with one save_questions() call.
+
+Records use the storage schema (see data/sample_questions.json) or a flat
+form, which is also the CSV layout:
+- question_text, question_type, explanation, points
+- category: a category name (created if missing) or id
+- options: choice texts, a list or separated by '|'
+- correct: the correct choices as 1-based numbers or choice texts
+- pairs: matching pairs, a list of [term, definition] or 'term::definition'
+  separated by '|'
+- definitions: extra (distractor) definitions of a matching question
+"""
+
+import codecs
+import csv
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .serialization import DecodeError, loads
+from .serialization import iter_json_array as parse_json_array
+
+IMPORT_FORMATS = ('json', 'jsonl', 'csv')
+QUESTION_TYPES = ('single_choice', 'multiple_choice', 'matching')
+
+LIST_SEPARATOR = '|'
+PAIR_SEPARATOR = '::'
+
+READ_SIZE = 64 * 1024
+# Errors listed in the report, the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportFormatError(ValueError):
+    """Raised for input that can't be parsed at all (as opposed to an invalid record)"""
+
+
+def detect_format(file_name: str) -> Optional[str]:
+    """Tell the input format from a file name"""
+    extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+    if extension == 'ndjson':
+        return 'jsonl'
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def normalize_text(text: str) -> str:
+    """Question text as compared for duplicates: case and whitespace insensitive"""
+    return ' '.join(str(text).casefold().split())
+
+
+# Streaming parsers: each yields (record number, record)
+def iter_json_array(stream) -> Iterator[Tuple[int, object]]:
+    """Parse a JSON array element by element (see serialization.iter_json_array())"""
+    try:
+        yield from enumerate(parse_json_array(stream, read_size=READ_SIZE), 1)
+    except DecodeError as e:
+        raise ImportFormatError(str(e))
+
+
+def iter_json_lines(stream) -> Iterator[Tuple[int, object]]:
+    """Parse JSON Lines, one line at a time (invalid lines yield None)"""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if number == 1:
+            line = line.lstrip(codecs.BOM_UTF8)
+        if not line:
+            continue
+        try:
+            yield number, loads(line)
+        except ValueError:
+            yield number, None
+
+
+def iter_csv(stream) -> Iterator[Tuple[int, object]]:
+    """Parse CSV with a header row, one row at a time"""
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        yield number, {key.strip(): value for key, value in row.items() if key}
+
+
+PARSERS = {'json': iter_json_array, 'jsonl': iter_json_lines, 'csv': iter_csv}
+
+
+def split_list(value) -> List:
+    """A list field given as a list or as a '|'-separated string"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+def parse_points(value) -> Optional[int]:
+    """Points of a record: 1 when not given, None when not a whole number (reported by validate())"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 1
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        # Also rejects inf and nan
+        return int(value) if value.is_integer() else None
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+class QuestionImporter:
+    """
+    Turns raw records into validated questions of one subject. Keeps the
+    normalized texts seen so far to skip duplicates, and the categories to
+    resolve names (new names become new categories).
+    """
+    
+    def __init__(self, subject_storage):
+        self.storage = subject_storage
+        existing = subject_storage.get_questions()
+        self.seen_texts = {normalize_text(q.get('question_text') or '') for q in existing}
+        self.used_ids = {q['id'] for q in existing}
+        self.categories = {c['id']: c for c in subject_storage.get_categories()}
+        self.category_names = {normalize_text(c.get('name') or ''): c['id'] for c in self.categories.values()}
+        self.new_categories: List[Dict] = []
+        # Category ids of other banks, whose questions are imported uncategorized
+        self.unknown_categories: List[str] = []
+    
+    def resolve_category(self, record: Dict) -> Optional[str]:
+        """Get the id of the record's category, creating categories given by name"""
+        value = record.get('category_id') or record.get('category')
+        if not value:
+            return None
+        value = str(value).strip()
+        if value in self.categories:
+            return value
+        key = normalize_text(value)
+        if key not in self.category_names:
+            if record.get('category_id'):
+                # An id of another bank: import the question uncategorized
+                if value not in self.unknown_categories:
+                    self.unknown_categories.append(value)
+                return None
+            category = {'id': str(uuid.uuid4()), 'name': value, 'description': ''}
+            self.new_categories.append(category)
+            self.category_names[key] = category['id']
+        return self.category_names[key]
+    
+    def build_choices(self, record: Dict) -> List[Dict]:
+        if isinstance(record.get('choices'), list):
+            choices = []
+            for i, choice in enumerate(record['choices']):
+                if not isinstance(choice, dict):
+                    raise ValueError('choices must be objects with option_text and is_correct')
+                choices.append({
+                    'id': choice.get('id') or str(uuid.uuid4()),
+                    'option_text': str(choice.get('option_text') or '').strip(),
+                    'is_correct': bool(choice.get('is_correct')),
+                    'order': choice.get('order', i),
+                })
+            return choices
+        
+        options = [str(option).strip() for option in split_list(record.get('options'))]
+        correct = set()
+        for item in split_list(record.get('correct')):
+            item = str(item).strip()
+            if item.isdigit() and 1 <= int(item) <= len(options):
+                correct.add(int(item) - 1)
+            elif item in options:
+                correct.add(options.index(item))
+            else:
+                raise ValueError(f'correct answer {item!r} is not one of the options')
+        return [
+            {'id': str(uuid.uuid4()), 'option_text': option, 'is_correct': i in correct, 'order': i}
+            for i, option in enumerate(options)
+        ]
+    
+    def build_matching(self, record: Dict) -> Tuple[List[Dict], List[Dict]]:
+        if isinstance(record.get('matching_pairs'), list):
+            pairs = [(str(p.get('left_item') or '').strip(), str(p.get('right_item') or '').strip())
+                     for p in record['matching_pairs'] if isinstance(p, dict)]
+            extra = [d.get('right_item') for d in record.get('matching_definitions') or [] if isinstance(d, dict)]
+        else:
+            pairs = []
+            for pair in split_list(record.get('pairs')):
+                if isinstance(pair, (list, tuple)) and len(pair) == 2:
+                    left, right = pair
+                elif isinstance(pair, str) and PAIR_SEPARATOR in pair:
+                    left, right = pair.split(PAIR_SEPARATOR, 1)
+                else:
+                    raise ValueError(f'matching pair {pair!r} must be a term and a definition')
+                pairs.append((str(left).strip(), str(right).strip()))
+            extra = split_list(record.get('definitions'))
+        
+        # Every definition once, in order: the pairs' definitions, then the distractors
+        definition_texts = []
+        for text in [right for _, right in pairs] + [str(text).strip() for text in extra]:
+            if text and text not in definition_texts:
+                definition_texts.append(text)
+        definitions = [{'id': str(uuid.uuid4()), 'right_item': text, 'order': i}
+                       for i, text in enumerate(definition_texts)]
+        matching_pairs = [
+            {
+                'id': str(uuid.uuid4()),
+                'left_item': left,
+                'right_item': right,
+                'correct_match': definition_texts.index(right) if right in definition_texts else 0,
+                'order': i,
+            }
+            for i, (left, right) in enumerate(pairs)
+        ]
+        return matching_pairs, definitions
+    
+    def validate(self, question: Dict) -> List[str]:
+        """Get the schema errors of a built question"""
+        errors = []
+        question_type = question['question_type']
+        if not question['question_text']:
+            errors.append('question_text is empty')
+        if question_type not in QUESTION_TYPES:
+            errors.append(f'question_type must be one of {", ".join(QUESTION_TYPES)}')
+        if not isinstance(question['points'], int) or question['points'] < 1:
+            errors.append('points must be a positive whole number')
+        
+        if question_type in ('single_choice', 'multiple_choice'):
+            choices = question['choices']
+            correct = sum(1 for choice in choices if choice['is_correct'])
+            if len(choices) < 2:
+                errors.append('a choice question needs at least 2 options')
+            if any(not choice['option_text'] for choice in choices):
+                errors.append('options must not be empty')
+            if question_type == 'single_choice' and correct != 1:
+                errors.append('a single choice question needs exactly 1 correct option')
+            if question_type == 'multiple_choice' and correct < 1:
+                errors.append('a multiple choice question needs at least 1 correct option')
+        elif question_type == 'matching':
+            pairs = question['matching_pairs']
+            if len(pairs) < 2:
+                errors.append('a matching question needs at least 2 pairs')
+            if any(not pair['left_item'] or not pair['right_item'] for pair in pairs):
+                errors.append('matching pairs need a term and a definition')
+        return errors
+    
+    def build(self, record) -> Dict:
+        """Turn a raw record into a question, raises ValueError if it is invalid"""
+        if not isinstance(record, dict):
+            raise ValueError('not a JSON object')
+        
+        question = {
+            'id': record.get('id') or None,
+            'question_text': str(record.get('question_text') or '').strip(),
+            'question_type': str(record.get('question_type') or '').strip(),
+            'category_id': None,
+            'explanation': str(record.get('explanation') or ''),
+            'points': parse_points(record.get('points')),
+        }
+        if question['question_type'] in ('single_choice', 'multiple_choice'):
+            question['choices'] = self.build_choices(record)
+        elif question['question_type'] == 'matching':
+            question['matching_pairs'], question['matching_definitions'] = self.build_matching(record)
+        
+        errors = self.validate(question)
+        if errors:
+            raise ValueError('; '.join(errors))
+        
+        if record.get('image'):
+            question['image'] = record['image']
+        if record.get('created_at'):
+            question['created_at'] = record['created_at']
+        return question
+    
+    def run(self, stream, file_format: str, dry_run: bool = False) -> Dict:
+        """
+        Import every record of the input, storing the valid new questions
+        with a single write. Returns the import report.
+        """
+        if file_format not in PARSERS:
+            raise ImportFormatError(f'Unknown import format: {file_format}')
+        
+        started = time.perf_counter()
+        questions, errors = [], []
+        read = duplicates = invalid = 0
+        for number, record in PARSERS[file_format](stream):
+            read += 1
+            try:
+                question = self.build(record)
+            except ValueError as e:
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'record': number, 'error': str(e)})
+                continue
+            
+            key = normalize_text(question['question_text'])
+            if key in self.seen_texts:
+                duplicates += 1
+                continue
+            self.seen_texts.add(key)
+            question['category_id'] = self.resolve_category(record)
+            if not question['id'] or question['id'] in self.used_ids:
+                question['id'] = str(uuid.uuid4())
+            self.used_ids.add(question['id'])
+            questions.append(question)
+        parsed = time.perf_counter()
+        
+        if questions and not dry_run:
+            # Only the categories the imported questions use
+            used = {question['category_id'] for question in questions}
+            new_categories = [c for c in self.new_categories if c['id'] in used]
+            if new_categories:
+                self.storage.save_categories(new_categories)
+            self.storage.save_questions(questions)
+        finished = time.perf_counter()
+        
+        elapsed = finished - started
+        return {
+            'format': file_format,
+            'read': read,
+            'imported': 0 if dry_run else len(questions),
+            'valid': len(questions),
+            'duplicates': duplicates,
+            'invalid': invalid,
+            'new_categories': [c['name'] for c in self.new_categories],
+            'unknown_categories': self.unknown_categories,
+            'errors': errors,
+            'dry_run': dry_run,
+            'parse_seconds': round(parsed - started, 4),
+            'write_seconds': round(finished - parsed, 4),
+            'questions_per_second': round(read / elapsed) if elapsed else None,
+            'finished_at': datetime.now().isoformat(),
+        }
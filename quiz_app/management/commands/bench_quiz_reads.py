@@ -0,0 +1,90 @@
+"""
+Regression benchmark for file reads per quiz request.
+Builds throw-away question banks with quizzes of growing size and checks
+that quiz_take, quiz_submit, quiz_results and quiz_edit parse the same
+number of JSON files no matter how many questions the quiz has, and
+fails with a non-zero exit status when they don't.
+"""
+
+import json
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from quiz_app import storage as quiz_storage
+from quiz_app.synthetic import make_answers, make_category, make_question
+
+
+class Command(BaseCommand):
+    help = 'Check that quiz views read a constant number of files as quizzes grow'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='5,50,500',
+                            help='Comma separated quiz sizes (number of questions)')
+    
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        setup_test_environment()
+        
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in sizes:
+                data_dir = Path(tmp_dir) / f'quiz_{size}'
+                with override_settings(JSON_STORAGE_DIR=data_dir):
+                    results[size] = self.measure(size)
+        
+        views = list(results[sizes[0]].keys())
+        self.stdout.write(f"{'questions':>10}" + ''.join(f'{view:>25}' for view in views))
+        for size in sizes:
+            row = ''.join(f"{results[size][view]['reads']:>10} reads {results[size][view]['ms']:>6.1f}ms"
+                          for view in views)
+            self.stdout.write(f'{size:>10}{row}')
+        
+        for view in views:
+            reads = {results[size][view]['reads'] for size in sizes}
+            if len(reads) > 1:
+                raise CommandError(f'{view} file reads grow with quiz size: {sorted(reads)}')
+        self.stdout.write(self.style.SUCCESS('File reads per request are constant'))
+    
+    def measure(self, size):
+        """Populate a fresh storage directory and time each view once with a cold cache"""
+        rng = random.Random(size)
+        subject_storage = quiz_storage.JSONStorage()
+        category = subject_storage.save_category(make_category(0))
+        questions = [make_question(rng, category['id']) for _ in range(size)]
+        subject_storage.write_json(subject_storage.files['questions'], questions)
+        quiz = subject_storage.save_quiz({
+            'id': str(uuid.uuid4()),
+            'title': f'{size} question quiz',
+            'is_published': True,
+            'questions': [{'id': q['id'], 'text': q['question_text'], 'points': 1} for q in questions],
+        })
+        answers = make_answers(rng, questions)
+        
+        client = Client()
+        measurements = {}
+        
+        def run(name, method, url, data=None):
+            quiz_storage.clear_cache()
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{name} returned HTTP {response.status_code}')
+            measurements[name] = {'reads': quiz_storage.get_cache_stats()['misses'], 'ms': elapsed}
+            return response
+        
+        run('quiz_take', 'get', reverse('quiz_take', args=[quiz['id']]))
+        response = run('quiz_submit', 'post', reverse('quiz_submit', args=[quiz['id']]),
+                       {'answers': json.dumps(answers)})
+        attempt_id = response.json()['attempt_id']
+        run('quiz_results', 'get', reverse('quiz_results', args=[attempt_id]))
+        run('quiz_edit', 'get', reverse('quiz_edit', args=[quiz['id']]))
+        return measurements
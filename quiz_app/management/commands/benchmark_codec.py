@@ -0,0 +1,73 @@
+"""
+JSON codec benchmark.
+Parses and serializes a storage file (by default the Default subject's
+question bank) with every installed codec (see serialization.py), and
+times the JSON API responses built from it. Nothing is written to the
+data folder. Results are printed (or written) as JSON.
+"""
+
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+
+from quiz_app.serialization import available_codecs, get_codec
+from quiz_app.storage import get_storage
+from quiz_app.views import CodecJsonResponse
+from .benchmark_storage import summarize, timed
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the stdlib json and orjson codecs on a storage file and print JSON results'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JSON storage file to use (default: the Default questions.json)')
+        parser.add_argument('--iterations', type=int, default=200, help='Calls per measured operation')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    
+    def handle(self, *args, **options):
+        default_storage = get_storage(None)
+        file_path = Path(options['file']) if options['file'] else default_storage.files['questions']
+        if not file_path.exists():
+            raise CommandError(f'No such file: {file_path}')
+        raw = file_path.read_bytes()
+        data = json.loads(raw)
+        iterations = options['iterations']
+        
+        results = {}
+        for name in available_codecs():
+            codec = get_codec(name)
+            results[name] = {
+                'loads': summarize(timed(lambda i: codec.loads(raw), iterations)),
+                'dumps_indented': summarize(timed(lambda i: codec.dumps(data, indent=True), iterations)),
+                'dumps_compact': summarize(timed(lambda i: codec.dumps(data), iterations)),
+            }
+        
+        # The category API and the quiz endpoints answer with the installed codec
+        categories = default_storage.get_categories()
+        results['responses'] = {
+            'JsonResponse': summarize(timed(lambda i: JsonResponse({'questions': data}), iterations)),
+            'CodecJsonResponse': summarize(timed(lambda i: CodecJsonResponse({'questions': data}), iterations)),
+            'categories_JsonResponse': summarize(timed(lambda i: JsonResponse({'categories': categories}), iterations)),
+            'categories_CodecJsonResponse': summarize(
+                timed(lambda i: CodecJsonResponse({'categories': categories}), iterations)),
+        }
+        
+        report = {
+            'file': str(file_path),
+            'size_bytes': len(raw),
+            'codec': get_codec().name,
+            'started_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,79 @@
+"""
+Quiz generation benchmark.
+Builds synthetic question banks (and quizzes using them) in memory, and
+times generate() for the generation types offered by the quiz list, a
+constrained spec and a batch of exam variants. Nothing is written to the
+data folder. Results are printed (or written) as JSON.
+"""
+
+import json
+import platform
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from quiz_app.generation import BankIndex, GenerationSpec, Generator, UsageIndex
+from quiz_app.synthetic import make_question_bank, make_quiz
+from .benchmark_storage import summarize, timed
+
+
+class Command(BaseCommand):
+    help = 'Benchmark quiz generation on synthetic question banks and print JSON results'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated question bank sizes')
+        parser.add_argument('--categories', type=int, default=20, help='Categories per bank')
+        parser.add_argument('--quizzes', type=int, default=200, help='Existing 50 question quizzes per bank')
+        parser.add_argument('--variants', type=int, default=10, help='Exam variants of the batch spec')
+        parser.add_argument('--iterations', type=int, default=50, help='Calls per measured operation')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        results = {}
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            rng = random.Random(size)
+            bank = make_question_bank(rng, size, options['categories'])
+            questions = bank['questions']
+            quizzes = [make_quiz(rng, questions, 50) for _ in range(options['quizzes'])]
+            
+            started = time.perf_counter()
+            generator = Generator(
+                BankIndex([(q['id'], q['category_id'], q['question_type']) for q in questions]),
+                UsageIndex([[entry['id'] for entry in quiz['questions']] for quiz in quizzes]),
+            )
+            build = time.perf_counter() - started
+            
+            categories = [category['id'] for category in bank['categories']]
+            specs = {
+                'random': {},
+                'category': {'categories': 5},
+                'constrained': {
+                    'count': 60, 'categories': {categories[0]: 10, categories[1]: 10},
+                    'types': {'matching': 6, 'multiple_choice': 15}, 'total_points': 100, 'exclude_recent': 5,
+                },
+                'variants': {'count': 50, 'types': {'matching': 5}, 'variants': options['variants'],
+                             'disjoint': True, 'exclude_recent': 5},
+            }
+            results[size] = {'build_ms': build * 1000}
+            for name, data in specs.items():
+                spec = GenerationSpec.from_dict(data)
+                results[size][name] = summarize(timed(lambda i: generator.generate(spec, random.Random(i)),
+                                                      iterations))
+        
+        report = {
+            'started_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+        else:
+            self.stdout.write(output)
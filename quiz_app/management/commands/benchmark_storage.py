@@ -0,0 +1,198 @@
+"""
+Storage engine benchmark.
+Generates synthetic subjects in the data/<subject>/ layout, then measures
+latency and throughput of the storage methods and of the quiz_take,
+quiz_submit and quiz_results views through the Django test client.
+Results are printed (or written) as JSON so runs of different storage
+engines or commits can be compared.
+"""
+
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from quiz_app import storage as quiz_storage
+from quiz_app.synthetic import make_answers, make_attempt, make_question, make_question_bank, make_quiz
+
+
+def summarize(timings, cold=None):
+    """Turn a list of per-call timings (seconds) into a result row"""
+    timings_ms = sorted(t * 1000 for t in timings)
+    total = sum(timings)
+    row = {
+        'iterations': len(timings),
+        'mean_ms': statistics.mean(timings_ms),
+        'p50_ms': timings_ms[len(timings_ms) // 2],
+        'p95_ms': timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))],
+        'max_ms': timings_ms[-1],
+        'ops_per_sec': len(timings) / total if total else None,
+    }
+    if cold is not None:
+        row['cold_ms'] = cold * 1000
+    return row
+
+
+def timed(func, iterations):
+    """Call func(i) `iterations` times, returns the per-call timings"""
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the storage engine on synthetic question banks and print JSON results'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated question bank sizes')
+        parser.add_argument('--attempts', type=int, default=None,
+                            help='Stored attempts per subject (default: a tenth of the bank size)')
+        parser.add_argument('--quiz-size', type=int, default=50, help='Questions per quiz')
+        parser.add_argument('--iterations', type=int, default=50, help='Calls per measured operation')
+        parser.add_argument('--backend', default=None,
+                            help='Storage class to benchmark (default: QUIZ_STORAGE_BACKEND)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    
+    def handle(self, *args, **options):
+        backend = options['backend'] or getattr(settings, 'QUIZ_STORAGE_BACKEND', 'quiz_app.storage.JSONStorage')
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        setup_test_environment()
+        
+        # Sessions (and the ORM engine) need a database: use a throw-away test database
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as data_dir, \
+                    override_settings(JSON_STORAGE_DIR=Path(data_dir), QUIZ_STORAGE_BACKEND=backend):
+                results = [self.run_size(backend, size, options) for size in sizes]
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+        
+        report = {
+            'backend': backend,
+            'started_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': {k: options[k] for k in ['sizes', 'attempts', 'quiz_size', 'iterations', 'seed']},
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+        else:
+            self.stdout.write(output)
+    
+    def populate(self, backend_class, subject, size, options, rng):
+        """Write a synthetic subject to data/<subject>/ and load it into the engine under test"""
+        bank = make_question_bank(rng, size)
+        questions = bank['questions']
+        questions_by_id = {q['id']: q for q in questions}
+        quizzes = [make_quiz(rng, questions, options['quiz_size']) for _ in range(5)]
+        num_attempts = options['attempts'] if options['attempts'] is not None else size // 10
+        attempts = [make_attempt(rng, rng.choice(quizzes), questions_by_id) for _ in range(num_attempts)]
+        
+        json_storage = quiz_storage.JSONStorage(subject)
+        json_storage.write_json(json_storage.files['categories'], bank['categories'])
+        json_storage.write_json(json_storage.files['questions'], questions)
+        json_storage.write_json(json_storage.files['quizzes'], quizzes)
+        json_storage.write_json(json_storage.files['attempts'], attempts)
+        
+        if backend_class is not quiz_storage.JSONStorage and hasattr(backend_class, 'import_from'):
+            backend_class(subject).import_from(json_storage)
+        quiz_storage.clear_cache()
+        return bank, quizzes, attempts
+    
+    def run_size(self, backend, size, options):
+        """Benchmark one synthetic subject of `size` questions"""
+        rng = random.Random(options['seed'])
+        backend_class = import_string(backend)
+        subject = f'Benchmark_{size}'
+        iterations = options['iterations']
+        
+        started = time.perf_counter()
+        bank, quizzes, attempts = self.populate(backend_class, subject, size, options, rng)
+        populate_seconds = time.perf_counter() - started
+        self.stderr.write(f'{size} questions: populated in {populate_seconds:.1f}s, measuring...')
+        
+        storage = backend_class(subject)
+        questions = bank['questions']
+        category_id = bank['categories'][0]['id']
+        question_ids = [rng.choice(questions)['id'] for _ in range(iterations)]
+        operations = {}
+        
+        def measure(name, func, count=iterations):
+            # The first call runs against cold caches and is reported separately
+            started = time.perf_counter()
+            func(0)
+            cold = time.perf_counter() - started
+            operations[name] = summarize(timed(func, count), cold)
+        
+        measure('get_questions', lambda i: storage.get_questions())
+        measure('get_questions[category_id]', lambda i: storage.get_questions({'category_id': category_id}))
+        measure('get_questions[question_type]', lambda i: storage.get_questions({'question_type': 'matching'}))
+        measure('get_questions[search]', lambda i: storage.get_questions({'search': 'usability'}))
+        measure('get_question', lambda i: storage.get_question(question_ids[i % len(question_ids)]))
+        quiz_question_ids = [q['id'] for q in quizzes[0]['questions']]
+        measure('get_questions_by_ids', lambda i: storage.get_questions_by_ids(quiz_question_ids))
+        
+        def save_question(i):
+            question = dict(storage.get_question(question_ids[i % len(question_ids)]))
+            question['explanation'] = f'Edited {i}'
+            storage.save_question(question)
+        measure('save_question[update]', save_question)
+        measure('save_question[insert]',
+                lambda i: storage.save_question(make_question(rng, category_id)))
+        
+        questions_by_id = {q['id']: q for q in questions}
+        measure('save_attempt', lambda i: storage.save_attempt(make_attempt(rng, quizzes[0], questions_by_id)))
+        measure('get_attempts[quiz_id]', lambda i: storage.get_attempts(quizzes[0]['id']))
+        
+        # Views, through the test client with the synthetic subject selected
+        client = Client()
+        session = client.session
+        session['current_subject'] = subject
+        session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        
+        quiz = quizzes[0]
+        answers = json.dumps(make_answers(rng, [questions_by_id[q['id']] for q in quiz['questions']]))
+        attempt_ids = []
+        
+        def view(method, url, data=None):
+            response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned HTTP {response.status_code}')
+            return response
+        
+        def quiz_submit(i):
+            response = view('post', reverse('quiz_submit', args=[quiz['id']]), {'answers': answers})
+            attempt_ids.append(response.json()['attempt_id'])
+        
+        measure('view:quiz_take', lambda i: view('get', reverse('quiz_take', args=[quiz['id']])))
+        measure('view:quiz_submit', quiz_submit)
+        measure('view:quiz_results',
+                lambda i: view('get', reverse('quiz_results', args=[attempt_ids[i % len(attempt_ids)]])))
+        
+        return {
+            'size': size,
+            'attempts': len(attempts),
+            'populate_seconds': populate_seconds,
+            'operations': operations,
+        }
@@ -0,0 +1,27 @@
+"""
+Fold the append-only attempt logs into attempts.json.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.storage import get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Fold attempts.log.jsonl into attempts.json for one or all subjects'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Subject to compact (default: root data and every subject)')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject:
+            if subject not in get_available_subjects():
+                raise CommandError(f'Unknown subject: {subject}')
+            subjects = [subject]
+        else:
+            subjects = [None] + get_available_subjects()
+        
+        for subject in subjects:
+            total = get_storage(subject).compact_attempts()
+            self.stdout.write(f'{subject or "Default"}: {total} attempts')
@@ -0,0 +1,78 @@
+"""
+Convert the storage files to another on-disk format (see serialization.py).
+The attempt log (attempts.log.jsonl) stays JSON Lines in every format.
+With --compare nothing is written: the size and parse time of every data
+file is measured in each available format instead.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.serialization import DEFAULT_FORMAT, FORMATS, available_formats, decode, detect_format, encode
+from quiz_app.storage import atomic_write, file_lock, get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the JSON storage files in the json, compact or msgpack format, or compare the formats'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Target format (default: the QUIZ_STORAGE_FORMAT setting)')
+        parser.add_argument('--subject', help='Subject to convert (default: root data and every subject)')
+        parser.add_argument('--compare', action='store_true',
+                            help='Only report the size and parse time of each file in every format')
+        parser.add_argument('--repeat', type=int, default=20, help='Parses per file and format with --compare')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject:
+            if subject not in get_available_subjects():
+                raise CommandError(f'Unknown subject: {subject}')
+            subjects = [subject]
+        else:
+            subjects = [None] + get_available_subjects()
+        
+        target = options['format'] or getattr(settings, 'QUIZ_STORAGE_FORMAT', DEFAULT_FORMAT)
+        if target not in available_formats():
+            raise CommandError(f"The '{target}' format needs the msgpack package")
+        
+        for subject in subjects:
+            subject_storage = get_storage(subject)
+            paths = [*subject_storage.files.values(), subject_storage.analytics_file, subject_storage.manifest_file]
+            for file_path in paths:
+                if not file_path.exists():
+                    continue
+                name = f'{subject or "Default"}/{file_path.name}'
+                if options['compare']:
+                    self.compare(name, file_path, options['repeat'])
+                else:
+                    self.convert(subject_storage, name, file_path, target)
+        
+        if not options['compare'] and target != getattr(settings, 'QUIZ_STORAGE_FORMAT', DEFAULT_FORMAT):
+            self.stdout.write(self.style.WARNING(
+                f"Set QUIZ_STORAGE_FORMAT = '{target}' in settings.py, or the next save of each file "
+                f"writes it in the configured format again"))
+    
+    def convert(self, subject_storage, name, file_path, target):
+        """Rewrite one file in the target format"""
+        with file_lock(file_path):
+            before = file_path.stat().st_size
+            source = detect_format(file_path.read_bytes())
+            records = subject_storage.load(file_path, strict=True).records
+            after = atomic_write(file_path, encode(records, target)).st_size
+        self.stdout.write(f'{name}: {source} -> {target}, {before:,} -> {after:,} bytes')
+    
+    def compare(self, name, file_path, repeat):
+        """Report the size and parse time of one file in each available format"""
+        data = decode(file_path.read_bytes())
+        results = []
+        for file_format in available_formats():
+            content = encode(data, file_format)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                decode(content)
+            parse_ms = (time.perf_counter() - started) / repeat * 1000
+            results.append(f'{file_format} {len(content):,} B {parse_ms:.2f} ms')
+        self.stdout.write(f'{name}: ' + ' | '.join(results))
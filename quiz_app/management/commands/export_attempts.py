@@ -0,0 +1,46 @@
+"""
+Export quiz attempts as CSV or JSON Lines.
+Rows are written as they are generated (see export.py), so exports of
+very large attempt histories run in constant memory.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.export import EXPORT_FORMATS, ROW_LEVELS, export_attempts
+from quiz_app.storage import get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Stream the attempts of a quiz (or of every quiz of a subject) as CSV or JSON Lines'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', nargs='?', help='Quiz to export (default: every quiz of the subject)')
+        parser.add_argument('--subject', help='Subject of the quiz (default: root data)')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--rows', choices=ROW_LEVELS, default='attempts',
+                            help='One row per attempt, or one row per answer with the question text and category')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject and subject not in get_available_subjects():
+            raise CommandError(f'Unknown subject: {subject}')
+        subject_storage = get_storage(subject)
+        
+        quiz = None
+        if options['quiz_id']:
+            quiz = subject_storage.get_quiz(options['quiz_id'])
+            if quiz is None:
+                raise CommandError(f'Quiz not found: {options["quiz_id"]}')
+        
+        chunks = export_attempts(subject_storage, quiz, options['rows'], options['format'])
+        if options['output']:
+            written = 0
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+            self.stderr.write(f'Wrote {written:,} bytes to {options["output"]}')
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
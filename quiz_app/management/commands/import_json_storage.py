@@ -0,0 +1,35 @@
+"""
+Import the JSON data trees (data/ and data/<subject>/) into the database
+used by quiz_app.orm_storage.ORMStorage.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.orm_storage import ORMStorage
+from quiz_app.storage import JSONStorage, get_available_subjects
+
+
+class Command(BaseCommand):
+    help = 'Copy JSON storage data into the database, replacing what the database holds for each subject'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Subject to import (default: root data and every subject)')
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject:
+            if subject not in get_available_subjects():
+                raise CommandError(f'Unknown subject: {subject}')
+            subjects = [subject]
+        else:
+            subjects = [None] + get_available_subjects()
+        
+        for subject in subjects:
+            started = time.perf_counter()
+            counts = ORMStorage(subject).import_from(JSONStorage(subject), batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+            self.stdout.write(f'{subject or "Default"}: {summary} ({elapsed:.2f}s)')
@@ -0,0 +1,57 @@
+"""
+Bulk import questions from a JSON, JSON Lines or CSV file (see importer.py
+for the record layout) with a single write of the question bank.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.importer import IMPORT_FORMATS, ImportFormatError, QuestionImporter, detect_format
+from quiz_app.storage import get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Import questions from a JSON, JSONL or CSV file, skipping invalid and duplicate questions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Input file ('-' for stdin)")
+        parser.add_argument('--subject', help='Subject to import into (default: root data)')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Input format (default: from the file extension)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving anything')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject and subject not in get_available_subjects():
+            raise CommandError(f'Unknown subject: {subject}')
+        
+        file_format = options['format'] or detect_format(options['file'])
+        if file_format is None:
+            raise CommandError('Cannot tell the input format from the file name, pass --format')
+        
+        importer = QuestionImporter(get_storage(subject))
+        try:
+            if options['file'] == '-':
+                report = importer.run(sys.stdin.buffer, file_format, dry_run=options['dry_run'])
+            else:
+                with open(options['file'], 'rb') as f:
+                    report = importer.run(f, file_format, dry_run=options['dry_run'])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        
+        for error in report['errors']:
+            self.stderr.write(f"Record {error['record']}: {error['error']}")
+        if report['invalid'] > len(report['errors']):
+            self.stderr.write(f"... and {report['invalid'] - len(report['errors'])} more invalid records")
+        if report['new_categories']:
+            self.stdout.write(f"New categories: {', '.join(report['new_categories'])}")
+        if report['unknown_categories']:
+            self.stderr.write(f"Unknown category ids, imported uncategorized: {', '.join(report['unknown_categories'])}")
+        
+        action = 'Validated' if report['dry_run'] else 'Imported'
+        self.stdout.write(
+            f"{subject or 'Default'}: {action} {report['valid']} of {report['read']} records "
+            f"({report['duplicates']} duplicates, {report['invalid']} invalid) in "
+            f"{report['parse_seconds'] + report['write_seconds']:.2f}s "
+            f"(parse {report['parse_seconds']:.2f}s, write {report['write_seconds']:.2f}s, "
+            f"{report['questions_per_second'] or 0:,} records/s)")
@@ -0,0 +1,61 @@
+"""
+Move question images uploaded before the image pipeline (named
+question_images/<question id>_<file name>) to content-addressed names and
+generate the missing resized variants of every question image.
+"""
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.images import InvalidImage, image_digest, make_variants, media_path, remove_unused, store_upload
+from quiz_app.storage import get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Store question images by content hash and generate their WebP/JPEG variants'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Subject to process (default: root data and every subject)')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject:
+            if subject not in get_available_subjects():
+                raise CommandError(f'Unknown subject: {subject}')
+            subjects = [subject]
+        else:
+            subjects = [None] + get_available_subjects()
+        
+        replaced = set()
+        digests = set()
+        for subject in subjects:
+            subject_storage = get_storage(subject)
+            moved = []
+            for question in subject_storage.get_questions():
+                name = question.get('image')
+                if not name:
+                    continue
+                if image_digest(name):
+                    digests.add(image_digest(name))
+                    continue
+                path = media_path(name)
+                if not path.exists():
+                    self.stderr.write(f'{subject or "Default"}: image of question {question["id"]} is missing: {name}')
+                    continue
+                try:
+                    with open(path, 'rb') as f:
+                        new_name = store_upload(File(f, name=path.name), schedule_variants=False)
+                except InvalidImage as e:
+                    self.stderr.write(f'{subject or "Default"}: {e}')
+                    continue
+                moved.append(dict(question, image=new_name))
+                replaced.add(name)
+                digests.add(image_digest(new_name))
+            if moved:
+                subject_storage.save_questions(moved)
+                self.stdout.write(f'{subject or "Default"}: moved {len(moved)} images')
+        
+        removed = remove_unused(replaced)
+        variants = sum(len(make_variants(digest)) for digest in digests)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(digests)} images, {variants} variants generated, {len(removed)} old files removed'))
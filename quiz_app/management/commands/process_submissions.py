@@ -0,0 +1,36 @@
+"""
+Grade and save the submissions waiting in the submission spool
+(see quiz_app/submissions.py), e.g. after the server was stopped during a
+deadline, or as a dedicated worker process with --watch.
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz_app.submissions import DEFAULT_BATCH_SIZE, get_queue, process_batch, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Grade and save queued quiz submissions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Submissions graded and saved per batch')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and process new submissions as they arrive')
+    
+    def handle(self, *args, **options):
+        queue = get_queue()
+        if options['watch']:
+            self.stdout.write(f'Processing submissions from {queue.path}')
+            run_worker(queue, options['batch_size'])
+            return
+        
+        processed = 0
+        while True:
+            handled = process_batch(queue, options['batch_size'])
+            if not handled:
+                break
+            processed += handled
+        counts = queue.counts()
+        self.stdout.write(f'{processed} submissions processed, {counts.get("failed", 0)} failed, '
+                          f'{counts.get("claimed", 0)} claimed by another worker')
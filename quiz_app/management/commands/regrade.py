@@ -0,0 +1,83 @@
+"""
+Regrade stored attempts against the current answer keys.
+Use it after fixing the correct answers of a question once a quiz has
+been taken: every attempt of the affected quizzes is graded again from
+its stored answers, and attempts whose grades changed are written back
+in one bulk write per subject.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_app.grading import regrade_attempts
+from quiz_app.storage import get_available_subjects, get_storage
+
+
+class Command(BaseCommand):
+    help = 'Regrade stored quiz attempts against the current questions and answer keys'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Subject to regrade (default: root data and every subject)')
+        parser.add_argument('--quiz', help='Only regrade the attempts of this quiz ID')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Attempts graded per batch')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Grading processes (default: a pool for long histories, else 1)')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+    
+    def handle(self, *args, **options):
+        subject = options['subject']
+        if subject:
+            if subject not in get_available_subjects():
+                raise CommandError(f'Unknown subject: {subject}')
+            subjects = [subject]
+        else:
+            subjects = [None] + get_available_subjects()
+        
+        if options['quiz']:
+            subjects = [s for s in subjects if get_storage(s).get_quiz(options['quiz'])]
+            if not subjects:
+                raise CommandError(f'Quiz not found: {options["quiz"]}')
+        
+        for subject in subjects:
+            self.regrade_subject(subject, options)
+    
+    def regrade_subject(self, subject, options):
+        """Regrade the attempts of one subject and save the changed ones in one write"""
+        name = subject or 'Default'
+        subject_storage = get_storage(subject)
+        if options['quiz']:
+            quiz_ids = [options['quiz']]
+        else:
+            quiz_ids = [quiz['id'] for quiz in subject_storage.get_quizzes()]
+        
+        started = time.perf_counter()
+        graded = 0
+        changed = []
+        for quiz_id in quiz_ids:
+            answer_key = subject_storage.get_answer_key(quiz_id)
+            if answer_key is None:
+                continue
+            
+            attempts = subject_storage.get_attempts(quiz_id)
+            done = 0
+            for batch_size, regraded in regrade_attempts(answer_key, attempts, options['batch_size'],
+                                                         options['workers']):
+                done += batch_size
+                changed.extend(regraded)
+                self.stdout.write(f'{name}: quiz {quiz_id}: {done}/{len(attempts)} attempts graded')
+            graded += len(attempts)
+        grading_seconds = time.perf_counter() - started
+        
+        write_seconds = 0
+        if changed and not options['dry_run']:
+            started = time.perf_counter()
+            subject_storage.save_attempts(changed)
+            write_seconds = time.perf_counter() - started
+        
+        rate = graded / grading_seconds if grading_seconds else 0
+        action = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {graded} attempts graded in {grading_seconds:.2f}s ({rate:.0f}/s), '
+            f'{len(changed)} {action}, written in {write_seconds:.2f}s'
+        ))
@@ -0,0 +1,103 @@
+"""
+Stress test for concurrent writes to JSON storage.
+Hammers save_attempt (and save_question, to exercise the read-modify-write
+path) from a pool of worker processes against a throw-away data directory,
+then checks that every record made it to disk exactly once. Exits with a
+non-zero status when a record was lost or duplicated.
+"""
+
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def init_worker(data_dir, compact_at):
+    """Point a freshly started worker process at the throw-away data directory"""
+    django.setup()
+    settings.JSON_STORAGE_DIR = Path(data_dir)
+    settings.QUIZ_ATTEMPT_LOG_COMPACT_AT = compact_at
+
+
+def write_records(worker, count):
+    """Save `count` attempts and a question per ten attempts, returns their ids"""
+    from quiz_app.storage import JSONStorage
+    
+    storage = JSONStorage()
+    attempt_ids, question_ids = [], []
+    for i in range(count):
+        attempt = storage.save_attempt({
+            'id': str(uuid.uuid4()),
+            'quiz_id': f'quiz-{worker}',
+            'student_name': f'worker {worker}',
+            'score': 100.0,
+            'answers': [],
+        })
+        attempt_ids.append(attempt['id'])
+        if i % 10 == 0:
+            question = storage.save_question({
+                'id': str(uuid.uuid4()),
+                'question_text': f'Question {i} from worker {worker}',
+                'question_type': 'single_choice',
+                'choices': [],
+            })
+            question_ids.append(question['id'])
+    return attempt_ids, question_ids
+
+
+class Command(BaseCommand):
+    help = 'Save attempts from many processes at once and check that none are lost'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=250, help='Attempts saved per worker')
+        parser.add_argument('--compact-at', type=int, default=100,
+                            help='Attempt log compaction threshold during the run')
+    
+    def handle(self, *args, **options):
+        workers = options['workers']
+        count = options['attempts']
+        
+        with tempfile.TemporaryDirectory() as data_dir:
+            started = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(data_dir, options['compact_at'])) as pool:
+                results = list(pool.map(write_records, range(workers), [count] * workers))
+            elapsed = time.perf_counter() - started
+            
+            init_worker(data_dir, options['compact_at'])
+            from quiz_app.storage import JSONStorage, clear_cache
+            clear_cache()
+            storage = JSONStorage()
+            attempts = [a['id'] for a in storage.get_attempts()]
+            questions = [q['id'] for q in storage.get_questions()]
+            saved_attempts, saved_questions = set(attempts), set(questions)
+            duplicated = len(attempts) - len(saved_attempts) + len(questions) - len(saved_questions)
+            # The running analytics must have counted every attempt exactly once
+            miscounted = [
+                worker for worker in range(workers)
+                if (storage.get_quiz_stats(f'quiz-{worker}') or {}).get('attempts') != count
+            ]
+        
+        expected_attempts = {attempt_id for attempt_ids, _ in results for attempt_id in attempt_ids}
+        expected_questions = {question_id for _, question_ids in results for question_id in question_ids}
+        lost_attempts = expected_attempts - saved_attempts
+        lost_questions = expected_questions - saved_questions
+        
+        self.stdout.write(
+            f'{len(expected_attempts)} attempts and {len(expected_questions)} questions '
+            f'from {workers} processes in {elapsed:.2f}s '
+            f'({len(expected_attempts) / elapsed:.0f} attempts/s)'
+        )
+        if lost_attempts or lost_questions:
+            raise CommandError(f'Lost {len(lost_attempts)} attempts and {len(lost_questions)} questions')
+        if duplicated:
+            raise CommandError(f'{duplicated} records were stored more than once')
+        if miscounted:
+            raise CommandError(f'Quiz analytics miscounted the attempts of {len(miscounted)} workers')
+        self.stdout.write(self.style.SUCCESS('No records lost or duplicated'))
@@ -0,0 +1,198 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:15
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceOption',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('record_id', models.CharField(max_length=100)),
+                ('option_text', models.CharField(max_length=500)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('order', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(blank=True, default='', max_length=200)),
+                ('record_id', models.CharField(max_length=100)),
+                ('question_text', models.TextField()),
+                ('question_type', models.CharField(choices=[('single_choice', 'Single Choice'), ('multiple_choice', 'Multiple Choice'), ('matching', 'Matching')], max_length=20)),
+                ('category_record_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('explanation', models.TextField(blank=True, help_text='Explanation for the correct answer')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='question_images/')),
+                ('points', models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('matching_definitions', models.JSONField(blank=True, default=list)),
+                ('position', models.IntegerField(default=0, help_text='Position in the question bank')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Quiz',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(blank=True, default='', max_length=200)),
+                ('record_id', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=300)),
+                ('description', models.TextField(blank=True)),
+                ('instructions', models.TextField(blank=True)),
+                ('time_limit', models.IntegerField(blank=True, help_text='Time limit in minutes', null=True)),
+                ('position', models.IntegerField(default=0, help_text='Position in the quiz list')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_published', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name_plural': 'Quizzes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizQuestion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('order', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=1, help_text='Points for this question in this quiz', validators=[django.core.validators.MinValueValidator(1)])),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_questions', to='quiz_app.question')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_questions', to='quiz_app.quiz')),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+                'unique_together': {('quiz', 'question')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(blank=True, default='', max_length=200)),
+                ('record_id', models.CharField(max_length=100)),
+                ('quiz_record_id', models.CharField(max_length=100)),
+                ('student_name', models.CharField(blank=True, max_length=200)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('total_points', models.FloatField(default=0)),
+                ('earned_points', models.FloatField(default=0)),
+                ('position', models.IntegerField(default=0, help_text='Position in the attempt history')),
+                ('quiz', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempts', to='quiz_app.quiz')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='questions',
+            field=models.ManyToManyField(through='quiz_app.QuizQuestion', to='quiz_app.question'),
+        ),
+        migrations.CreateModel(
+            name='QuestionCategory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(blank=True, default='', max_length=200)),
+                ('record_id', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('position', models.IntegerField(default=0, help_text='Position in the category list')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Question Categories',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['subject', 'position'], name='quiz_app_qu_subject_6e2355_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionAnswer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('matching_answer', models.JSONField(blank=True, help_text='Dictionary mapping left items to right items', null=True)),
+                ('user_answer', models.JSONField(blank=True, default=dict)),
+                ('order', models.IntegerField(default=0)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('points_earned', models.FloatField(default=0)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quiz_app.quizattempt')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz_app.question')),
+                ('selected_choices', models.ManyToManyField(blank=True, to='quiz_app.choiceoption')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='quiz_app.questioncategory'),
+        ),
+        migrations.CreateModel(
+            name='MatchingPair',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('record_id', models.CharField(max_length=100)),
+                ('left_item', models.CharField(help_text='Term or item on the left', max_length=500)),
+                ('right_item', models.CharField(help_text='Matching description on the right', max_length=500)),
+                ('correct_match', models.IntegerField(default=0, help_text='Index of the correct entry in matching_definitions')),
+                ('order', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matching_pairs', to='quiz_app.question')),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='choiceoption',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choices', to='quiz_app.question'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['subject', 'position'], name='quiz_app_qu_subject_f34a07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['subject', 'quiz_record_id', 'position'], name='quiz_app_qu_subject_d57612_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['subject', 'position'], name='quiz_app_qu_subject_d4b227_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='questionanswer',
+            unique_together={('attempt', 'question')},
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', 'position'], name='quiz_app_qu_subject_72e9f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', 'category_record_id'], name='quiz_app_qu_subject_2057a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', 'question_type'], name='quiz_app_qu_subject_9aec73_idx'),
+        ),
+    ]
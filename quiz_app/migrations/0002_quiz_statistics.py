@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:25
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStatistics',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(blank=True, default='', max_length=200)),
+                ('quiz_record_id', models.CharField(max_length=100)),
+                ('data', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name_plural': 'Quiz Statistics',
+            },
+        ),
+    ]
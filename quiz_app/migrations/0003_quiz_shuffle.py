@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0002_quiz_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='shuffle',
+            field=models.CharField(choices=[('none', 'Fixed order'), ('questions', 'Shuffle questions'), ('all', 'Shuffle questions and options')], default='none', help_text='Question order shown to each student', max_length=20),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def copy_question_record_ids(apps, schema_editor):
+    """Fill question_record_id from the linked questions"""
+    Question = apps.get_model('quiz_app', 'Question')
+    record_id = Subquery(Question.objects.filter(id=OuterRef('question_id')).values('record_id')[:1])
+    for model_name in ('QuestionAnswer', 'QuizQuestion'):
+        apps.get_model('quiz_app', model_name).objects.update(question_record_id=record_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0003_quiz_shuffle'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='questionanswer',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizquestion',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='questionanswer',
+            name='question_record_id',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='extra',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='question_record_id',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='questionanswer',
+            name='question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='quiz_app.question'),
+        ),
+        migrations.AlterField(
+            model_name='quizquestion',
+            name='question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quiz_questions', to='quiz_app.question'),
+        ),
+        migrations.RunPython(copy_question_record_ids, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='questionanswer',
+            unique_together={('attempt', 'question_record_id')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizquestion',
+            unique_together={('quiz', 'question_record_id')},
+        ),
+    ]
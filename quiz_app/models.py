@@ -1,18 +1,31 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import uuid
 
+# These models back quiz_app.orm_storage.ORMStorage. Every record belongs to a
+# subject ('' for the root data/ folder), mirroring the data/<subject>/ layout.
+# Subjects copied from one another share record ids, so `record_id` keeps the
+# id used by the JSON records and the primary key is derived from
+# (subject, record_id), see orm_storage.row_id().
+
 
 class QuestionCategory(models.Model):
     """Category/Group for organizing questions"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=200, blank=True, default='')
+    record_id = models.CharField(max_length=100)
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    position = models.IntegerField(default=0, help_text="Position in the category list")
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name_plural = "Question Categories"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['subject', 'position']),
+        ]
     
     def __str__(self):
         return self.name
@@ -27,17 +40,29 @@ class Question(models.Model):
     )
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=200, blank=True, default='')
+    record_id = models.CharField(max_length=100)
     question_text = models.TextField()
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES)
     category = models.ForeignKey(QuestionCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='questions')
+    # Category id as recorded, kept even when it names a category that is gone
+    category_record_id = models.CharField(max_length=100, blank=True, null=True)
     explanation = models.TextField(help_text="Explanation for the correct answer", blank=True)
     image = models.ImageField(upload_to='question_images/', blank=True, null=True)
     points = models.IntegerField(default=1, validators=[MinValueValidator(1)])
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # All definitions shown for a matching question, including distractors
+    matching_definitions = models.JSONField(default=list, blank=True)
+    position = models.IntegerField(default=0, help_text="Position in the question bank")
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subject', 'position']),
+            models.Index(fields=['subject', 'category_record_id']),
+            models.Index(fields=['subject', 'question_type']),
+        ]
     
     def __str__(self):
         return f"{self.get_question_type_display()}: {self.question_text[:50]}"
@@ -47,6 +72,7 @@ class ChoiceOption(models.Model):
     """Options for single and multiple choice questions"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='choices')
+    record_id = models.CharField(max_length=100)
     option_text = models.CharField(max_length=500)
     is_correct = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
@@ -62,8 +88,10 @@ class MatchingPair(models.Model):
     """Pairs for matching questions"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='matching_pairs')
+    record_id = models.CharField(max_length=100)
     left_item = models.CharField(max_length=500, help_text="Term or item on the left")
     right_item = models.CharField(max_length=500, help_text="Matching description on the right")
+    correct_match = models.IntegerField(default=0, help_text="Index of the correct entry in matching_definitions")
     order = models.IntegerField(default=0)
     
     class Meta:
@@ -76,18 +104,30 @@ class MatchingPair(models.Model):
 class Quiz(models.Model):
     """Quiz/Exam model"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=200, blank=True, default='')
+    record_id = models.CharField(max_length=100)
     title = models.CharField(max_length=300)
     description = models.TextField(blank=True)
     instructions = models.TextField(blank=True)
     time_limit = models.IntegerField(help_text="Time limit in minutes", null=True, blank=True)
     questions = models.ManyToManyField(Question, through='QuizQuestion')
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Fields of the quiz record without a column of their own (e.g. generation_seed)
+    extra = models.JSONField(default=dict, blank=True)
+    position = models.IntegerField(default=0, help_text="Position in the quiz list")
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
     is_published = models.BooleanField(default=False)
+    shuffle = models.CharField(max_length=20, default='none',
+                               choices=[('none', 'Fixed order'), ('questions', 'Shuffle questions'),
+                                        ('all', 'Shuffle questions and options')],
+                               help_text="Question order shown to each student")
     
     class Meta:
         verbose_name_plural = "Quizzes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subject', 'position']),
+        ]
     
     def __str__(self):
         return self.title
@@ -100,13 +140,15 @@ class QuizQuestion(models.Model):
     """Through model for Quiz-Question relationship with additional fields"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='quiz_questions')
-    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='quiz_questions')
+    # Quizzes keep the entries of deleted questions, like in the JSON storage
+    question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True, related_name='quiz_questions')
+    question_record_id = models.CharField(max_length=100, default='')
     order = models.IntegerField(default=0)
     points = models.IntegerField(default=1, validators=[MinValueValidator(1)], help_text="Points for this question in this quiz")
     
     class Meta:
         ordering = ['order', 'id']
-        unique_together = ['quiz', 'question']
+        unique_together = ['quiz', 'question_record_id']
     
     def __str__(self):
         return f"{self.quiz.title} - Question {self.order}"
@@ -115,24 +157,38 @@ class QuizQuestion(models.Model):
 class QuizAttempt(models.Model):
     """Record of a user taking a quiz"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
+    subject = models.CharField(max_length=200, blank=True, default='')
+    record_id = models.CharField(max_length=100)
+    # Attempts outlive their quiz, like in the JSON storage
+    quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts')
+    quiz_record_id = models.CharField(max_length=100)
     student_name = models.CharField(max_length=200, blank=True)
-    started_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    total_points = models.FloatField(default=0)
+    earned_points = models.FloatField(default=0)
+    position = models.IntegerField(default=0, help_text="Position in the attempt history")
     
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['subject', 'position']),
+            models.Index(fields=['subject', 'quiz_record_id', 'position']),
+        ]
     
     def __str__(self):
-        return f"Attempt for {self.quiz.title} by {self.student_name or 'Anonymous'}"
+        quiz_title = self.quiz.title if self.quiz else self.quiz_record_id
+        return f"Attempt for {quiz_title} by {self.student_name or 'Anonymous'}"
 
 
 class QuestionAnswer(models.Model):
     """User's answer to a question in a quiz attempt"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
-    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    # Answers outlive their question, like in the JSON storage
+    question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True)
+    question_record_id = models.CharField(max_length=100, default='')
     
     # For choice questions
     selected_choices = models.ManyToManyField(ChoiceOption, blank=True)
@@ -140,11 +196,31 @@ class QuestionAnswer(models.Model):
     # For matching questions (JSON field storing pairs)
     matching_answer = models.JSONField(null=True, blank=True, help_text="Dictionary mapping left items to right items")
     
+    # The answer exactly as submitted (choice ids may outlive the choices they name)
+    user_answer = models.JSONField(default=dict, blank=True)
+    order = models.IntegerField(default=0)
+    
     is_correct = models.BooleanField(default=False)
     points_earned = models.FloatField(default=0)
     
     class Meta:
-        unique_together = ['attempt', 'question']
+        ordering = ['order']
+        unique_together = ['attempt', 'question_record_id']
+    
+    def __str__(self):
+        return f"Answer to {self.question or self.question_record_id} in {self.attempt}"
+
+
+class QuizStatistics(models.Model):
+    """Running aggregates over the attempts of a quiz (see quiz_app/analytics.py)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=200, blank=True, default='')
+    quiz_record_id = models.CharField(max_length=100)
+    # Same record as one entry of analytics.json in the JSON storage
+    data = models.JSONField(default=dict)
+    
+    class Meta:
+        verbose_name_plural = "Quiz Statistics"
     
     def __str__(self):
-        return f"Answer to {self.question} in {self.attempt}"
+        return f"Statistics for {self.quiz_record_id}"
@@ -0,0 +1,907 @@
+"""
+ORM Storage Module for Quiz System
+This module implements the JSONStorage interface on top of the Django models,
+so large question banks and attempt histories are served by indexed queries
+instead of whole-file scans. Select it with
+QUIZ_STORAGE_BACKEND = 'quiz_app.orm_storage.ORMStorage' in settings.py and
+load existing data with 'python manage.py import_json_storage'.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .analytics import add_attempt, build_stats, new_quiz_stats
+from .catalog import RECENT_ATTEMPTS, recent_attempt
+from .grading import AnswerKey, compile_answer_key
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, paginate
+from .search import SearchIndex, tokenize
+from .storage import answer_keys
+from .models import (
+    ChoiceOption, MatchingPair, Question, QuestionAnswer, QuestionCategory,
+    Quiz, QuizAttempt, QuizQuestion, QuizStatistics,
+)
+
+
+# Namespace for the primary keys derived from (subject, record id)
+ROW_ID_NAMESPACE = uuid.UUID('5b0c7a3e-8f4d-4d43-9a8e-2f3c1d6b7e10')
+
+# Category columns rewritten when save_categories() updates an existing category
+UPDATED_CATEGORY_FIELDS = ['name', 'description']
+
+# Quiz columns rewritten when save_quizzes() updates an existing quiz
+UPDATED_QUIZ_FIELDS = [
+    'title', 'description', 'instructions', 'time_limit', 'is_published', 'shuffle', 'extra', 'updated_at',
+]
+
+# Quiz record fields with a column (or table) of their own, the others are kept in Quiz.extra
+QUIZ_FIELDS = {
+    'id', 'title', 'description', 'instructions', 'time_limit', 'is_published', 'shuffle', 'questions',
+    'created_at', 'updated_at',
+}
+
+# Question columns rewritten when save_questions() updates an existing question
+UPDATED_QUESTION_FIELDS = [
+    'question_text', 'question_type', 'category', 'category_record_id', 'explanation', 'image',
+    'points', 'matching_definitions', 'updated_at',
+]
+
+
+def row_id(subject: str, record_id: str) -> uuid.UUID:
+    """Get the primary key of the row holding a record of a subject"""
+    return uuid.uuid5(ROW_ID_NAMESPACE, f'{subject}/{record_id}')
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """Parse an ISO timestamp from the JSON records into an aware datetime"""
+    if not value:
+        return None
+    if not isinstance(value, datetime):
+        value = parse_datetime(str(value))
+        if value is None:
+            return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def to_isoformat(value: Optional[datetime]) -> Optional[str]:
+    """Format a datetime the way the JSON records store it (naive local time)"""
+    if not value:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value)
+    return value.isoformat()
+
+
+class ORMStorage:
+    """Handle quiz data stored in the database through the Django ORM"""
+    
+    def __init__(self, subject: str = None):
+        """
+        Initialize storage with optional subject parameter.
+        Records of the root data/ folder are stored with an empty subject.
+        """
+        self.subject = subject or ''
+    
+    def row_id(self, record_id: str) -> uuid.UUID:
+        """Get the primary key of the row holding a record of this subject"""
+        return row_id(self.subject, record_id)
+    
+    # Record conversion
+    def _category_to_dict(self, category: QuestionCategory) -> Dict:
+        return {
+            'id': category.record_id,
+            'name': category.name,
+            'description': category.description,
+        }
+    
+    def _question_to_dict(self, question: Question) -> Dict:
+        data = {
+            'id': question.record_id,
+            'question_text': question.question_text,
+            'question_type': question.question_type,
+            'category_id': question.category_record_id,
+            'explanation': question.explanation,
+            'points': question.points,
+            'created_at': to_isoformat(question.created_at),
+            'updated_at': to_isoformat(question.updated_at),
+        }
+        if question.image:
+            data['image'] = question.image.name
+        if question.question_type == 'matching':
+            data['matching_pairs'] = [
+                {
+                    'id': pair.record_id,
+                    'left_item': pair.left_item,
+                    'right_item': pair.right_item,
+                    'correct_match': pair.correct_match,
+                    'order': pair.order,
+                }
+                for pair in question.matching_pairs.all()
+            ]
+            data['matching_definitions'] = question.matching_definitions
+        else:
+            data['choices'] = [
+                {
+                    'id': choice.record_id,
+                    'option_text': choice.option_text,
+                    'is_correct': choice.is_correct,
+                    'order': choice.order,
+                }
+                for choice in question.choices.all()
+            ]
+        return data
+    
+    def _quiz_to_dict(self, quiz: Quiz) -> Dict:
+        return {
+            **quiz.extra,
+            'id': quiz.record_id,
+            'title': quiz.title,
+            'description': quiz.description,
+            'instructions': quiz.instructions,
+            'time_limit': quiz.time_limit,
+            'is_published': quiz.is_published,
+            'shuffle': quiz.shuffle,
+            'questions': [
+                {
+                    'id': qq.question_record_id,
+                    'text': qq.question.question_text if qq.question else '',
+                    'order': qq.order,
+                    'points': qq.points,
+                }
+                for qq in quiz.quiz_questions.all()
+            ],
+            'created_at': to_isoformat(quiz.created_at),
+            'updated_at': to_isoformat(quiz.updated_at),
+        }
+    
+    def _attempt_to_dict(self, attempt: QuizAttempt) -> Dict:
+        return {
+            'id': attempt.record_id,
+            'quiz_id': attempt.quiz_record_id,
+            'student_name': attempt.student_name,
+            'started_at': to_isoformat(attempt.started_at),
+            'completed_at': to_isoformat(attempt.completed_at),
+            'score': attempt.score,
+            'total_points': attempt.total_points,
+            'earned_points': attempt.earned_points,
+            'answers': [
+                {
+                    'question_id': answer.question_record_id,
+                    'user_answer': answer.user_answer,
+                    'is_correct': answer.is_correct,
+                    'points_earned': answer.points_earned,
+                }
+                for answer in attempt.answers.all()
+            ],
+        }
+    
+    def _questions(self):
+        return (Question.objects.filter(subject=self.subject)
+                .order_by('position')
+                .prefetch_related('choices', 'matching_pairs'))
+    
+    def _quizzes(self):
+        quiz_questions = (QuizQuestion.objects.order_by('order', 'id')
+                          .select_related('question').only('quiz_id', 'order', 'points', 'question_record_id',
+                                                           'question__question_text'))
+        return (Quiz.objects.filter(subject=self.subject)
+                .order_by('position')
+                .prefetch_related(Prefetch('quiz_questions', queryset=quiz_questions)))
+    
+    def _attempts(self):
+        answers = QuestionAnswer.objects.only(
+            'attempt_id', 'user_answer', 'is_correct', 'points_earned', 'order', 'question_record_id')
+        return (QuizAttempt.objects.filter(subject=self.subject)
+                .order_by('position')
+                .prefetch_related(Prefetch('answers', queryset=answers)))
+    
+    def _next_position(self, model) -> int:
+        last = model.objects.filter(subject=self.subject).aggregate(last=Max('position'))['last']
+        return 0 if last is None else last + 1
+    
+    def _save_row(self, row, exists: bool):
+        # Primary keys are derived, so tell Django whether the row is already stored
+        # (otherwise a model whose pk has a default is always INSERTed)
+        row._state.adding = not exists
+        row.save(force_update=exists, force_insert=not exists)
+    
+    def _existing(self, model, record_ids) -> set:
+        """Get the row ids among the given record ids that exist (references may dangle in JSON data)"""
+        row_ids = {self.row_id(record_id) for record_id in record_ids if record_id}
+        return set(model.objects.filter(id__in=row_ids).values_list('id', flat=True))
+    
+    # Category operations
+    def get_categories(self) -> List[Dict]:
+        """Get all categories"""
+        categories = QuestionCategory.objects.filter(subject=self.subject).order_by('position')
+        return [self._category_to_dict(c) for c in categories]
+    
+    def get_category(self, category_id: str) -> Optional[Dict]:
+        """Get a specific category by ID"""
+        category = QuestionCategory.objects.filter(id=self.row_id(category_id)).first()
+        return self._category_to_dict(category) if category else None
+    
+    def _category_row(self, category_data: Dict, position: int) -> QuestionCategory:
+        return QuestionCategory(
+            id=self.row_id(category_data['id']),
+            subject=self.subject,
+            record_id=category_data['id'],
+            name=category_data.get('name') or '',
+            description=category_data.get('description') or '',
+            position=position,
+            created_at=to_datetime(category_data.get('created_at')) or timezone.now(),
+        )
+    
+    def save_category(self, category_data: Dict) -> Dict:
+        """Save a new category or update existing one"""
+        with transaction.atomic():
+            existing = QuestionCategory.objects.filter(id=self.row_id(category_data['id'])).first()
+            position = existing.position if existing else self._next_position(QuestionCategory)
+            row = self._category_row(category_data, position)
+            if existing:
+                row.created_at = existing.created_at
+            self._save_row(row, exists=existing is not None)
+        return category_data
+    
+    def save_categories(self, categories: List[Dict], batch_size: int = 500) -> int:
+        """
+        Save many new or updated categories with bulk queries (e.g. the new
+        categories of an import). Returns the number of stored categories.
+        """
+        categories = list({c['id']: c for c in categories}.values())
+        with transaction.atomic():
+            row_ids = [self.row_id(c['id']) for c in categories]
+            existing = {row.id: row for row in QuestionCategory.objects.filter(id__in=row_ids)
+                        .only('id', 'position', 'created_at')}
+            next_position = self._next_position(QuestionCategory)
+            
+            new_rows, updated_rows = [], []
+            for row_id, category_data in zip(row_ids, categories):
+                stored = existing.get(row_id)
+                if stored is None:
+                    new_rows.append(self._category_row(category_data, next_position))
+                    next_position += 1
+                else:
+                    row = self._category_row(category_data, stored.position)
+                    row.created_at = stored.created_at
+                    updated_rows.append(row)
+            
+            QuestionCategory.objects.bulk_create(new_rows, batch_size=batch_size)
+            QuestionCategory.objects.bulk_update(updated_rows, UPDATED_CATEGORY_FIELDS, batch_size=batch_size)
+            return QuestionCategory.objects.filter(subject=self.subject).count()
+    
+    def delete_category(self, category_id: str) -> bool:
+        """Delete a category"""
+        QuestionCategory.objects.filter(id=self.row_id(category_id)).delete()
+        return True
+    
+    # Question operations
+    def get_questions(self, filters: Optional[Dict] = None) -> List[Dict]:
+        """Get all questions with optional filters"""
+        questions = self._questions()
+        filters = filters or {}
+        if 'category_id' in filters:
+            questions = questions.filter(category_record_id=filters['category_id'])
+        if 'question_type' in filters:
+            questions = questions.filter(question_type=filters['question_type'])
+        if 'search' not in filters:
+            return [self._question_to_dict(q) for q in questions]
+        
+        terms = tokenize(filters['search'])
+        if not terms:
+            # No words to look up (e.g. only punctuation): match the text as is
+            questions = questions.filter(question_text__icontains=filters['search'])
+            return [self._question_to_dict(q) for q in questions]
+        
+        # Narrow down in SQL to questions containing every word somewhere, then
+        # match and rank them like the JSON storage's search index does
+        for term in terms:
+            questions = questions.filter(
+                Q(question_text__icontains=term) | Q(explanation__icontains=term)
+                | Q(choices__option_text__icontains=term) | Q(matching_pairs__left_item__icontains=term)
+                | Q(matching_pairs__right_item__icontains=term) | Q(matching_definitions__icontains=term)
+            ).distinct()
+        candidates = [self._question_to_dict(q) for q in questions]
+        positions = {q['id']: i for i, q in enumerate(candidates)}
+        matches = SearchIndex.build(candidates).search(filters['search'], positions)
+        return [candidates[positions[question_id]] for question_id in matches]
+    
+    def get_questions_page(self, filters: Optional[Dict] = None, cursor: Optional[str] = None,
+                           limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """
+        Get one page of the filtered questions: the questions, the total
+        count and the cursor of the next page (None on the last one)
+        """
+        filters = filters or {}
+        if 'search' in filters:
+            # Ranking needs every match anyway
+            return paginate(self.get_questions(filters), cursor, limit)
+        
+        questions = self._questions().order_by('position', 'id')
+        if 'category_id' in filters:
+            questions = questions.filter(category_record_id=filters['category_id'])
+        if 'question_type' in filters:
+            questions = questions.filter(question_type=filters['question_type'])
+        total = questions.count()
+        
+        # Seek past the last question seen; skip by offset only if it's gone
+        offset, last_id = decode_cursor(cursor)
+        last = None
+        if last_id is not None:
+            last = (Question.objects.filter(id=self.row_id(last_id), subject=self.subject)
+                    .values('position', 'id').first())
+        if last is not None:
+            rest = questions.filter(Q(position__gt=last['position'])
+                                    | Q(position=last['position'], id__gt=last['id']))
+            offset = total - rest.count()
+            rows = list(rest[:limit])
+        else:
+            rows = list(questions[offset:offset + limit])
+        
+        page = [self._question_to_dict(q) for q in rows]
+        end = offset + len(page)
+        return {
+            'questions': page,
+            'total': total,
+            'next_cursor': encode_cursor(end, page[-1]['id']) if page and end < total else None,
+        }
+    
+    def get_question(self, question_id: str) -> Optional[Dict]:
+        """Get a specific question by ID"""
+        question = self._questions().filter(id=self.row_id(question_id)).first()
+        return self._question_to_dict(question) if question else None
+    
+    def get_questions_by_ids(self, question_ids: List[str]) -> List[Dict]:
+        """Get several questions in one query, in the given order (unknown IDs are skipped)"""
+        rows = self._questions().filter(id__in=[self.row_id(i) for i in question_ids])
+        questions = {q.record_id: q for q in rows}
+        return [self._question_to_dict(questions[i]) for i in question_ids if i in questions]
+    
+    def _question_row(self, question_data: Dict, position: int, categories: set) -> Question:
+        category_row_id = self.row_id(question_data['category_id']) if question_data.get('category_id') else None
+        return Question(
+            id=self.row_id(question_data['id']),
+            subject=self.subject,
+            record_id=question_data['id'],
+            question_text=question_data.get('question_text') or '',
+            question_type=question_data.get('question_type') or '',
+            category_id=category_row_id if category_row_id in categories else None,
+            category_record_id=question_data.get('category_id'),
+            explanation=question_data.get('explanation') or '',
+            image=question_data.get('image') or None,
+            points=question_data.get('points', 1),
+            matching_definitions=question_data.get('matching_definitions', []),
+            position=position,
+            created_at=to_datetime(question_data.get('created_at')) or timezone.now(),
+            updated_at=to_datetime(question_data.get('updated_at')) or timezone.now(),
+        )
+    
+    def _choice_rows(self, question_data: Dict) -> List[ChoiceOption]:
+        return [
+            ChoiceOption(id=self.row_id(c['id']), question_id=self.row_id(question_data['id']),
+                         record_id=c['id'], option_text=c.get('option_text', ''),
+                         is_correct=bool(c.get('is_correct')), order=c.get('order', i))
+            for i, c in enumerate(question_data.get('choices', []))
+        ]
+    
+    def _pair_rows(self, question_data: Dict) -> List[MatchingPair]:
+        return [
+            MatchingPair(id=self.row_id(p['id']), question_id=self.row_id(question_data['id']),
+                         record_id=p['id'], left_item=p.get('left_item', ''),
+                         right_item=p.get('right_item', ''), correct_match=p.get('correct_match', 0),
+                         order=p.get('order', i))
+            for i, p in enumerate(question_data.get('matching_pairs', []))
+        ]
+    
+    def save_question(self, question_data: Dict) -> Dict:
+        """Save a new question or update existing one"""
+        # Add timestamps
+        if 'created_at' not in question_data:
+            question_data['created_at'] = datetime.now().isoformat()
+        question_data['updated_at'] = datetime.now().isoformat()
+        
+        with transaction.atomic():
+            row_id = self.row_id(question_data['id'])
+            existing = Question.objects.filter(id=row_id).values_list('position', flat=True).first()
+            position = existing if existing is not None else self._next_position(Question)
+            categories = self._existing(QuestionCategory, [question_data.get('category_id')])
+            self._save_row(self._question_row(question_data, position, categories), exists=existing is not None)
+            ChoiceOption.objects.filter(question_id=row_id).delete()
+            MatchingPair.objects.filter(question_id=row_id).delete()
+            ChoiceOption.objects.bulk_create(self._choice_rows(question_data))
+            MatchingPair.objects.bulk_create(self._pair_rows(question_data))
+        return question_data
+    
+    def save_questions(self, questions: List[Dict], batch_size: int = 500) -> int:
+        """
+        Save many new or updated questions with bulk queries (e.g. a bulk
+        import). Updated questions keep their position. Returns the number
+        of stored questions.
+        """
+        now = datetime.now().isoformat()
+        for question_data in questions:
+            question_data.setdefault('created_at', now)
+            question_data['updated_at'] = now
+        
+        questions = list({q['id']: q for q in questions}.values())
+        with transaction.atomic():
+            row_ids = [self.row_id(q['id']) for q in questions]
+            positions = dict(Question.objects.filter(id__in=row_ids).values_list('id', 'position'))
+            next_position = self._next_position(Question)
+            categories = self._existing(QuestionCategory, {q.get('category_id') for q in questions})
+            
+            new_rows, updated_rows = [], []
+            for row_id, question_data in zip(row_ids, questions):
+                position = positions.get(row_id)
+                if position is None:
+                    new_rows.append(self._question_row(question_data, next_position, categories))
+                    next_position += 1
+                else:
+                    updated_rows.append(self._question_row(question_data, position, categories))
+            
+            # Updated questions keep their rows (quizzes and answers refer to them),
+            # their choices and pairs are replaced
+            Question.objects.bulk_create(new_rows, batch_size=batch_size)
+            Question.objects.bulk_update(updated_rows, UPDATED_QUESTION_FIELDS, batch_size=batch_size)
+            ChoiceOption.objects.filter(question_id__in=positions).delete()
+            MatchingPair.objects.filter(question_id__in=positions).delete()
+            ChoiceOption.objects.bulk_create(
+                [row for q in questions for row in self._choice_rows(q)], batch_size=batch_size)
+            MatchingPair.objects.bulk_create(
+                [row for q in questions for row in self._pair_rows(q)], batch_size=batch_size)
+            return Question.objects.filter(subject=self.subject).count()
+    
+    def delete_question(self, question_id: str) -> bool:
+        """Delete a question"""
+        Question.objects.filter(id=self.row_id(question_id)).delete()
+        return True
+    
+    def get_question_strata(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Get (id, category id, question type) of every question, in bank order"""
+        return list(Question.objects.filter(subject=self.subject).order_by('position')
+                    .values_list('record_id', 'category_record_id', 'question_type'))
+    
+    def update_questions(self, question_ids: List[str], changes: Dict) -> int:
+        """Apply the same field changes to many questions with bulk queries, returns the number updated"""
+        questions = [dict(q, **changes) for q in self.get_questions_by_ids(list(dict.fromkeys(question_ids)))]
+        if questions:
+            self.save_questions(questions)
+        return len(questions)
+    
+    def delete_questions(self, question_ids: List[str]) -> int:
+        """Delete many questions with one query, returns the number deleted"""
+        _, deleted = Question.objects.filter(id__in=[self.row_id(i) for i in question_ids]).delete()
+        return deleted.get(Question._meta.label, 0)
+    
+    # Quiz operations
+    def get_quizzes(self) -> List[Dict]:
+        """Get all quizzes"""
+        return [self._quiz_to_dict(q) for q in self._quizzes()]
+    
+    def get_quiz(self, quiz_id: str) -> Optional[Dict]:
+        """Get a specific quiz by ID"""
+        quiz = self._quizzes().filter(id=self.row_id(quiz_id)).first()
+        return self._quiz_to_dict(quiz) if quiz else None
+    
+    def _quiz_row(self, quiz_data: Dict, position: int) -> Quiz:
+        return Quiz(
+            id=self.row_id(quiz_data['id']),
+            subject=self.subject,
+            record_id=quiz_data['id'],
+            title=quiz_data.get('title') or '',
+            description=quiz_data.get('description') or '',
+            instructions=quiz_data.get('instructions') or '',
+            time_limit=quiz_data.get('time_limit'),
+            is_published=bool(quiz_data.get('is_published')),
+            shuffle=quiz_data.get('shuffle') or 'none',
+            extra={field: value for field, value in quiz_data.items() if field not in QUIZ_FIELDS},
+            position=position,
+            created_at=to_datetime(quiz_data.get('created_at')) or timezone.now(),
+            updated_at=to_datetime(quiz_data.get('updated_at')) or timezone.now(),
+        )
+    
+    def _quiz_question_ids(self, quiz_data: Dict) -> List[str]:
+        # Handle both 'id' and 'question_id' for backward compatibility
+        return [q.get('id') or q.get('question_id') for q in quiz_data.get('questions', [])]
+    
+    def _quiz_question_rows(self, quiz_data: Dict, questions: set) -> List[QuizQuestion]:
+        rows, seen = [], set()
+        for i, q in enumerate(quiz_data.get('questions', [])):
+            question_id = q.get('id') or q.get('question_id')
+            if not question_id or question_id in seen:
+                continue
+            seen.add(question_id)
+            question_row_id = self.row_id(question_id)
+            # Entries of questions deleted from the bank are kept (the quiz views skip them)
+            rows.append(QuizQuestion(quiz_id=self.row_id(quiz_data['id']),
+                                     question_id=question_row_id if question_row_id in questions else None,
+                                     question_record_id=question_id, order=q.get('order', i),
+                                     points=q.get('points', 1)))
+        return rows
+    
+    def save_quiz(self, quiz_data: Dict) -> Dict:
+        """Save a new quiz or update existing one"""
+        # Add timestamps
+        if 'created_at' not in quiz_data:
+            quiz_data['created_at'] = datetime.now().isoformat()
+        quiz_data['updated_at'] = datetime.now().isoformat()
+        
+        with transaction.atomic():
+            row_id = self.row_id(quiz_data['id'])
+            existing = Quiz.objects.filter(id=row_id).values_list('position', flat=True).first()
+            position = existing if existing is not None else self._next_position(Quiz)
+            self._save_row(self._quiz_row(quiz_data, position), exists=existing is not None)
+            questions = self._existing(Question, self._quiz_question_ids(quiz_data))
+            QuizQuestion.objects.filter(quiz_id=row_id).delete()
+            QuizQuestion.objects.bulk_create(self._quiz_question_rows(quiz_data, questions))
+        return quiz_data
+    
+    def save_quizzes(self, quizzes: List[Dict], batch_size: int = 500) -> int:
+        """
+        Save many new or updated quizzes with bulk queries (e.g. generated
+        exam variants). Returns the number of stored quizzes.
+        """
+        now = datetime.now().isoformat()
+        for quiz_data in quizzes:
+            quiz_data.setdefault('created_at', now)
+            quiz_data['updated_at'] = now
+        
+        quizzes = list({q['id']: q for q in quizzes}.values())
+        with transaction.atomic():
+            row_ids = [self.row_id(q['id']) for q in quizzes]
+            positions = dict(Quiz.objects.filter(id__in=row_ids).values_list('id', 'position'))
+            next_position = self._next_position(Quiz)
+            questions = self._existing(Question, {i for q in quizzes for i in self._quiz_question_ids(q)})
+            
+            new_rows, updated_rows = [], []
+            for row_id, quiz_data in zip(row_ids, quizzes):
+                position = positions.get(row_id)
+                if position is None:
+                    new_rows.append(self._quiz_row(quiz_data, next_position))
+                    next_position += 1
+                else:
+                    updated_rows.append(self._quiz_row(quiz_data, position))
+            
+            Quiz.objects.bulk_create(new_rows, batch_size=batch_size)
+            Quiz.objects.bulk_update(updated_rows, UPDATED_QUIZ_FIELDS, batch_size=batch_size)
+            QuizQuestion.objects.filter(quiz_id__in=positions).delete()
+            QuizQuestion.objects.bulk_create(
+                [row for q in quizzes for row in self._quiz_question_rows(q, questions)], batch_size=batch_size)
+            return Quiz.objects.filter(subject=self.subject).count()
+    
+    def add_questions_to_quiz(self, quiz_id: str, question_ids: List[str], points: Optional[int] = None) -> int:
+        """
+        Append questions to a quiz with bulk queries, skipping questions it
+        already has. Each question is worth `points`, or its own points when
+        not given. Returns the number of added questions.
+        """
+        quiz_row_id = self.row_id(quiz_id)
+        with transaction.atomic():
+            if not Quiz.objects.filter(id=quiz_row_id).exists():
+                return 0
+            links = QuizQuestion.objects.filter(quiz_id=quiz_row_id)
+            present = set(links.values_list('question_record_id', flat=True))
+            order = (links.aggregate(last=Max('order'))['last'] or 0) + 1
+            question_ids = list(dict.fromkeys(question_ids))
+            question_points = dict(Question.objects.filter(id__in=[self.row_id(i) for i in question_ids])
+                                   .values_list('record_id', 'points'))
+            
+            rows = []
+            for question_id in question_ids:
+                if question_id in question_points and question_id not in present:
+                    rows.append(QuizQuestion(quiz_id=quiz_row_id, question_id=self.row_id(question_id),
+                                             question_record_id=question_id, order=order + len(rows),
+                                             points=points if points is not None else question_points[question_id]))
+            if rows:
+                QuizQuestion.objects.bulk_create(rows)
+                Quiz.objects.filter(id=quiz_row_id).update(updated_at=timezone.now())
+            return len(rows)
+    
+    def delete_quiz(self, quiz_id: str) -> bool:
+        """Delete a quiz"""
+        Quiz.objects.filter(id=self.row_id(quiz_id)).delete()
+        return True
+    
+    def get_quiz_version(self, quiz_id: str) -> Optional[Hashable]:
+        """
+        Get a value that changes whenever the quiz or one of its questions is
+        saved, None if the quiz doesn't exist
+        """
+        # One aggregate query tells whether the quiz or any of its questions was saved since compiling
+        return (Quiz.objects.filter(id=self.row_id(quiz_id))
+                .annotate(questions_updated_at=Max('quiz_questions__question__updated_at'),
+                          # Counts the linked questions only, so deleting one changes the version
+                          question_count=Count('quiz_questions__question'))
+                .values_list('updated_at', 'questions_updated_at', 'question_count')
+                .first())
+    
+    def get_quiz_question_ids(self) -> List[List[str]]:
+        """Get the question ids of every quiz, the most recently created quiz first"""
+        quizzes = {quiz_id: [] for quiz_id in Quiz.objects.filter(subject=self.subject)
+                   .order_by('-created_at', 'position').values_list('id', flat=True)}
+        links = (QuizQuestion.objects.filter(quiz__subject=self.subject).order_by('order', 'id')
+                 .values_list('quiz_id', 'question_record_id'))
+        for quiz_id, question_id in links:
+            quizzes[quiz_id].append(question_id)
+        return list(quizzes.values())
+    
+    def get_bank_version(self) -> Tuple[Hashable, Hashable]:
+        """
+        Get values that change whenever any question, and whenever any quiz,
+        is saved or deleted
+        """
+        questions = Question.objects.filter(subject=self.subject).aggregate(
+            count=Count('id'), updated_at=Max('updated_at'))
+        quizzes = Quiz.objects.filter(subject=self.subject).aggregate(
+            count=Count('id'), updated_at=Max('updated_at'))
+        return (questions['count'], questions['updated_at']), (quizzes['count'], quizzes['updated_at'])
+    
+    def get_answer_key(self, quiz_id: str) -> Optional[AnswerKey]:
+        """Get the compiled grading key of a quiz, rebuilt only after the quiz or its questions change"""
+        version = self.get_quiz_version(quiz_id)
+        if version is None:
+            return None
+        
+        def build():
+            quiz = self.get_quiz(quiz_id)
+            return compile_answer_key(quiz, self.get_questions_by_ids([q['id'] for q in quiz['questions']]))
+        
+        return answer_keys.get(('orm', self.subject, quiz_id), version, build)
+    
+    # Quiz Attempt operations
+    def get_attempts(self, quiz_id: Optional[str] = None) -> List[Dict]:
+        """Get all attempts, optionally filtered by quiz_id"""
+        attempts = self._attempts()
+        if quiz_id:
+            attempts = attempts.filter(quiz_record_id=quiz_id)
+        return [self._attempt_to_dict(a) for a in attempts]
+    
+    def iter_attempts(self, quiz_id: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """Iterate over all attempts, optionally filtered by quiz_id, fetching batch_size rows at a time"""
+        attempts = self._attempts()
+        if quiz_id:
+            attempts = attempts.filter(quiz_record_id=quiz_id)
+        for attempt in attempts.iterator(chunk_size=batch_size):
+            yield self._attempt_to_dict(attempt)
+    
+    def get_attempt(self, attempt_id: str) -> Optional[Dict]:
+        """Get a specific attempt by ID"""
+        attempt = self._attempts().filter(id=self.row_id(attempt_id)).first()
+        return self._attempt_to_dict(attempt) if attempt else None
+    
+    def _attempt_row(self, attempt_data: Dict, position: int, quizzes: set) -> QuizAttempt:
+        quiz_row_id = self.row_id(attempt_data['quiz_id'])
+        return QuizAttempt(
+            id=self.row_id(attempt_data['id']),
+            subject=self.subject,
+            record_id=attempt_data['id'],
+            quiz_id=quiz_row_id if quiz_row_id in quizzes else None,
+            quiz_record_id=attempt_data['quiz_id'],
+            student_name=attempt_data.get('student_name') or '',
+            started_at=to_datetime(attempt_data.get('started_at')) or timezone.now(),
+            completed_at=to_datetime(attempt_data.get('completed_at')),
+            score=attempt_data.get('score'),
+            total_points=attempt_data.get('total_points', 0),
+            earned_points=attempt_data.get('earned_points', 0),
+            position=position,
+        )
+    
+    def _answer_rows(self, attempt_data: Dict, questions: set) -> List[QuestionAnswer]:
+        rows, seen = [], set()
+        for i, answer in enumerate(attempt_data.get('answers', [])):
+            question_id = answer['question_id']
+            if question_id in seen:
+                continue
+            seen.add(question_id)
+            question_row_id = self.row_id(question_id)
+            user_answer = answer.get('user_answer') or {}
+            # Answers to questions deleted from the bank are kept, so the attempt still adds up
+            rows.append(QuestionAnswer(
+                attempt_id=self.row_id(attempt_data['id']),
+                question_id=question_row_id if question_row_id in questions else None,
+                question_record_id=question_id,
+                matching_answer=user_answer.get('matching_answer'),
+                user_answer=user_answer,
+                order=i,
+                is_correct=bool(answer.get('is_correct')),
+                points_earned=answer.get('points_earned', 0),
+            ))
+        return rows
+    
+    def save_attempt(self, attempt_data: Dict) -> Dict:
+        """Save a new attempt or update existing one"""
+        # Add timestamp
+        if 'started_at' not in attempt_data:
+            attempt_data['started_at'] = datetime.now().isoformat()
+        
+        with transaction.atomic():
+            row_id = self.row_id(attempt_data['id'])
+            existing = QuizAttempt.objects.filter(id=row_id).values_list('position', flat=True).first()
+            position = existing if existing is not None else self._next_position(QuizAttempt)
+            quizzes = self._existing(Quiz, [attempt_data['quiz_id']])
+            previous = self.get_attempt(attempt_data['id']) if existing is not None else None
+            self._save_row(self._attempt_row(attempt_data, position, quizzes), exists=existing is not None)
+            questions = self._existing(Question, [a['question_id'] for a in attempt_data.get('answers', [])])
+            QuestionAnswer.objects.filter(attempt_id=row_id).delete()
+            QuestionAnswer.objects.bulk_create(self._answer_rows(attempt_data, questions))
+            self._update_stats([(previous, -1), (attempt_data, 1)])
+        return attempt_data
+    
+    def save_attempts(self, attempts: List[Dict], batch_size: int = 500) -> int:
+        """
+        Save many new or updated attempts with bulk queries (e.g. after a
+        regrade). Updated attempts keep their position. Returns the number
+        of stored attempts.
+        """
+        attempts = list({a['id']: a for a in attempts}.values())
+        with transaction.atomic():
+            row_ids = [self.row_id(a['id']) for a in attempts]
+            previous = [self._attempt_to_dict(a) for a in self._attempts().filter(id__in=row_ids)]
+            positions = dict(QuizAttempt.objects.filter(id__in=row_ids).values_list('id', 'position'))
+            next_position = self._next_position(QuizAttempt)
+            quizzes = self._existing(Quiz, {a['quiz_id'] for a in attempts})
+            questions = self._existing(Question, {ans['question_id'] for a in attempts for ans in a.get('answers', [])})
+            
+            rows = []
+            for row_id, attempt_data in zip(row_ids, attempts):
+                position = positions.get(row_id)
+                if position is None:
+                    position = positions[row_id] = next_position
+                    next_position += 1
+                rows.append(self._attempt_row(attempt_data, position, quizzes))
+            
+            # Replacing the rows (answers cascade) is one delete plus bulk inserts
+            QuizAttempt.objects.filter(id__in=row_ids).delete()
+            QuizAttempt.objects.bulk_create(rows, batch_size=batch_size)
+            QuestionAnswer.objects.bulk_create(
+                [row for a in attempts for row in self._answer_rows(a, questions)], batch_size=batch_size)
+            self._update_stats([(a, -1) for a in previous] + [(a, 1) for a in attempts])
+            return QuizAttempt.objects.filter(subject=self.subject).count()
+    
+    def append_attempts(self, attempts: List[Dict]) -> int:
+        """
+        Save many new attempts (e.g. a batch of queued submissions) with bulk
+        queries. Returns the number of saved attempts.
+        """
+        if not attempts:
+            return 0
+        now = datetime.now().isoformat()
+        for attempt_data in attempts:
+            attempt_data.setdefault('started_at', now)
+        self.save_attempts(attempts)
+        return len(attempts)
+    
+    def compact_attempts(self, min_logged: int = 0) -> int:
+        """Nothing to compact in the database, returns the number of attempts"""
+        return QuizAttempt.objects.filter(subject=self.subject).count()
+    
+    # Quiz analytics
+    def get_quiz_stats(self, quiz_id: str) -> Optional[Dict]:
+        """Get the running aggregates of a quiz's attempts"""
+        return QuizStatistics.objects.filter(id=self.row_id(quiz_id)).values_list('data', flat=True).first()
+    
+    def _update_stats(self, changes):
+        """Apply (attempt, sign) changes to the running aggregates, inside the saving transaction"""
+        by_quiz = {}
+        for attempt, sign in changes:
+            if attempt is not None:
+                by_quiz.setdefault(attempt['quiz_id'], []).append((attempt, sign))
+        if not by_quiz:
+            return
+        
+        rows = {row.quiz_record_id: row for row in QuizStatistics.objects.select_for_update()
+                .filter(id__in=[self.row_id(quiz_id) for quiz_id in by_quiz])}
+        for quiz_id, quiz_changes in by_quiz.items():
+            row = rows.get(quiz_id) or QuizStatistics(id=self.row_id(quiz_id), subject=self.subject,
+                                                      quiz_record_id=quiz_id, data=new_quiz_stats(quiz_id))
+            for attempt, sign in quiz_changes:
+                add_attempt(row.data, attempt, sign)
+            self._save_row(row, exists=quiz_id in rows)
+    
+    # Subject manifest
+    def get_manifest(self) -> Dict:
+        """
+        Get the record counts, question counts per type and per category,
+        last modification times and latest attempts of this subject
+        """
+        questions = Question.objects.filter(subject=self.subject)
+        quizzes = Quiz.objects.filter(subject=self.subject)
+        categories = QuestionCategory.objects.filter(subject=self.subject)
+        attempts = QuizAttempt.objects.filter(subject=self.subject)
+        
+        recent = (attempts.select_related('quiz').only('record_id', 'quiz_record_id', 'score', 'started_at',
+                                                       'completed_at', 'quiz__title')
+                  .order_by(F('completed_at').desc(nulls_last=True), '-started_at')[:RECENT_ATTEMPTS])
+        modified = {
+            'questions': questions.aggregate(Max('updated_at'), Max('created_at')),
+            'quizzes': quizzes.aggregate(Max('updated_at'), Max('created_at')),
+            'categories': categories.aggregate(Max('created_at')),
+            'attempts': attempts.aggregate(Max('started_at'), Max('completed_at')),
+        }
+        return {
+            'questions': questions.count(),
+            'quizzes': quizzes.count(),
+            'categories': categories.count(),
+            'attempts': attempts.count(),
+            'questions_by_type': dict(questions.order_by().values_list('question_type').annotate(Count('id'))),
+            'questions_by_category': {
+                category_id or '': count for category_id, count in
+                questions.order_by().values_list('category_record_id').annotate(Count('id'))
+            },
+            'modified': {
+                name: to_isoformat(max(filter(None, values.values()), default=None))
+                for name, values in modified.items()
+            },
+            'recent_attempts': [
+                recent_attempt({
+                    'id': a.record_id,
+                    'quiz_id': a.quiz_record_id,
+                    'score': a.score,
+                    'started_at': to_isoformat(a.started_at),
+                    'completed_at': to_isoformat(a.completed_at),
+                }, a.quiz.title if a.quiz else None)
+                for a in recent
+            ],
+        }
+    
+    # Bulk import
+    def import_from(self, source, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Replace this subject's records with everything held by another storage
+        (typically a JSONStorage), using bulk inserts.
+        References to questions that no longer exist (in a quiz or in the
+        answers of an attempt) are kept, without a link to a question row.
+        """
+        categories = source.get_categories()
+        questions = source.get_questions()
+        quizzes = source.get_quizzes()
+        attempts = source.get_attempts()
+        quiz_ids = {self.row_id(q['id']) for q in quizzes}
+        category_ids = {self.row_id(c['id']) for c in categories}
+        question_ids = {self.row_id(q['id']) for q in questions}
+        
+        with transaction.atomic():
+            QuizAttempt.objects.filter(subject=self.subject).delete()
+            Quiz.objects.filter(subject=self.subject).delete()
+            Question.objects.filter(subject=self.subject).delete()
+            QuestionCategory.objects.filter(subject=self.subject).delete()
+            
+            QuestionCategory.objects.bulk_create(
+                [self._category_row(c, position) for position, c in enumerate(categories)],
+                batch_size=batch_size)
+            Question.objects.bulk_create(
+                [self._question_row(q, position, category_ids) for position, q in enumerate(questions)],
+                batch_size=batch_size)
+            ChoiceOption.objects.bulk_create(
+                [row for q in questions for row in self._choice_rows(q)], batch_size=batch_size)
+            MatchingPair.objects.bulk_create(
+                [row for q in questions for row in self._pair_rows(q)], batch_size=batch_size)
+            Quiz.objects.bulk_create(
+                [self._quiz_row(q, position) for position, q in enumerate(quizzes)], batch_size=batch_size)
+            QuizQuestion.objects.bulk_create(
+                [row for q in quizzes for row in self._quiz_question_rows(q, question_ids)], batch_size=batch_size)
+            QuizAttempt.objects.bulk_create(
+                [self._attempt_row(a, position, quiz_ids) for position, a in enumerate(attempts)],
+                batch_size=batch_size)
+            QuestionAnswer.objects.bulk_create(
+                [row for a in attempts for row in self._answer_rows(a, question_ids)], batch_size=batch_size)
+            
+            QuizStatistics.objects.filter(subject=self.subject).delete()
+            QuizStatistics.objects.bulk_create(
+                [QuizStatistics(id=self.row_id(quiz_id), subject=self.subject, quiz_record_id=quiz_id, data=stats)
+                 for quiz_id, stats in build_stats(attempts).items()],
+                batch_size=batch_size)
+        
+        return {
+            'categories': len(categories),
+            'questions': len(questions),
+            'quizzes': len(quizzes),
+            'attempts': len(attempts),
+        }
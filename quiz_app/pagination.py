@@ -0,0 +1,65 @@
+"""
+Pagination Module for Quiz System
+Cursor-based paging over question lists. A cursor records how far a client
+has read: the offset of the next record and the id of the last one it got.
+Paging resumes right after that record even when questions were added or
+deleted in between, so pages don't repeat or skip entries the way plain
+offsets would.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(offset: int, last_id: str) -> str:
+    """Build the cursor of the page starting after the given record"""
+    return f'{offset}:{last_id}'
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, Optional[str]]:
+    """Get the offset and last seen id of a cursor (0 and None for the first page)"""
+    if not cursor:
+        return 0, None
+    offset, _, last_id = cursor.partition(':')
+    try:
+        return max(int(offset), 0), last_id or None
+    except ValueError:
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+
+def page_size(limit) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def resume_position(records: Sequence[Dict], cursor: Optional[str]) -> int:
+    """Get the index in records of the first record after a cursor"""
+    offset, last_id = decode_cursor(cursor)
+    if last_id is None:
+        return min(offset, len(records))
+    # Usually nothing changed and the last record is still right before offset
+    if 0 < offset <= len(records) and records[offset - 1].get('id') == last_id:
+        return offset
+    for i, record in enumerate(records):
+        if record.get('id') == last_id:
+            return i + 1
+    # The last record is gone: fall back to the offset
+    return min(offset, len(records))
+
+
+def paginate(records: Sequence[Dict], cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+    """Get one page of records with the cursor of the next one"""
+    start = resume_position(records, cursor)
+    end = start + limit
+    page = list(records[start:end])
+    return {
+        'questions': page,
+        'total': len(records),
+        'next_cursor': encode_cursor(end, page[-1]['id']) if page and end < len(records) else None,
+    }
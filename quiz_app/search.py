@@ -0,0 +1,188 @@
+"""
+Search Module for Quiz System
+A tokenized inverted index over a question bank, covering the question
+text, choices, matching items and explanation. Queries match whole words
+and word prefixes, and results are ranked by where and how rarely the
+words occur.
+"""
+
+import bisect
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+TOKEN_RE = re.compile(r'\w+')
+
+# A word in the question text ranks above one in a choice, which ranks
+# above one in the explanation
+QUESTION_TEXT_WEIGHT = 3
+ITEM_WEIGHT = 2
+EXPLANATION_WEIGHT = 1
+
+# Words matched only by prefix score less than exact matches
+PREFIX_MATCH_FACTOR = 0.5
+# Shorter query words only match exactly, so 'a' doesn't expand to every word
+MIN_PREFIX_LENGTH = 2
+
+# Question fields question_terms() reads
+SEARCHABLE_FIELDS = frozenset({'question_text', 'choices', 'matching_pairs', 'matching_definitions', 'explanation'})
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def question_terms(question: Dict) -> Dict[str, int]:
+    """Get the weighted words of every searchable field of a question"""
+    weights = Counter()
+    for token in tokenize(question.get('question_text')):
+        weights[token] += QUESTION_TEXT_WEIGHT
+    for choice in question.get('choices', []):
+        for token in tokenize(choice.get('option_text')):
+            weights[token] += ITEM_WEIGHT
+    for pair in question.get('matching_pairs', []):
+        for token in tokenize(f"{pair.get('left_item') or ''} {pair.get('right_item') or ''}"):
+            weights[token] += ITEM_WEIGHT
+    for definition in question.get('matching_definitions', []):
+        for token in tokenize(definition.get('right_item')):
+            weights[token] += ITEM_WEIGHT
+    for token in tokenize(question.get('explanation')):
+        weights[token] += EXPLANATION_WEIGHT
+    return dict(weights)
+
+
+class SearchIndex:
+    """
+    Inverted index of question ids by word.
+    Postings map each word to the questions containing it with a weight;
+    the sorted vocabulary answers prefix queries with a binary search.
+    Add and remove keep both up to date, so saving one question doesn't
+    rebuild the index.
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.documents: Dict[str, List[str]] = {}
+        self.vocabulary: List[str] = []
+        # Version of the question file the index reflects (see JSONStorage)
+        self.version = None
+        self.lock = threading.RLock()
+    
+    @classmethod
+    def build(cls, questions: Iterable[Dict]) -> 'SearchIndex':
+        """Index every question of a question bank"""
+        index = cls()
+        for question in questions:
+            index._add_terms(question['id'], question_terms(question))
+        index.vocabulary = sorted(index.postings)
+        return index
+    
+    def _add_terms(self, question_id: str, terms: Dict[str, int]):
+        for token, weight in terms.items():
+            self.postings.setdefault(token, {})[question_id] = weight
+        self.documents[question_id] = list(terms)
+    
+    def add(self, question: Dict):
+        """Index a new question, or re-index a changed one"""
+        with self.lock:
+            self.remove(question['id'])
+            terms = question_terms(question)
+            for token in terms:
+                if token not in self.postings:
+                    bisect.insort(self.vocabulary, token)
+            self._add_terms(question['id'], terms)
+    
+    def remove(self, question_id: str):
+        """Drop a question from the index"""
+        with self.lock:
+            for token in self.documents.pop(question_id, []):
+                postings = self.postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(question_id, None)
+                if not postings:
+                    del self.postings[token]
+                    position = bisect.bisect_left(self.vocabulary, token)
+                    if position < len(self.vocabulary) and self.vocabulary[position] == token:
+                        del self.vocabulary[position]
+    
+    def _term_scores(self, term: str) -> Dict[str, float]:
+        """Score the questions matching one query word, exactly or by prefix"""
+        scores = {}
+        total = len(self.documents)
+        if len(term) < MIN_PREFIX_LENGTH:
+            tokens = [term] if term in self.postings else []
+        else:
+            tokens = []
+            position = bisect.bisect_left(self.vocabulary, term)
+            while position < len(self.vocabulary) and self.vocabulary[position].startswith(term):
+                tokens.append(self.vocabulary[position])
+                position += 1
+        
+        for token in tokens:
+            postings = self.postings[token]
+            # Rare words weigh more (inverse document frequency)
+            factor = math.log(1 + total / len(postings))
+            if token != term:
+                factor *= PREFIX_MATCH_FACTOR
+            for question_id, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(question_id, 0):
+                    scores[question_id] = score
+        return scores
+    
+    def search(self, query: str, positions: Optional[Dict[str, int]] = None) -> Optional[List[str]]:
+        """
+        Get the ids of the questions matching every word of a query, best
+        match first (ties keep the order given by positions). Returns None
+        for a query without any words.
+        """
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return None
+        
+        with self.lock:
+            scores = None
+            for term in terms:
+                term_scores = self._term_scores(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {q: score + term_scores[q] for q, score in scores.items() if q in term_scores}
+                if not scores:
+                    return []
+        
+        positions = positions or {}
+        return sorted(scores, key=lambda q: (-scores[q], positions.get(q, 0)))
+    
+    def to_dict(self) -> Dict:
+        """Serialize the index compactly: postings refer to questions by number"""
+        with self.lock:
+            question_ids = list(self.documents)
+            numbers = {question_id: i for i, question_id in enumerate(question_ids)}
+            return {
+                'questions': question_ids,
+                'postings': {
+                    token: [value for question_id, weight in postings.items()
+                            for value in (numbers[question_id], weight)]
+                    for token, postings in self.postings.items()
+                },
+            }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SearchIndex':
+        """Load an index serialized with to_dict()"""
+        index = cls()
+        question_ids = data['questions']
+        index.documents = {question_id: [] for question_id in question_ids}
+        for token, values in data['postings'].items():
+            postings = index.postings[token] = {}
+            for i in range(0, len(values), 2):
+                question_id = question_ids[values[i]]
+                postings[question_id] = values[i + 1]
+                index.documents[question_id].append(token)
+        index.vocabulary = sorted(index.postings)
+        return index
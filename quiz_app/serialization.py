@@ -0,0 +1,350 @@
+"""
+Serialization Module for Quiz System
+On-disk formats of the storage files, chosen with QUIZ_STORAGE_FORMAT:
+- 'json': indented JSON, readable and git-friendly (the default)
+- 'compact': JSON without whitespace, in which matching questions store
+  each definition text once (a pair whose right item is one of the
+  question's definitions refers to it by position)
+- 'msgpack': the compact form as MessagePack (needs the msgpack package)
+Reading detects the format, so a data folder can mix formats while it is
+being converted (see the convert_storage command).
+JSON text goes through a codec: orjson when it is installed, the stdlib
+json module otherwise, with the same output either way.
+"""
+
+import codecs
+import json
+from typing import Any, Dict, Iterator, List, Union
+
+try:
+    import msgpack
+except ImportError:  # Optional: only the 'msgpack' format needs it
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib json module is used instead
+    orjson = None
+
+FORMATS = ('json', 'compact', 'msgpack')
+DEFAULT_FORMAT = 'json'
+
+# Marks a file holding packed records instead of a plain list
+PACKED_FORMAT = 'compact'
+PACKED_PREFIX = b'{"format":"' + PACKED_FORMAT.encode() + b'","records":'
+
+# Chunk size of the streaming readers
+READ_SIZE = 64 * 1024
+
+
+class DecodeError(ValueError):
+    """Raised for a storage file that can't be decoded"""
+
+
+class JSONCodec:
+    """
+    Serializes with the stdlib json module: UTF-8 output, values json
+    can't handle (datetimes) written as str()
+    """
+    name = 'json'
+    
+    def dumps(self, data: Any, indent: bool = False) -> bytes:
+        """Serialize to UTF-8, indented by two spaces or without any whitespace"""
+        if indent:
+            text = json.dumps(data, ensure_ascii=False, default=str, indent=2)
+        else:
+            text = json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':'))
+        return text.encode('utf-8')
+    
+    def loads(self, raw: Union[bytes, str]) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonCodec(JSONCodec):
+    """Serializes with orjson, producing the same output as JSONCodec"""
+    name = 'orjson'
+    # orjson writes datetimes in its own ISO format: hand them to str() like json
+    OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+    
+    def dumps(self, data: Any, indent: bool = False) -> bytes:
+        options = (self.OPTIONS | orjson.OPT_INDENT_2) if indent else self.OPTIONS
+        try:
+            return orjson.dumps(data, default=str, option=options)
+        except TypeError:
+            # Integers beyond 64 bits: json copes with those
+            return super().dumps(data, indent)
+    
+    def loads(self, raw: Union[bytes, str]) -> Any:
+        return orjson.loads(raw)
+
+
+CODECS = {'json': JSONCodec, 'orjson': OrjsonCodec}
+
+
+def available_codecs() -> List[str]:
+    """Get the codecs that can be used with the installed packages"""
+    return [name for name in CODECS if name != 'orjson' or orjson is not None]
+
+
+def get_codec(name: str = None) -> JSONCodec:
+    """Get a codec by name, by default the fastest installed one"""
+    if name is None:
+        name = available_codecs()[-1]
+    if name not in available_codecs():
+        raise ValueError(f'JSON codec not available: {name}')
+    return CODECS[name]()
+
+
+codec = get_codec()
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """Serialize to JSON with the installed codec"""
+    return codec.dumps(data, indent)
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Parse JSON with the installed codec (raises ValueError on invalid JSON)"""
+    return codec.loads(raw)
+
+
+def available_formats() -> List[str]:
+    """Get the formats that can be written with the installed packages"""
+    return [f for f in FORMATS if f != 'msgpack' or msgpack is not None]
+
+
+def pack_record(record: Dict) -> Dict:
+    """Replace the right items of matching pairs by the position of the same definition"""
+    definitions = record.get('matching_definitions')
+    pairs = record.get('matching_pairs')
+    if not definitions or not pairs:
+        return record
+    
+    positions = {}
+    for i, definition in enumerate(definitions):
+        positions.setdefault(definition.get('right_item'), i)
+    
+    packed_pairs = []
+    for pair in pairs:
+        position = positions.get(pair.get('right_item'))
+        if position is None or 'right_ref' in pair:
+            packed_pairs.append(pair)
+        else:
+            # Keep the key order, so unpacking restores the pair exactly
+            packed = {}
+            for key, value in pair.items():
+                if key == 'right_item':
+                    packed['right_ref'] = position
+                else:
+                    packed[key] = value
+            packed_pairs.append(packed)
+    return dict(record, matching_pairs=packed_pairs)
+
+
+def unpack_record(record: Dict) -> Dict:
+    """Undo pack_record() on a freshly decoded record (in place)"""
+    pairs = record.get('matching_pairs')
+    if pairs and any('right_ref' in pair for pair in pairs):
+        definitions = record.get('matching_definitions') or []
+        unpacked_pairs = []
+        for pair in pairs:
+            unpacked = {}
+            for key, value in pair.items():
+                if key == 'right_ref':
+                    unpacked['right_item'] = definitions[value].get('right_item')
+                else:
+                    unpacked[key] = value
+            unpacked_pairs.append(unpacked)
+        record['matching_pairs'] = unpacked_pairs
+    return record
+
+
+def encode(data: Any, file_format: str = DEFAULT_FORMAT) -> bytes:
+    """Serialize the contents of a storage file (a list of records, or any JSON value)"""
+    if file_format == 'json':
+        return dumps(data, indent=True)
+    
+    if isinstance(data, list):
+        data = {'format': PACKED_FORMAT, 'records': [pack_record(r) if isinstance(r, dict) else r for r in data]}
+    if file_format == 'compact':
+        return dumps(data)
+    if file_format == 'msgpack':
+        if msgpack is None:
+            raise ValueError("The 'msgpack' storage format needs the msgpack package")
+        return msgpack.packb(data, default=str, use_bin_type=True)
+    raise ValueError(f'Unknown storage format: {file_format}')
+
+
+def detect_format(raw: bytes) -> str:
+    """Tell the format of a storage file from its contents"""
+    head = raw[:64].lstrip()
+    if not head or head[:1] not in b'[{':
+        return 'msgpack' if head else 'json'
+    if head[:1] == b'{' and head.startswith(b'{"format":"' + PACKED_FORMAT.encode()):
+        return 'compact'
+    return 'json'
+
+
+def decode(raw: bytes) -> Any:
+    """Parse a storage file written in any of the formats"""
+    if detect_format(raw) == 'msgpack':
+        if msgpack is None:
+            raise DecodeError('File is in MessagePack format, which needs the msgpack package')
+        try:
+            data = msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        except ValueError as e:
+            raise DecodeError(f'Invalid MessagePack data: {e}')
+    else:
+        data = loads(raw)
+    
+    if isinstance(data, dict) and data.get('format') == PACKED_FORMAT and isinstance(data.get('records'), list):
+        try:
+            return [unpack_record(r) if isinstance(r, dict) else r for r in data['records']]
+        except (IndexError, TypeError, AttributeError) as e:
+            raise DecodeError(f'Invalid packed record: {e}')
+    return data
+
+
+def iter_json_array(stream, read_size: int = READ_SIZE, suffix: str = '') -> Iterator[Any]:
+    """
+    Parse a JSON array from a binary stream element by element, reading it
+    in chunks. Anything but a comma between elements, or after the closing
+    bracket and the given suffix, raises a DecodeError naming the line.
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, position, eof = '', 0, False
+    # Line number at buffer[counted]
+    line, counted = 1, 0
+    number = 0
+    
+    def fill():
+        nonlocal buffer, position, eof, line, counted
+        line += buffer.count('\n', counted, position)
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + reader.decode(chunk or b'', final=eof)
+        position = counted = 0
+    
+    def line_at(offset: int) -> int:
+        nonlocal line, counted
+        line += buffer.count('\n', counted, offset)
+        counted = offset
+        return line
+    
+    def next_char() -> str:
+        """Skip whitespace up to the next character ('' at the end of the input)"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                return ''
+            fill()
+    
+    def error(message: str) -> DecodeError:
+        return DecodeError(f'{message} at line {line_at(position)}')
+    
+    if next_char() != '[':
+        raise DecodeError('JSON input must be an array')
+    position += 1
+    if next_char() == ']':
+        position += 1
+    else:
+        while True:
+            if not next_char():
+                raise error('Unexpected end of the JSON input')
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        error_line = line_at(position) + buffer.count('\n', position, e.pos)
+                        raise DecodeError(f'Invalid JSON in record {number + 1} at line {error_line}: {e.msg}')
+                    fill()
+                    continue
+                # A number at the end of the buffer may go on in the next chunk
+                if end < len(buffer) or eof:
+                    break
+                fill()
+            position = end
+            number += 1
+            yield record
+            
+            char = next_char()
+            if not char:
+                raise error('Unexpected end of the JSON input')
+            if char not in ',]':
+                raise error(f'Missing comma after record {number}')
+            position += 1
+            if char == ']':
+                break
+    
+    for char in suffix:
+        if next_char() != char:
+            raise error(f'Expected {char!r} after the array')
+        position += 1
+    if next_char():
+        raise error('Unexpected data after the end of the array')
+
+
+def _unpacked(records: Iterator[Any]) -> Iterator[Any]:
+    for record in records:
+        try:
+            yield unpack_record(record) if isinstance(record, dict) else record
+        except (IndexError, TypeError, AttributeError) as e:
+            raise DecodeError(f'Invalid packed record: {e}')
+
+
+def _iter_msgpack_records(f, head: bytes) -> Iterator[Any]:
+    if msgpack is None:
+        raise DecodeError('File is in MessagePack format, which needs the msgpack package')
+    unpacker = msgpack.Unpacker(f, raw=False, strict_map_key=False)
+    try:
+        if head[0] in (0xdc, 0xdd) or 0x90 <= head[0] <= 0x9f:
+            for _ in range(unpacker.read_array_header()):
+                yield unpacker.unpack()
+            return
+        # The packed form: {'format': 'compact', 'records': [...]}
+        if head[0] == 0x82 and unpacker.unpack() == 'format' and unpacker.unpack() == PACKED_FORMAT \
+                and unpacker.unpack() == 'records':
+            yield from _unpacked(unpacker.unpack() for _ in range(unpacker.read_array_header()))
+            return
+    except (ValueError, msgpack.exceptions.UnpackException) as e:
+        raise DecodeError(f'Invalid MessagePack data: {e}')
+    
+    f.seek(0)
+    yield from _decoded_records(f)
+
+
+def _decoded_records(f) -> Iterator[Any]:
+    data = decode(f.read())
+    if isinstance(data, list):
+        yield from data
+
+
+def iter_records(f) -> Iterator[Any]:
+    """
+    Read the records of a storage file (a seekable binary file) one at a
+    time, in any of the formats, so a large file is never held in memory
+    as a whole. Files of an unexpected shape are decoded whole.
+    """
+    head = f.read(64)
+    f.seek(0)
+    file_format = detect_format(head)
+    if file_format == 'msgpack':
+        yield from _iter_msgpack_records(f, head)
+        return
+    
+    if file_format == 'compact':
+        start = head.find(PACKED_PREFIX)
+        if start >= 0 and not head[:start].strip():
+            f.seek(start + len(PACKED_PREFIX))
+            yield from _unpacked(iter_json_array(f, suffix='}'))
+            return
+    elif head.lstrip(b' \t\r\n' + codecs.BOM_UTF8)[:1] == b'[':
+        yield from iter_json_array(f)
+        return
+    yield from _decoded_records(f)
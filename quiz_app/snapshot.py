@@ -0,0 +1,218 @@
+"""
+Snapshot Module for Quiz System
+A quiz is compiled once per version into the snapshot that quiz_take
+renders: questions resolved in quiz order, choices in their display order,
+points and image sources attached, and everything that would give the
+answers away (correct flags, matching answers, explanations) stripped.
+Snapshots are cached per process like answer keys, and keep the rendered
+HTML of each question (quiz_take_question.html) once it was rendered, and
+of the whole question list when every student sees the same order.
+
+Quizzes can show their questions (and options) in a different order to each
+student. Each question is ranked by a hash of the attempt id and its
+question id (each option by the attempt, question and option ids), so the
+order is never stored: quiz_take, quiz_submit and quiz_results all derive
+it from the attempt id and the question ids stored with the attempt. Edits
+to the quiz leave the relative order of an attempt's questions unchanged.
+"""
+
+import hashlib
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from .images import image_sources
+from .storage import VersionedCache
+
+# Quiz fields the quiz page shows
+QUIZ_FIELDS = ('id', 'title', 'description', 'instructions', 'time_limit', 'shuffle')
+
+# Question order of a quiz: fixed, questions shuffled per student, or
+# questions, choices and matching definitions shuffled per student
+SHUFFLE_MODES = ('none', 'questions', 'all')
+
+QUESTION_TEMPLATE = 'quiz_take_question.html'
+QUESTION_LIST_TEMPLATE = 'quiz_take_questions.html'
+# Markers around the option lists of a rendered question and before each option
+OPTIONS_START, OPTIONS_END, OPTION = '<!--options-->', '<!--/options-->', '<!--option-->'
+
+
+class QuestionFragment:
+    """
+    Rendered HTML of one question, split around its option lists so that
+    the options can be put in any order by joining strings
+    """
+    
+    def __init__(self, html: str):
+        # The HTML outside the option lists, and the options of each list
+        self.texts: List[str] = []
+        self.option_lists: List[List[str]] = []
+        while OPTIONS_START in html:
+            before, html = html.split(OPTIONS_START, 1)
+            options, html = html.split(OPTIONS_END, 1)
+            self.texts.append(before)
+            self.option_lists.append(options.split(OPTION))
+        self.texts.append(html)
+        # Every list (e.g. the select of each matching term) holds the same options
+        self.option_count = len(self.option_lists[0]) - 1 if self.option_lists else 0
+    
+    def render(self, order: Optional[Sequence[int]] = None) -> SafeString:
+        """The HTML with the options in the given order (as stored by default)"""
+        parts = [self.texts[0]]
+        for options, text in zip(self.option_lists, self.texts[1:]):
+            # options[0] is the whitespace before the first option
+            parts.append(options[0])
+            parts.extend(options[1:] if order is None else [options[1 + i] for i in order])
+            parts.append(text)
+        return mark_safe(''.join(parts))
+
+
+class AttemptQuestion(NamedTuple):
+    """A snapshot question as one student sees it"""
+    question: Dict
+    points: int
+    html: SafeString
+
+
+class QuizSnapshot:
+    """Compiled, answer-free form of a quiz for taking it"""
+    
+    def __init__(self, quiz: Dict, questions: List[Dict]):
+        self.quiz = {field: quiz.get(field) for field in QUIZ_FIELDS}
+        if self.quiz['shuffle'] not in SHUFFLE_MODES:
+            self.quiz['shuffle'] = 'none'
+        self.questions = tuple(questions)
+        self.total_points = sum(q['points'] for q in self.questions)
+        self._fragments: Dict[int, QuestionFragment] = {}
+        self._fragments_lock = threading.Lock()
+        self._fixed_html: Optional[SafeString] = None
+    
+    @property
+    def shuffle(self) -> str:
+        return self.quiz['shuffle']
+    
+    def question_order(self, attempt_id: Optional[str]) -> List[int]:
+        """Indexes of the snapshot questions in the order an attempt shows them"""
+        if self.shuffle == 'none' or not attempt_id:
+            return list(range(len(self.questions)))
+        return shuffled_order([entry['question']['id'] for entry in self.questions], attempt_id)
+    
+    def fragment(self, index: int) -> QuestionFragment:
+        """The rendered HTML of a question, rendered on first use"""
+        with self._fragments_lock:
+            fragment = self._fragments.get(index)
+        if fragment is None:
+            entry = self.questions[index]
+            question = entry['question']
+            options = question.get('choices') or question.get('matching_definitions') or []
+            fragment = QuestionFragment(render_to_string(QUESTION_TEMPLATE, {
+                'quiz_question': dict(entry, options=options),
+            }))
+            with self._fragments_lock:
+                self._fragments[index] = fragment
+        return fragment
+    
+    def attempt_questions(self, attempt_id: Optional[str]) -> List[AttemptQuestion]:
+        """The questions of an attempt in display order, options shuffled too in 'all' mode"""
+        shuffle_options = self.shuffle == 'all' and attempt_id
+        questions = []
+        for index in self.question_order(attempt_id):
+            entry = self.questions[index]
+            fragment = self.fragment(index)
+            order = None
+            if shuffle_options and fragment.option_count > 1:
+                keys = option_keys(entry['question'])
+                if len(keys) != fragment.option_count:
+                    keys = [str(i) for i in range(fragment.option_count)]
+                order = shuffled_order(keys, attempt_id, entry['question']['id'])
+            questions.append(AttemptQuestion(entry['question'], entry['points'], fragment.render(order)))
+        return questions
+    
+    def render(self, attempt_id: Optional[str]) -> SafeString:
+        """The HTML of the question list of an attempt"""
+        if self.shuffle != 'none' and attempt_id:
+            return render_to_string(QUESTION_LIST_TEMPLATE, {'quiz_questions': self.attempt_questions(attempt_id)})
+        # Every student sees the same list
+        if self._fixed_html is None:
+            self._fixed_html = render_to_string(QUESTION_LIST_TEMPLATE, {'quiz_questions': self.attempt_questions(None)})
+        return self._fixed_html
+
+
+def shuffled_order(keys: Sequence[str], *seed: str) -> List[int]:
+    """
+    Indexes of keys in a random order that is the same for the same seed.
+    Each key is ranked on its own (SHA-256, not hash(): stable across
+    processes), so adding or removing keys doesn't reorder the others.
+    """
+    prefix = ':'.join(seed) + ':'
+    ranks = [hashlib.sha256((prefix + key).encode('utf-8')).digest() for key in keys]
+    return sorted(range(len(keys)), key=ranks.__getitem__)
+
+
+def option_keys(question: Dict) -> List[str]:
+    """Stable keys of a public question's options: choice ids, or definition indexes"""
+    if 'choices' in question:
+        return [choice['id'] for choice in question['choices']]
+    return [str(definition['index']) for definition in question.get('matching_definitions', [])]
+
+
+def public_question(question_data: Dict) -> Dict:
+    """The parts of a question a student may see"""
+    question = {
+        'id': question_data['id'],
+        'question_text': question_data.get('question_text', ''),
+        'question_type': question_data['question_type'],
+    }
+    if question['question_type'] in ('single_choice', 'multiple_choice'):
+        choices = sorted(question_data.get('choices', []), key=lambda c: c.get('order', 0))
+        question['choices'] = [{'id': c['id'], 'option_text': c['option_text']} for c in choices]
+    elif question['question_type'] == 'matching':
+        pairs = question_data.get('matching_pairs', [])
+        # Answers are posted as positions in these lists, so their order is kept as stored
+        question['matching_pairs'] = [{'left_item': p['left_item']} for p in pairs]
+        definitions = question_data.get('matching_definitions') or pairs
+        # 'index' is the value posted for a definition, wherever it is shown
+        question['matching_definitions'] = [{'index': i, 'right_item': d['right_item']}
+                                            for i, d in enumerate(definitions)]
+    return question
+
+
+def compile_snapshot(quiz: Dict, questions: List[Dict]) -> QuizSnapshot:
+    """
+    Compile the snapshot of a quiz from full question records; quiz
+    entries whose question is missing are skipped
+    """
+    questions_by_id = {question['id']: question for question in questions}
+    entries = []
+    for q in quiz.get('questions', []):
+        # Handle both 'id' and 'question_id' for backward compatibility
+        question_data = questions_by_id.get(q.get('id') or q.get('question_id'))
+        if question_data is not None:
+            entries.append({
+                'question': public_question(question_data),
+                'points': q.get('points', 1),
+                'image': image_sources(question_data.get('image')),
+            })
+    return QuizSnapshot(quiz, entries)
+
+
+# Snapshots shared by every storage instance in this process
+_snapshots = VersionedCache()
+
+
+def get_snapshot(subject_storage, quiz_id: str) -> Optional[QuizSnapshot]:
+    """Get the snapshot of a quiz, compiled again only after the quiz or its questions change"""
+    version = subject_storage.get_quiz_version(quiz_id)
+    if version is None:
+        return None
+    
+    def build():
+        quiz = subject_storage.get_quiz(quiz_id)
+        return compile_snapshot(quiz, subject_storage.get_questions_by_ids(
+            [q.get('id') or q.get('question_id') for q in quiz.get('questions', [])]))
+    
+    # The data folder of JSON storage, the subject of the database
+    source = getattr(subject_storage, 'storage_dir', subject_storage.subject)
+    return _snapshots.get((type(subject_storage).__name__, str(source), quiz_id), version, build)
@@ -3,12 +3,391 @@ JSON Storage Module for Quiz System
 This module handles reading and writing data to JSON files instead of a traditional database.
 """
 
-import json
+import copy
+import itertools
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, FrozenSet, Hashable, List, Any, Callable, Iterator, Optional, Tuple
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .analytics import add_attempt, build_stats, new_quiz_stats
+from .catalog import (
+    COLLECTIONS, add_recent_attempt, group_counts, latest_attempts, latest_timestamp, recent_attempt,
+)
+from .grading import AnswerKey, compile_answer_key
+from .pagination import DEFAULT_PAGE_SIZE, paginate
+from .search import SEARCHABLE_FIELDS, SearchIndex
+from .serialization import DEFAULT_FORMAT, available_formats, decode, dumps, encode, iter_records, loads
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+
+# Parsed file cache shared by every JSONStorage instance in this process.
+# Entries are validated against the file's (inode, size, mtime_ns) so writes
+# made by other worker processes are picked up on the next read.
+_file_cache: Dict[str, 'CachedFile'] = {}
+_file_cache_lock = threading.RLock()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+# Process-wide counter stamping each state of a cached file (see CachedFile.version)
+_versions = itertools.count(1)
+
+
+def _file_signature(file_path: Path) -> Tuple[int, int, int]:
+    """Return the (inode, size, mtime_ns) triple used to validate cache entries"""
+    st = os.stat(file_path)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# Without fcntl, fall back to serializing the threads of this process
+_thread_locks: Dict[str, threading.Lock] = {}
+
+
+@contextmanager
+def file_lock(file_path: Path, shared: bool = False):
+    """
+    Hold an advisory lock on a data file for a read-modify-write sequence.
+    The lock lives on a separate '.<name>.lock' file next to the data file,
+    since the data file itself is replaced on every write. Shared holders
+    (e.g. attempt log appends) only exclude exclusive ones.
+    """
+    lock_path = file_path.with_name(f'.{file_path.name}.lock')
+    
+    if fcntl is None:
+        with _file_cache_lock:
+            thread_lock = _thread_locks.setdefault(str(lock_path), threading.Lock())
+        with thread_lock:
+            yield
+        return
+    
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def open_if_exists(file_path: Path):
+    """Open a data file for reading, None if it doesn't exist"""
+    try:
+        return open(file_path, 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def atomic_write(file_path: Path, content: bytes) -> os.stat_result:
+    """
+    Write to a temporary file that atomically replaces file_path, so
+    readers never see a half-written file. Returns the new file's stat.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f'.{file_path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return st
+
+
+def atomic_write_json(file_path: Path, data: Any, indent: bool = False) -> os.stat_result:
+    """Write JSON atomically (see atomic_write())"""
+    return atomic_write(file_path, dumps(data, indent))
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Get hit/miss counters for the shared JSON file cache"""
+    with _file_cache_lock:
+        return dict(_cache_stats, entries=len(_file_cache))
+
+
+def clear_cache():
+    """Drop every cached file and derived value, and reset the hit/miss counters"""
+    with _file_cache_lock:
+        _file_cache.clear()
+        _cache_stats['hits'] = 0
+        _cache_stats['misses'] = 0
+    for cache in _versioned_caches:
+        cache.clear()
+
+
+class CachedFile:
+    """
+    Parsed records of one JSON file plus lookup indexes.
+    The id index is built on first use; secondary indexes (records grouped
+    by a field such as category_id or quiz_id) are built on first use of
+    that field. Both are kept up to date incrementally by upsert/remove.
+    The version number changes on every modification and is unique across
+    files, so data derived from the records can be cached against it.
+    """
+    
+    def __init__(self, signature: Optional[Tuple[int, int, int]], records: List[Dict]):
+        self.signature = signature
+        self.records = records
+        self.version = next(_versions)
+        self._positions: Optional[Dict[str, int]] = None
+        self._groups: Dict[str, Dict[Any, List[Dict]]] = {}
+    
+    @property
+    def positions(self) -> Dict[str, int]:
+        """Map of record id to its position in the records list"""
+        if self._positions is None:
+            self._positions = {r['id']: i for i, r in enumerate(self.records) if 'id' in r}
+        return self._positions
+    
+    def get(self, record_id: str) -> Optional[Dict]:
+        """Get a record by id"""
+        position = self.positions.get(record_id)
+        return self.records[position] if position is not None else None
+    
+    def group(self, field: str) -> Dict[Any, List[Dict]]:
+        """Get records grouped by the value of a field"""
+        groups = self._groups.get(field)
+        if groups is None:
+            groups = {}
+            for record in self.records:
+                groups.setdefault(record.get(field), []).append(record)
+            self._groups[field] = groups
+        return groups
+    
+    def _ungroup(self, record: Dict):
+        for field, groups in self._groups.items():
+            bucket = groups.get(record.get(field))
+            if bucket is not None and any(r is record for r in bucket):
+                bucket[:] = [r for r in bucket if r is not record]
+            else:
+                # The cached record was modified in place since it was grouped
+                for bucket in groups.values():
+                    if any(r is record for r in bucket):
+                        bucket[:] = [r for r in bucket if r is not record]
+    
+    def _regroup(self, record: Dict):
+        for field, groups in self._groups.items():
+            groups.setdefault(record.get(field), []).append(record)
+    
+    def upsert(self, record: Dict) -> bool:
+        """Insert or replace a record by id, returns True if it was new"""
+        self.version = next(_versions)
+        position = self.positions.get(record['id'])
+        if position is None:
+            self.positions[record['id']] = len(self.records)
+            self.records.append(record)
+            self._regroup(record)
+            return True
+        
+        self._ungroup(self.records[position])
+        self.records[position] = record
+        self._regroup(record)
+        return False
+    
+    def remove(self, record_id: str) -> Optional[Dict]:
+        """Remove a record by id, returns the removed record"""
+        position = self.positions.get(record_id)
+        if position is None:
+            return None
+        self.version = next(_versions)
+        record = self.records.pop(position)
+        self._ungroup(record)
+        # Positions after the removed record shift; rebuild lazily
+        self._positions = None
+        return record
+    
+    def remove_many(self, record_ids) -> List[Dict]:
+        """Remove several records by id in one pass, returns the removed records"""
+        record_ids = set(record_ids)
+        removed = [r for r in self.records if r.get('id') in record_ids]
+        if removed:
+            self.version = next(_versions)
+            self.records[:] = [r for r in self.records if r.get('id') not in record_ids]
+            # Cheaper to rebuild the indexes lazily than to update them one by one
+            self._positions = None
+            self._groups = {}
+        return removed
+
+
+_versioned_caches: List['VersionedCache'] = []
+
+
+class VersionedCache:
+    """
+    Values derived from stored data (answer keys, quiz snapshots, generation
+    indexes), shared by every storage instance in this process. Each value
+    is stored with the version of the data it was built from, e.g. the
+    CachedFile.version of its source files, and built again once that
+    version changed.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+        _versioned_caches.append(self)
+    
+    def get(self, cache_key: Hashable, version: Hashable, build: Callable[[], Any]) -> Any:
+        """Get a value, rebuilding it when the version of its source data changed"""
+        with self._lock:
+            cached = self._entries.get(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        value = build()
+        with self._lock:
+            self._entries[cache_key] = (version, value)
+        return value
+    
+    def clear(self):
+        """Drop every value"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Compiled answer keys of every storage engine (see grading.py)
+answer_keys = VersionedCache()
+
+# Question search indexes are shared per subject, like the parsed file cache above
+_search_indexes: Dict[str, SearchIndex] = {}
+
+# Attempt logs are shared per file, like the parsed file cache above
+_attempt_logs: Dict[str, 'AttemptLog'] = {}
+
+# Number of logged attempts that triggers folding the log into attempts.json
+DEFAULT_ATTEMPT_LOG_COMPACT_AT = 500
+
+
+class AttemptLog:
+    """
+    Append-only JSON Lines log of attempts saved since the last compaction.
+    Each save appends one line with a single O_APPEND write. The log keeps an
+    index of attempt id to the byte offset of its latest line, and only the
+    new tail of the file is parsed when another process has appended to it.
+    A compaction replaces the log file, which readers detect by its inode.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.offsets: Dict[str, int] = {}
+        self._inode: Optional[int] = None
+        self._consumed = 0
+        self._merged: Optional[CachedFile] = None
+        self._snapshot: Optional[CachedFile] = None
+    
+    def _reset(self, inode: Optional[int]):
+        self.offsets = {}
+        self._inode = inode
+        self._consumed = 0
+        self._merged = None
+    
+    def _current_inode(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+    
+    def refresh(self):
+        """Index lines appended since the last refresh and apply them to the merged view"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._reset(None)
+            return
+        
+        if st.st_ino != self._inode or st.st_size < self._consumed:
+            self._reset(st.st_ino)
+        if st.st_size == self._consumed:
+            return
+        
+        with open(self.path, 'rb') as f:
+            f.seek(self._consumed)
+            tail = f.read(st.st_size - self._consumed)
+        
+        # Only consume complete lines, a concurrent append may still be in flight
+        offset = self._consumed
+        end = tail.rfind(b'\n') + 1
+        for line in tail[:end].splitlines(keepends=True):
+            if line.strip():
+                try:
+                    record = loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict) and 'id' in record:
+                    self.offsets[record['id']] = offset
+                    if self._merged is not None:
+                        self._merged.upsert(record)
+            offset += len(line)
+        self._consumed = offset
+    
+    def append(self, *records: Dict):
+        """Append records to the log with a single write"""
+        lines = b''.join(dumps(record) + b'\n' for record in records)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, lines)
+        finally:
+            os.close(fd)
+    
+    def read_at(self, offset: int) -> Optional[Dict]:
+        """Read the record stored at a byte offset of the log"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                return loads(f.readline())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def merged_with(self, load_snapshot: Callable[[], CachedFile]) -> CachedFile:
+        """Get the compacted snapshot with every logged attempt applied on top"""
+        for _ in range(3):
+            # A compaction writes the snapshot before replacing the log, so as
+            # long as the log is unchanged the snapshot holds no fewer records
+            inode = self._current_inode()
+            snapshot = load_snapshot()
+            self.refresh()
+            if self._inode != inode:
+                continue
+            if self._merged is None or self._snapshot is not snapshot:
+                # Re-read the whole log on top of the new snapshot
+                self._reset(inode)
+                self._merged = CachedFile(None, list(snapshot.records))
+                self._snapshot = snapshot
+                self.refresh()
+                if self._inode != inode:
+                    continue
+            return self._merged
+        return self._merged or CachedFile(None, list(snapshot.records))
+    
+    def truncate(self):
+        """Replace the log with an empty file once its records are compacted"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+        os.close(fd)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.path)
+        self._reset(os.stat(self.path).st_ino)
+
+
+def get_attempt_log(path: Path) -> AttemptLog:
+    """Get the shared attempt log object for a log file"""
+    with _file_cache_lock:
+        log = _attempt_logs.get(str(path))
+        if log is None:
+            log = _attempt_logs[str(path)] = AttemptLog(path)
+        return log
 
 
 class JSONStorage:
@@ -34,6 +413,15 @@ class JSONStorage:
             'quizzes': self.storage_dir / 'quizzes.json',
             'attempts': self.storage_dir / 'attempts.json',
         }
+        self.attempt_log = get_attempt_log(self.storage_dir / 'attempts.log.jsonl')
+        # Derived data, so not created empty like the data files
+        self.analytics_file = self.storage_dir / 'analytics.json'
+        self.search_index_file = self.storage_dir / 'search_index.json'
+        self.manifest_file = self.storage_dir / 'manifest.json'
+        self.file_format = getattr(settings, 'QUIZ_STORAGE_FORMAT', DEFAULT_FORMAT)
+        if self.file_format not in available_formats():
+            raise ImproperlyConfigured(f'Unsupported QUIZ_STORAGE_FORMAT: {self.file_format} '
+                                       f'(available: {", ".join(available_formats())})')
         self.ensure_data_files()
     
     def ensure_storage_directory(self):
@@ -46,18 +434,71 @@ class JSONStorage:
             if not file_path.exists():
                 self.write_json(file_path, [])
     
-    def read_json(self, file_path: Path) -> List[Dict]:
-        """Read data from JSON file"""
+    def load(self, file_path: Path, strict: bool = False) -> CachedFile:
+        """
+        Get the cached, indexed contents of a JSON file, re-parsing it only
+        when its signature changed since the last read.
+        The cached records are shared between instances, so callers must
+        treat them as read-only (copy a record before annotating it).
+        With strict=True an unparsable file raises instead of reading as
+        empty, so a read-modify-write never overwrites it with one record.
+        """
+        key = str(file_path)
+        try:
+            signature = _file_signature(file_path)
+        except FileNotFoundError:
+            return CachedFile(None, [])
+        
+        with _file_cache_lock:
+            cached = _file_cache.get(key)
+            if cached is not None and cached.signature == signature:
+                _cache_stats['hits'] += 1
+                return cached
+            _cache_stats['misses'] += 1
+        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            with open(file_path, 'rb') as f:
+                data = decode(f.read())
+        except FileNotFoundError:
+            return CachedFile(None, [])
+        except ValueError:
+            # Not valid in any storage format (see serialization.py)
+            if strict:
+                raise
+            return CachedFile(None, [])
+        
+        entry = CachedFile(signature, data)
+        with _file_cache_lock:
+            _file_cache[key] = entry
+        return entry
+    
+    def read_json(self, file_path: Path) -> List[Dict]:
+        """Read data from JSON file (cached, see load())"""
+        return self.load(file_path).records
     
     def write_json(self, file_path: Path, data: List[Dict]):
         """Write data to JSON file"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        self.commit(file_path, CachedFile(None, data))
+    
+    def commit(self, file_path: Path, entry: CachedFile):
+        """
+        Write a (possibly modified) cached file back to disk in the
+        QUIZ_STORAGE_FORMAT format.
+        The data goes to a temporary file that atomically replaces the
+        original, so readers never see a half-written file.
+        """
+        key = str(file_path)
+        try:
+            st = atomic_write(file_path, encode(entry.records, self.file_format))
+        except BaseException:
+            with _file_cache_lock:
+                _file_cache.pop(key, None)
+            raise
+        
+        # Keep the freshly written data and its indexes so the next read is a cache hit
+        entry.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with _file_cache_lock:
+            _file_cache[key] = entry
     
     # Category operations
     def get_categories(self) -> List[Dict]:
@@ -66,90 +507,245 @@ class JSONStorage:
     
     def get_category(self, category_id: str) -> Optional[Dict]:
         """Get a specific category by ID"""
-        categories = self.get_categories()
-        for category in categories:
-            if category['id'] == category_id:
-                return category
-        return None
+        return self.load(self.files['categories']).get(category_id)
     
     def save_category(self, category_data: Dict) -> Dict:
-        """Save a new category or update existing one"""
-        categories = self.get_categories()
-        
-        # Check if updating existing category
-        for i, cat in enumerate(categories):
-            if cat['id'] == category_data['id']:
-                categories[i] = category_data
-                self.write_json(self.files['categories'], categories)
-                return category_data
-        
-        # Add new category
-        categories.append(category_data)
-        self.write_json(self.files['categories'], categories)
+        """Save a new category or update existing one, returns the stored copy"""
+        category_data = dict(category_data)
+        with file_lock(self.files['categories']):
+            entry = self.load(self.files['categories'], strict=True)
+            entry.upsert(category_data)
+            self.commit(self.files['categories'], entry)
+            self._update_manifest('categories', entry)
         return category_data
     
+    def save_categories(self, categories: List[Dict]) -> int:
+        """
+        Save many new or updated categories with a single write of
+        categories.json (e.g. the new categories of an import). Returns the
+        number of stored categories.
+        """
+        with file_lock(self.files['categories']):
+            entry = self.load(self.files['categories'], strict=True)
+            for category_data in categories:
+                entry.upsert(dict(category_data))
+            self.commit(self.files['categories'], entry)
+            self._update_manifest('categories', entry)
+            return len(entry.records)
+    
     def delete_category(self, category_id: str) -> bool:
         """Delete a category"""
-        categories = self.get_categories()
-        categories = [c for c in categories if c['id'] != category_id]
-        self.write_json(self.files['categories'], categories)
+        with file_lock(self.files['categories']):
+            entry = self.load(self.files['categories'], strict=True)
+            entry.remove(category_id)
+            self.commit(self.files['categories'], entry)
+            self._update_manifest('categories', entry)
         return True
     
     # Question operations
     def get_questions(self, filters: Optional[Dict] = None) -> List[Dict]:
         """Get all questions with optional filters"""
-        questions = self.read_json(self.files['questions'])
+        entry = self.load(self.files['questions'])
         
         if not filters:
-            return questions
+            return entry.records
+        
+        if 'search' in filters:
+            # Best matches first, then narrowed down by the other filters
+            matches = self._search_index(entry).search(filters['search'], entry.positions)
+            if matches is None:
+                # No words to look up (e.g. only punctuation): match the text as is
+                search_term = filters['search'].lower()
+                filtered = [q for q in entry.records if search_term in q.get('question_text', '').lower()]
+            else:
+                filtered = [q for q in map(entry.get, matches) if q is not None]
+            if 'category_id' in filters:
+                filtered = [q for q in filtered if q.get('category_id') == filters['category_id']]
+            if 'question_type' in filters:
+                filtered = [q for q in filtered if q.get('question_type') == filters['question_type']]
+            return filtered
         
-        filtered = questions
+        filtered = entry.records
         if 'category_id' in filters:
-            filtered = [q for q in filtered if q.get('category_id') == filters['category_id']]
+            filtered = entry.group('category_id').get(filters['category_id'], [])
         if 'question_type' in filters:
-            filtered = [q for q in filtered if q.get('question_type') == filters['question_type']]
-        if 'search' in filters:
-            search_term = filters['search'].lower()
-            filtered = [q for q in filtered if search_term in q.get('question_text', '').lower()]
+            if 'category_id' in filters:
+                filtered = [q for q in filtered if q.get('question_type') == filters['question_type']]
+            else:
+                filtered = entry.group('question_type').get(filters['question_type'], [])
         
-        return filtered
+        return list(filtered)
+    
+    def get_questions_page(self, filters: Optional[Dict] = None, cursor: Optional[str] = None,
+                           limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """
+        Get one page of the filtered questions: the questions, the total
+        count and the cursor of the next page (None on the last one)
+        """
+        return paginate(self.get_questions(filters), cursor, limit)
+    
+    def get_question_strata(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Get (id, category id, question type) of every question, in bank order"""
+        return [(q['id'], q.get('category_id'), q.get('question_type'))
+                for q in self.load(self.files['questions']).records]
     
     def get_question(self, question_id: str) -> Optional[Dict]:
         """Get a specific question by ID"""
-        questions = self.get_questions()
-        for question in questions:
-            if question['id'] == question_id:
-                return question
-        return None
+        return self.load(self.files['questions']).get(question_id)
+    
+    def get_questions_by_ids(self, question_ids: List[str]) -> List[Dict]:
+        """Get several questions in one pass, in the given order (unknown IDs are skipped)"""
+        entry = self.load(self.files['questions'])
+        questions = []
+        for question_id in question_ids:
+            question = entry.get(question_id)
+            if question is not None:
+                questions.append(question)
+        return questions
     
     def save_question(self, question_data: Dict) -> Dict:
-        """Save a new question or update existing one"""
-        questions = self.get_questions()
-        
+        """Save a new question or update existing one, returns the stored copy"""
+        # The cache keeps its own copy: the caller's dict stays out of the shared records
+        question_data = dict(question_data)
         # Add timestamps
         if 'created_at' not in question_data:
             question_data['created_at'] = datetime.now().isoformat()
         question_data['updated_at'] = datetime.now().isoformat()
         
-        # Check if updating existing question
-        for i, q in enumerate(questions):
-            if q['id'] == question_data['id']:
-                questions[i] = question_data
-                self.write_json(self.files['questions'], questions)
-                return question_data
-        
-        # Add new question
-        questions.append(question_data)
-        self.write_json(self.files['questions'], questions)
+        with file_lock(self.files['questions']):
+            entry = self.load(self.files['questions'], strict=True)
+            index = self._search_index(entry, build=False)
+            entry.upsert(question_data)
+            self.commit(self.files['questions'], entry)
+            self._update_manifest('questions', entry)
+            if index is not None:
+                index.add(question_data)
+                self._store_search_index(index, entry)
         return question_data
     
+    def save_questions(self, questions: List[Dict]) -> int:
+        """
+        Save many new or updated questions with a single write of
+        questions.json (e.g. a bulk import). Returns the number of stored
+        questions.
+        """
+        now = datetime.now().isoformat()
+        questions = [dict(question_data) for question_data in questions]
+        for question_data in questions:
+            question_data.setdefault('created_at', now)
+            question_data['updated_at'] = now
+        
+        with file_lock(self.files['questions']):
+            entry = self.load(self.files['questions'], strict=True)
+            had_index = self._search_index(entry, build=False) is not None
+            for question_data in questions:
+                entry.upsert(question_data)
+            self.commit(self.files['questions'], entry)
+            self._update_manifest('questions', entry)
+            if had_index:
+                # One rebuild is cheaper than inserting many new words one by one
+                self._store_search_index(SearchIndex.build(entry.records), entry)
+            return len(entry.records)
+    
     def delete_question(self, question_id: str) -> bool:
         """Delete a question"""
-        questions = self.get_questions()
-        questions = [q for q in questions if q['id'] != question_id]
-        self.write_json(self.files['questions'], questions)
+        with file_lock(self.files['questions']):
+            entry = self.load(self.files['questions'], strict=True)
+            index = self._search_index(entry, build=False)
+            entry.remove(question_id)
+            self.commit(self.files['questions'], entry)
+            self._update_manifest('questions', entry)
+            if index is not None:
+                index.remove(question_id)
+                self._store_search_index(index, entry)
         return True
     
+    def update_questions(self, question_ids: List[str], changes: Dict) -> int:
+        """
+        Apply the same field changes (e.g. category_id or points) to many
+        questions with one read and one write of questions.json. Returns the
+        number of updated questions.
+        """
+        now = datetime.now().isoformat()
+        with file_lock(self.files['questions']):
+            entry = self.load(self.files['questions'], strict=True)
+            index = self._search_index(entry, build=False) if SEARCHABLE_FIELDS & set(changes) else None
+            updated = []
+            for question_id in dict.fromkeys(question_ids):
+                question = entry.get(question_id)
+                if question is not None:
+                    # Replace rather than modify the cached record, so its indexes stay valid
+                    updated.append(dict(question, **changes, updated_at=now))
+                    entry.upsert(updated[-1])
+            if updated:
+                self.commit(self.files['questions'], entry)
+                self._update_manifest('questions', entry)
+                if index is not None:
+                    for question in updated:
+                        index.add(question)
+                    self._store_search_index(index, entry)
+            return len(updated)
+    
+    def delete_questions(self, question_ids: List[str]) -> int:
+        """Delete many questions with one read and one write of questions.json, returns the number deleted"""
+        with file_lock(self.files['questions']):
+            entry = self.load(self.files['questions'], strict=True)
+            index = self._search_index(entry, build=False)
+            removed = entry.remove_many(question_ids)
+            if removed:
+                self.commit(self.files['questions'], entry)
+                self._update_manifest('questions', entry)
+                if index is not None:
+                    for question in removed:
+                        index.remove(question['id'])
+                    self._store_search_index(index, entry)
+            return len(removed)
+    
+    # Question search index
+    # search_index.json holds the inverted index of questions.json (see
+    # search.py), tagged with the signature of the questions.json it was built
+    # from. Saving or deleting a question updates it; any other change to
+    # questions.json makes the next search rebuild it.
+    def _search_index(self, questions: CachedFile, build: bool = True) -> Optional[SearchIndex]:
+        """
+        Get the search index of the given questions, loading the saved index
+        or (with build=True) building it when the cached one is out of date
+        """
+        key = str(self.search_index_file)
+        with _file_cache_lock:
+            index = _search_indexes.get(key)
+        if index is not None and index.version == questions.version:
+            return index
+        
+        index = None
+        try:
+            with open(self.search_index_file, 'rb') as f:
+                data = loads(f.read())
+            if questions.signature is not None and data.get('signature') == list(questions.signature):
+                index = SearchIndex.from_dict(data)
+        except (FileNotFoundError, ValueError, KeyError, TypeError, IndexError):
+            pass
+        
+        if index is None:
+            if not build:
+                return None
+            index = SearchIndex.build(questions.records)
+            self._store_search_index(index, questions)
+        else:
+            index.version = questions.version
+            with _file_cache_lock:
+                _search_indexes[key] = index
+        return index
+    
+    def _store_search_index(self, index: SearchIndex, questions: CachedFile):
+        """Save the index of the given questions next to questions.json"""
+        index.version = questions.version
+        with _file_cache_lock:
+            _search_indexes[str(self.search_index_file)] = index
+        if questions.signature is not None:
+            data = dict(index.to_dict(), signature=list(questions.signature))
+            atomic_write_json(self.search_index_file, data)
+    
     # Quiz operations
     def get_quizzes(self) -> List[Dict]:
         """Get all quizzes"""
@@ -157,90 +753,514 @@ class JSONStorage:
     
     def get_quiz(self, quiz_id: str) -> Optional[Dict]:
         """Get a specific quiz by ID"""
-        quizzes = self.get_quizzes()
-        for quiz in quizzes:
-            if quiz['id'] == quiz_id:
-                return quiz
-        return None
+        return self.load(self.files['quizzes']).get(quiz_id)
     
     def save_quiz(self, quiz_data: Dict) -> Dict:
-        """Save a new quiz or update existing one"""
-        quizzes = self.get_quizzes()
-        
+        """Save a new quiz or update existing one, returns the stored copy"""
+        # The cache keeps its own copy: the caller's dict stays out of the shared records
+        quiz_data = dict(quiz_data)
         # Add timestamps
         if 'created_at' not in quiz_data:
             quiz_data['created_at'] = datetime.now().isoformat()
         quiz_data['updated_at'] = datetime.now().isoformat()
         
-        # Check if updating existing quiz
-        for i, q in enumerate(quizzes):
-            if q['id'] == quiz_data['id']:
-                quizzes[i] = quiz_data
-                self.write_json(self.files['quizzes'], quizzes)
-                return quiz_data
-        
-        # Add new quiz
-        quizzes.append(quiz_data)
-        self.write_json(self.files['quizzes'], quizzes)
+        with file_lock(self.files['quizzes']):
+            entry = self.load(self.files['quizzes'], strict=True)
+            entry.upsert(quiz_data)
+            self.commit(self.files['quizzes'], entry)
+            self._update_manifest('quizzes', entry)
         return quiz_data
     
+    def save_quizzes(self, quizzes: List[Dict]) -> int:
+        """
+        Save many new or updated quizzes with a single write of quizzes.json
+        (e.g. generated exam variants). Returns the number of stored quizzes.
+        """
+        now = datetime.now().isoformat()
+        quizzes = [dict(quiz_data) for quiz_data in quizzes]
+        for quiz_data in quizzes:
+            quiz_data.setdefault('created_at', now)
+            quiz_data['updated_at'] = now
+        
+        with file_lock(self.files['quizzes']):
+            entry = self.load(self.files['quizzes'], strict=True)
+            for quiz_data in quizzes:
+                entry.upsert(quiz_data)
+            self.commit(self.files['quizzes'], entry)
+            self._update_manifest('quizzes', entry)
+            return len(entry.records)
+    
+    def add_questions_to_quiz(self, quiz_id: str, question_ids: List[str], points: Optional[int] = None) -> int:
+        """
+        Append questions to a quiz with one write of quizzes.json, skipping
+        questions it already has. Each question is worth `points`, or its
+        own points when not given. Returns the number of added questions.
+        """
+        questions = self.load(self.files['questions'])
+        with file_lock(self.files['quizzes']):
+            entry = self.load(self.files['quizzes'], strict=True)
+            quiz = entry.get(quiz_id)
+            if quiz is None:
+                return 0
+            present = {q.get('id') or q.get('question_id') for q in quiz.get('questions', [])}
+            added = []
+            for question_id in dict.fromkeys(question_ids):
+                question = questions.get(question_id)
+                if question is None or question_id in present:
+                    continue
+                added.append({
+                    'id': question_id,
+                    'text': question.get('question_text', ''),
+                    'points': points if points is not None else question.get('points', 1),
+                })
+            if added:
+                entry.upsert(dict(quiz, questions=quiz.get('questions', []) + added,
+                                  updated_at=datetime.now().isoformat()))
+                self.commit(self.files['quizzes'], entry)
+                self._update_manifest('quizzes', entry)
+            return len(added)
+    
     def delete_quiz(self, quiz_id: str) -> bool:
         """Delete a quiz"""
-        quizzes = self.get_quizzes()
-        quizzes = [q for q in quizzes if q['id'] != quiz_id]
-        self.write_json(self.files['quizzes'], quizzes)
+        with file_lock(self.files['quizzes']):
+            entry = self.load(self.files['quizzes'], strict=True)
+            entry.remove(quiz_id)
+            self.commit(self.files['quizzes'], entry)
+            self._update_manifest('quizzes', entry)
         return True
     
+    def get_quiz_version(self, quiz_id: str) -> Optional[Hashable]:
+        """
+        Get a value that changes whenever the quiz or any question may have
+        changed, None if the quiz doesn't exist. Compiled forms of the quiz
+        (answer key, snapshot) are rebuilt when it changes.
+        """
+        quizzes = self.load(self.files['quizzes'])
+        if quizzes.get(quiz_id) is None:
+            return None
+        return quizzes.version, self.load(self.files['questions']).version
+    
+    def get_quiz_question_ids(self) -> List[List[str]]:
+        """Get the question ids of every quiz, the most recently created quiz first"""
+        quizzes = sorted(self.load(self.files['quizzes']).records,
+                         key=lambda quiz: quiz.get('created_at') or '', reverse=True)
+        return [[q.get('id') or q.get('question_id') for q in quiz.get('questions', [])] for quiz in quizzes]
+    
+    def get_bank_version(self) -> Tuple[Hashable, Hashable]:
+        """
+        Get values that change whenever any question, and whenever any quiz,
+        may have changed. Indexes over the whole bank (see generation.py)
+        are rebuilt when they do.
+        """
+        return self.load(self.files['questions']).version, self.load(self.files['quizzes']).version
+    
+    def get_answer_key(self, quiz_id: str) -> Optional[AnswerKey]:
+        """Get the compiled grading key of a quiz, rebuilt only after quizzes or questions change"""
+        version = self.get_quiz_version(quiz_id)
+        if version is None:
+            return None
+        
+        def build():
+            quiz = self.get_quiz(quiz_id)
+            return compile_answer_key(quiz, self.get_questions_by_ids(
+                [q.get('id') or q.get('question_id') for q in quiz.get('questions', [])]))
+        
+        return answer_keys.get((str(self.storage_dir), quiz_id), version, build)
+    
     # Quiz Attempt operations
+    # Attempts live in attempts.json (compacted snapshot) plus an append-only
+    # attempts.log.jsonl holding attempts saved since the last compaction.
+    def _attempts(self) -> CachedFile:
+        """Get every attempt, with logged attempts applied over the snapshot"""
+        with self.attempt_log.lock:
+            return self.attempt_log.merged_with(lambda: self.load(self.files['attempts']))
+    
     def get_attempts(self, quiz_id: Optional[str] = None) -> List[Dict]:
         """Get all attempts, optionally filtered by quiz_id"""
-        attempts = self.read_json(self.files['attempts'])
+        entry = self._attempts()
         if quiz_id:
-            attempts = [a for a in attempts if a.get('quiz_id') == quiz_id]
-        return attempts
+            return list(entry.group('quiz_id').get(quiz_id, []))
+        return list(entry.records)
+    
+    def iter_attempts(self, quiz_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Iterate over all attempts, optionally filtered by quiz_id, reading
+        attempts.json one record at a time (e.g. for an export): only the
+        attempt log, which compactions keep short, is held in memory
+        """
+        # A compaction replaces both files rather than rewriting them, so
+        # files opened together under the lock stay consistent
+        with file_lock(self.attempt_log.path, shared=True):
+            snapshot = open_if_exists(self.files['attempts'])
+            log = open_if_exists(self.attempt_log.path)
+        
+        try:
+            # Latest logged version of each attempt, in the order they were first logged
+            logged = {}
+            for line in log or ():
+                if not line.endswith(b'\n'):
+                    # An append still in flight
+                    break
+                try:
+                    record = loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and 'id' in record:
+                    logged[record['id']] = record
+            
+            if snapshot is not None:
+                for record in iter_records(snapshot):
+                    if not isinstance(record, dict):
+                        continue
+                    record = logged.pop(record.get('id'), record)
+                    if not quiz_id or record.get('quiz_id') == quiz_id:
+                        yield record
+            # Attempts first saved since the last compaction
+            for record in logged.values():
+                if not quiz_id or record.get('quiz_id') == quiz_id:
+                    yield record
+        finally:
+            for f in (snapshot, log):
+                if f is not None:
+                    f.close()
     
     def get_attempt(self, attempt_id: str) -> Optional[Dict]:
         """Get a specific attempt by ID"""
-        attempts = self.get_attempts()
-        for attempt in attempts:
-            if attempt['id'] == attempt_id:
-                return attempt
-        return None
+        # Recent attempts are read straight from their line in the log, the
+        # shared lock keeps a compaction from replacing it in between
+        with file_lock(self.attempt_log.path, shared=True):
+            with self.attempt_log.lock:
+                self.attempt_log.refresh()
+                offset = self.attempt_log.offsets.get(attempt_id)
+            if offset is not None:
+                record = self.attempt_log.read_at(offset)
+                if isinstance(record, dict) and record.get('id') == attempt_id:
+                    return record
+            return self.load(self.files['attempts']).get(attempt_id)
     
     def save_attempt(self, attempt_data: Dict) -> Dict:
         """Save a new attempt or update existing one"""
-        attempts = self.get_attempts()
-        
         # Add timestamp
         if 'started_at' not in attempt_data:
             attempt_data['started_at'] = datetime.now().isoformat()
         
-        # Check if updating existing attempt
-        for i, a in enumerate(attempts):
-            if a['id'] == attempt_data['id']:
-                attempts[i] = attempt_data
-                self.write_json(self.files['attempts'], attempts)
-                return attempt_data
+        self._ensure_stats()
+        # Appends only exclude a compaction, they don't need to exclude each other
+        with file_lock(self.attempt_log.path, shared=True):
+            previous = self._previous_attempts([attempt_data])
+            self.attempt_log.append(attempt_data)
+            self._update_stats([(a, -1) for a in previous] + [(attempt_data, 1)])
+            self._update_manifest('attempts', attempts=[attempt_data])
         
-        # Add new attempt
-        attempts.append(attempt_data)
-        self.write_json(self.files['attempts'], attempts)
+        self._compact_if_due()
         return attempt_data
+    
+    def append_attempts(self, attempts: List[Dict]) -> int:
+        """
+        Save many new attempts (e.g. a batch of queued submissions) with a
+        single append to the attempt log, updating the analytics and the
+        manifest once. Returns the number of saved attempts.
+        """
+        if not attempts:
+            return 0
+        now = datetime.now().isoformat()
+        for attempt_data in attempts:
+            attempt_data.setdefault('started_at', now)
+        
+        self._ensure_stats()
+        with file_lock(self.attempt_log.path, shared=True):
+            previous = self._previous_attempts(attempts)
+            self.attempt_log.append(*attempts)
+            self._update_stats([(a, -1) for a in previous] + [(a, 1) for a in attempts])
+            self._update_manifest('attempts', attempts=attempts)
+        
+        self._compact_if_due()
+        return len(attempts)
+    
+    def _previous_attempts(self, attempts: List[Dict]) -> List[Dict]:
+        """
+        The stored versions of attempts about to be saved again, from the log
+        or else from attempts.json (the caller holds the attempt log lock, so
+        no compaction moves them in between)
+        """
+        with self.attempt_log.lock:
+            self.attempt_log.refresh()
+            offsets = [self.attempt_log.offsets.get(a['id']) for a in attempts]
+        compacted = self.load(self.files['attempts'])
+        previous = []
+        for attempt_data, offset in zip(attempts, offsets):
+            stored = self.attempt_log.read_at(offset) if offset is not None else compacted.get(attempt_data['id'])
+            if stored is not None:
+                previous.append(stored)
+        return previous
+    
+    def _compact_if_due(self):
+        compact_at = getattr(settings, 'QUIZ_ATTEMPT_LOG_COMPACT_AT', DEFAULT_ATTEMPT_LOG_COMPACT_AT)
+        with self.attempt_log.lock:
+            self.attempt_log.refresh()
+            logged = len(self.attempt_log.offsets)
+        if logged >= compact_at:
+            self.compact_attempts(min_logged=compact_at)
+    
+    def save_attempts(self, attempts: List[Dict], min_logged: int = 0) -> int:
+        """
+        Save many new or updated attempts with a single write of attempts.json
+        (e.g. after a regrade). The attempt log is compacted at the same time
+        and the quiz analytics are rebuilt from scratch. With nothing to save,
+        the rewrite is skipped if the log holds fewer than min_logged attempts.
+        Returns the number of stored attempts.
+        """
+        with file_lock(self.attempt_log.path), self.attempt_log.lock:
+            if not attempts and min_logged:
+                # Processes that crossed the threshold together wait for the
+                # lock in turn: the first one compacted the log already
+                self.attempt_log.refresh()
+                if len(self.attempt_log.offsets) < min_logged:
+                    return len(self._attempts().records)
+            entry = CachedFile(None, list(self._attempts().records))
+            for attempt_data in attempts:
+                entry.upsert(attempt_data)
+            self.commit(self.files['attempts'], entry)
+            self.attempt_log.truncate()
+            with file_lock(self.analytics_file):
+                self.commit(self.analytics_file, CachedFile(None, list(build_stats(entry.records).values())))
+            self._update_manifest('attempts', entry)
+            return len(entry.records)
+    
+    def compact_attempts(self, min_logged: int = 0) -> int:
+        """
+        Fold the attempt log into attempts.json (unless it holds fewer than
+        min_logged attempts), returns the number of attempts
+        """
+        return self.save_attempts([], min_logged=min_logged)
+    
+    # Quiz analytics
+    # analytics.json holds running aggregates per quiz (see analytics.py). Each
+    # save_attempt updates them; a compaction rebuilds them from the attempts.
+    def get_quiz_stats(self, quiz_id: str) -> Optional[Dict]:
+        """Get the running aggregates of a quiz's attempts"""
+        self._ensure_stats()
+        return self.load(self.analytics_file).get(quiz_id)
+    
+    def _ensure_stats(self):
+        """
+        Build analytics.json from the attempts if it is missing (e.g. in a
+        fresh copy of the data folder). Called before taking the attempt log
+        lock: the exclusive lock waits for saves that appended an attempt but
+        haven't counted it yet.
+        """
+        if self.analytics_file.exists():
+            return
+        with file_lock(self.attempt_log.path), self.attempt_log.lock:
+            if self.analytics_file.exists():
+                return
+            with file_lock(self.analytics_file):
+                stats = build_stats(self._attempts().records)
+                self.commit(self.analytics_file, CachedFile(None, list(stats.values())))
+    
+    def _update_stats(self, changes: List[Tuple[Optional[Dict], int]]):
+        """Apply (attempt, sign) changes to the analytics: -1 for replaced versions, 1 for saved ones"""
+        if not self.analytics_file.exists():
+            # Dropped meanwhile: the next _ensure_stats() counts these attempts
+            return
+        
+        with file_lock(self.analytics_file):
+            try:
+                entry = self.load(self.analytics_file, strict=True)
+            except ValueError:
+                # Derived data: drop it and let the next _ensure_stats() rebuild it
+                self.analytics_file.unlink()
+                return
+            
+            changed = {}
+            for attempt, sign in changes:
+                if attempt is None:
+                    continue
+                quiz_id = attempt.get('quiz_id')
+                if quiz_id not in changed:
+                    # Cached records are shared, update a copy
+                    stats = entry.get(quiz_id)
+                    changed[quiz_id] = copy.deepcopy(stats) if stats else new_quiz_stats(quiz_id)
+                add_attempt(changed[quiz_id], attempt, sign)
+            
+            for stats in changed.values():
+                entry.upsert(stats)
+            self.commit(self.analytics_file, entry)
+    
+    def warm_up(self):
+        """Parse the data files and load the search index and manifest ahead of the first request"""
+        self._search_index(self.load(self.files['questions']))
+        self.get_categories()
+        self.get_quizzes()
+        self._attempts()
+        self.get_manifest()
+    
+    # Subject manifest
+    # manifest.json has one entry per data file: its record count and last
+    # modification time, plus the counts per type and per category for
+    # questions and the latest attempts for attempts (see catalog.py). Every
+    # save or delete updates the entry of the file it wrote. Entries are
+    # tagged with the signature of their file, so a file changed some other
+    # way gets its entry rebuilt on the next read.
+    def _manifest_signature(self, name: str) -> List[Optional[List[int]]]:
+        paths = [self.files[name], self.attempt_log.path] if name == 'attempts' else [self.files[name]]
+        signature = []
+        for file_path in paths:
+            try:
+                signature.append(list(_file_signature(file_path)))
+            except FileNotFoundError:
+                signature.append(None)
+        return signature
+    
+    def _load_manifest(self) -> CachedFile:
+        try:
+            return self.load(self.manifest_file, strict=True)
+        except ValueError:
+            # Derived data: start over
+            return CachedFile(None, [])
+    
+    def _manifest_entry(self, name: str, signature: List, records: CachedFile, modified: Optional[str] = None,
+                        attempts: Optional[List[Dict]] = None, previous: Optional[Dict] = None) -> Dict:
+        """
+        Describe the records of a data file. Without a modification time the
+        latest record timestamp is used; the latest attempts are updated with
+        the saved attempts if given, else collected from all attempts.
+        """
+        entry = {
+            'id': name,
+            'count': len(records.records),
+            'modified': modified or latest_timestamp(records.records, 'created_at', 'updated_at',
+                                                     'started_at', 'completed_at'),
+            'signature': signature,
+        }
+        if name == 'questions':
+            entry['by_type'] = group_counts(records.group('question_type'))
+            entry['by_category'] = group_counts(records.group('category_id'))
+        elif name == 'attempts':
+            if attempts and previous is not None:
+                recent = previous['recent']
+                for attempt in attempts:
+                    quiz = self.get_quiz(attempt.get('quiz_id'))
+                    recent = add_recent_attempt(recent, attempt, quiz.get('title', '') if quiz else None)
+                entry['recent'] = recent
+            else:
+                quiz_titles = {quiz['id']: quiz.get('title', '') for quiz in self.get_quizzes()}
+                entry['recent'] = latest_attempts(records.records, quiz_titles)
+        return entry
+    
+    def _update_manifest(self, name: str, records: Optional[CachedFile] = None,
+                         attempts: Optional[List[Dict]] = None):
+        """
+        Describe a data file in the manifest right after writing it. Callers
+        that don't exclude other writers (attempt log appends) leave out the
+        records, which are then read after taking the signature.
+        """
+        if not self.manifest_file.exists():
+            # Built in full on the first read
+            return
+        
+        # Signature first: a write in between leaves the entry stale, not wrong
+        signature = self._manifest_signature(name)
+        if records is None:
+            records = self._records(name)
+        with file_lock(self.manifest_file):
+            manifest = self._load_manifest()
+            manifest.upsert(self._manifest_entry(name, signature, records, datetime.now().isoformat(),
+                                                 attempts, manifest.get(name)))
+            if name == 'quizzes':
+                self._retitle_recent_attempts(manifest, records)
+            self.commit(self.manifest_file, manifest)
+    
+    def _retitle_recent_attempts(self, manifest: CachedFile, quizzes: CachedFile):
+        """Show the current quiz titles in the latest attempts after quizzes changed"""
+        attempts = manifest.get('attempts')
+        if attempts is None:
+            return
+        recent = []
+        for attempt in attempts['recent']:
+            quiz = quizzes.get(attempt['quiz_id'])
+            recent.append(recent_attempt(attempt, quiz.get('title', '') if quiz else None))
+        manifest.upsert(dict(attempts, recent=recent))
+    
+    def _records(self, name: str) -> CachedFile:
+        return self._attempts() if name == 'attempts' else self.load(self.files[name])
+    
+    def get_manifest(self) -> Dict:
+        """
+        Get the record counts, question counts per type and per category,
+        last modification times and latest attempts of this subject
+        """
+        manifest = self.load(self.manifest_file)
+        stale = [name for name in COLLECTIONS
+                 if (manifest.get(name) or {}).get('signature') != self._manifest_signature(name)]
+        if stale:
+            with file_lock(self.manifest_file):
+                manifest = self._load_manifest()
+                for name in stale:
+                    # Signature first: a write in between leaves the entry stale, not wrong
+                    signature = self._manifest_signature(name)
+                    manifest.upsert(self._manifest_entry(name, signature, self._records(name)))
+                if 'quizzes' in stale:
+                    self._retitle_recent_attempts(manifest, self._records('quizzes'))
+                self.commit(self.manifest_file, manifest)
+        
+        entries = {name: manifest.get(name) for name in COLLECTIONS}
+        return {
+            **{name: entries[name]['count'] for name in COLLECTIONS},
+            'questions_by_type': entries['questions']['by_type'],
+            'questions_by_category': entries['questions']['by_category'],
+            'modified': {name: entries[name]['modified'] for name in COLLECTIONS},
+            'recent_attempts': entries['attempts']['recent'],
+        }
+
+
+# Storage instances and the subject list are shared per data folder, so a
+# request costs one stat() of the folder instead of a directory scan plus the
+# mkdir and exists checks of a new storage. When the folder's mtime changes
+# it is scanned again, and both are dropped only if a subject directory was
+# added, removed or renamed: writes of the root subject (temporary files,
+# lock files, the submission spool) change the mtime too.
+_registries: Dict[str, Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def _subject_dirs(storage_dir: Path) -> FrozenSet[str]:
+    """Names of the subject directories of a data folder"""
+    try:
+        with os.scandir(storage_dir) as entries:
+            return frozenset(entry.name for entry in entries
+                             if entry.is_dir() and not entry.name.startswith('.'))
+    except FileNotFoundError:
+        return frozenset()
+
+
+def _registry(storage_dir: Path) -> Dict[str, Any]:
+    """Get the shared subject list and storage instances of a data folder"""
+    try:
+        mtime = storage_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    
+    key = str(storage_dir)
+    with _registry_lock:
+        registry = _registries.get(key)
+        if registry is not None and registry['mtime'] == mtime:
+            return registry
+    
+    subjects = _subject_dirs(storage_dir)
+    with _registry_lock:
+        registry = _registries.get(key)
+        if registry is None or registry['subjects'] != subjects:
+            registry = _registries[key] = {'mtime': mtime, 'subjects': subjects, 'storages': {}}
+        else:
+            registry['mtime'] = mtime
+        return registry
 
 
 # Helper function to get available subjects
 def get_available_subjects() -> List[str]:
     """Get list of available subject directories"""
-    storage_dir = Path(settings.JSON_STORAGE_DIR)
-    subjects = []
-    
-    # List all directories in the data folder
-    if storage_dir.exists():
-        for item in storage_dir.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                subjects.append(item.name)
-    
-    return sorted(subjects)
+    return sorted(_registry(Path(settings.JSON_STORAGE_DIR))['subjects'])
 
 
 # Helper function to get storage instance for a specific subject
@@ -248,8 +1268,31 @@ def get_storage(subject: str = None) -> JSONStorage:
     """
     Get a storage instance for a specific subject.
     If subject is None, returns the default storage instance.
+    The storage class is chosen with the QUIZ_STORAGE_BACKEND setting.
+    Instances are shared by every request of the process.
+    """
+    backend_path = getattr(settings, 'QUIZ_STORAGE_BACKEND', 'quiz_app.storage.JSONStorage')
+    storages = _registry(Path(settings.JSON_STORAGE_DIR))['storages']
+    key = (backend_path, subject or None)
+    instance = storages.get(key)
+    if instance is None:
+        instance = import_string(backend_path)(subject=subject)
+        with _registry_lock:
+            instance = storages.setdefault(key, instance)
+    return instance
+
+
+def warm_up(subjects: List[str]):
+    """
+    Preload the data of the given subjects into the process caches
+    ('default' is the root data folder, '*' every subject)
     """
-    return JSONStorage(subject=subject)
+    if '*' in subjects:
+        subjects = ['default'] + get_available_subjects()
+    for subject in subjects:
+        subject_storage = get_storage(None if subject == 'default' else subject)
+        if hasattr(subject_storage, 'warm_up'):
+            subject_storage.warm_up()
 
 
 # Global instance (default storage without subject)
@@ -0,0 +1,292 @@
+"""
+Submission Queue Module for Quiz System
+With QUIZ_SUBMISSION_QUEUE enabled, quiz_submit only checks a submission
+and stores it in a SQLite spool (QUIZ_SUBMISSION_SPOOL), then answers with
+the attempt id. A worker thread in each server process grades the queued
+submissions and saves them in batches, with one append to the attempt log
+per subject and batch. At a deadline every request then costs one small
+SQLite insert, instead of grading plus analytics and manifest rewrites
+under the attempt log lock. The results page shows an attempt as pending
+until it is saved.
+
+Submissions are only removed from the spool once their attempt is saved.
+A batch claimed by a process that stopped is claimed again after
+CLAIM_TIMEOUT seconds, and 'python manage.py process_submissions' grades
+whatever is queued from outside the server.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .grading import valid_answers
+from .serialization import dumps, loads
+from .storage import get_storage
+
+DEFAULT_BATCH_SIZE = 200
+# Seconds after which a claimed batch that wasn't saved is claimed again
+CLAIM_TIMEOUT = 60
+# Seconds the worker sleeps when the spool is empty (new submissions wake it up)
+POLL_INTERVAL = 2.0
+# Claims of a submission before it is marked as failed
+MAX_TRIES = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    attempt_id TEXT NOT NULL UNIQUE,
+    subject TEXT NOT NULL,
+    quiz_id TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    tries INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    error TEXT,
+    enqueued_at REAL NOT NULL
+)
+'''
+
+
+class Submission(NamedTuple):
+    """A queued submission: where it goes and what quiz_submit received"""
+    attempt_id: str
+    subject: Optional[str]
+    quiz_id: str
+    # student_name, answers and completed_at
+    payload: Dict
+    tries: int = 0
+
+
+def queue_enabled() -> bool:
+    return bool(getattr(settings, 'QUIZ_SUBMISSION_QUEUE', False))
+
+
+def spool_path() -> Path:
+    """The spool file: QUIZ_SUBMISSION_SPOOL, or submissions.sqlite3 in the data folder"""
+    path = getattr(settings, 'QUIZ_SUBMISSION_SPOOL', None)
+    return Path(path) if path else Path(settings.JSON_STORAGE_DIR) / 'submissions.sqlite3'
+
+
+class SubmissionQueue:
+    """
+    Durable FIFO of submissions in a SQLite file, safe to share between
+    threads and processes. Every change is a committed transaction
+    (journal_mode=WAL, synchronous=FULL), so a queued submission survives
+    a crash of the server.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        # Set when a submission is queued, to wake up the worker
+        self.wakeup = threading.Event()
+        # Writes of this process's threads wait here rather than in SQLite's busy handler, which sleeps in steps
+        self._write_lock = threading.Lock()
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, in autocommit mode (transactions are explicit)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+        return connection
+    
+    @contextmanager
+    def transaction(self):
+        """Run several statements as one transaction (and one sync to disk)"""
+        connection = self.connection
+        with self._write_lock:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+    
+    def enqueue(self, submission: Submission) -> bool:
+        """Queue a submission, returns False if its attempt id is already queued"""
+        try:
+            with self.transaction() as connection:
+                connection.execute(
+                    'INSERT INTO submissions (attempt_id, subject, quiz_id, payload, enqueued_at) VALUES (?, ?, ?, ?, ?)',
+                    (submission.attempt_id, submission.subject or '', submission.quiz_id,
+                     dumps(submission.payload), time.time()))
+        except sqlite3.IntegrityError:
+            return False
+        self.wakeup.set()
+        return True
+    
+    def status(self, attempt_id: str) -> Optional[Dict]:
+        """The state of a queued submission ('pending' or 'failed', and the error), None if not queued"""
+        row = self.connection.execute(
+            'SELECT status, error, quiz_id, enqueued_at FROM submissions WHERE attempt_id = ?',
+            (attempt_id,)).fetchone()
+        if row is None:
+            return None
+        status, error, quiz_id, enqueued_at = row
+        # Claimed submissions are still pending for whoever waits on them
+        return {'status': 'failed' if status == 'failed' else 'pending', 'error': error,
+                'quiz_id': quiz_id, 'enqueued_at': enqueued_at}
+    
+    def claim(self, limit: int = DEFAULT_BATCH_SIZE) -> List[Submission]:
+        """
+        Take the oldest pending submissions (and those claimed more than
+        CLAIM_TIMEOUT seconds ago) for processing
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            rows = connection.execute(
+                "SELECT seq, attempt_id, subject, quiz_id, payload, tries FROM submissions "
+                "WHERE status = 'pending' OR (status = 'claimed' AND claimed_at < ?) ORDER BY seq LIMIT ?",
+                (now - CLAIM_TIMEOUT, limit)).fetchall()
+            connection.executemany(
+                "UPDATE submissions SET status = 'claimed', claimed_at = ?, tries = tries + 1 WHERE seq = ?",
+                [(now, row[0]) for row in rows])
+        return [Submission(attempt_id, subject or None, quiz_id, loads(payload), tries + 1)
+                for _, attempt_id, subject, quiz_id, payload, tries in rows]
+    
+    def complete(self, attempt_ids: List[str]):
+        """Drop submissions whose attempts are saved"""
+        with self.transaction() as connection:
+            connection.executemany('DELETE FROM submissions WHERE attempt_id = ?',
+                                   [(attempt_id,) for attempt_id in attempt_ids])
+    
+    def release(self, attempt_ids: List[str]):
+        """Put claimed submissions back in the queue, to be retried"""
+        with self.transaction() as connection:
+            connection.executemany("UPDATE submissions SET status = 'pending' WHERE attempt_id = ?",
+                                   [(attempt_id,) for attempt_id in attempt_ids])
+    
+    def fail(self, attempt_id: str, error: str):
+        """Keep a submission that can't be saved, with the reason, for the results page and an admin"""
+        with self.transaction() as connection:
+            connection.execute("UPDATE submissions SET status = 'failed', error = ? WHERE attempt_id = ?",
+                               (error, attempt_id))
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of queued submissions per status"""
+        return dict(self.connection.execute('SELECT status, COUNT(*) FROM submissions GROUP BY status'))
+
+
+def grade_batch(subject_storage, submissions: List[Submission]) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Grade the submissions of one subject into attempt records, skipping
+    those already saved (by a batch that stopped before it completed).
+    Returns the attempts, and the error of each submission that can't be
+    graded (its quiz no longer exists, or its payload is invalid).
+    """
+    attempts, failed = [], {}
+    for submission in submissions:
+        try:
+            if subject_storage.get_attempt(submission.attempt_id) is not None:
+                continue
+            answer_key = subject_storage.get_answer_key(submission.quiz_id)
+            if answer_key is None:
+                failed[submission.attempt_id] = 'Quiz not found'
+                continue
+            payload = submission.payload
+            if not valid_answers(payload.get('answers')):
+                failed[submission.attempt_id] = 'Invalid answers'
+                continue
+            attempts.append(answer_key.attempt(submission.attempt_id, payload['answers'],
+                                               payload['student_name'], payload['completed_at']))
+        except Exception as e:
+            # Only this submission fails, the rest of the batch is saved
+            failed[submission.attempt_id] = str(e) or type(e).__name__
+    return attempts, failed
+
+
+def process_batch(queue: SubmissionQueue, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Grade and save one batch of queued submissions, returns the number of submissions handled"""
+    submissions = queue.claim(batch_size)
+    by_subject: Dict[Optional[str], List[Submission]] = {}
+    for submission in submissions:
+        by_subject.setdefault(submission.subject, []).append(submission)
+    
+    for subject, batch in by_subject.items():
+        subject_storage = get_storage(subject)
+        attempts, failed = grade_batch(subject_storage, batch)
+        for attempt_id, error in failed.items():
+            queue.fail(attempt_id, error)
+        batch = [s for s in batch if s.attempt_id not in failed]
+        try:
+            subject_storage.append_attempts(attempts)
+        except Exception as e:
+            # Retried with the next batches, up to MAX_TRIES claims
+            for submission in batch:
+                if submission.tries >= MAX_TRIES:
+                    queue.fail(submission.attempt_id, str(e) or type(e).__name__)
+            queue.release([s.attempt_id for s in batch if s.tries < MAX_TRIES])
+            continue
+        queue.complete([s.attempt_id for s in batch])
+    return len(submissions)
+
+
+_queues: Dict[str, SubmissionQueue] = {}
+_workers: Dict[str, threading.Thread] = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue() -> SubmissionQueue:
+    """The shared queue object of the spool file"""
+    path = spool_path()
+    with _queues_lock:
+        queue = _queues.get(str(path))
+        if queue is None:
+            queue = _queues[str(path)] = SubmissionQueue(path)
+        return queue
+
+
+def run_worker(queue: SubmissionQueue, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Process batches for ever, sleeping while the spool is empty"""
+    while True:
+        queue.wakeup.clear()
+        try:
+            handled = process_batch(queue, batch_size)
+        except sqlite3.Error:
+            # e.g. the spool is locked for longer than the timeout: try again later
+            handled = 0
+        # Database storage: drop connections that are too old or broken
+        close_old_connections()
+        if not handled:
+            queue.wakeup.wait(POLL_INTERVAL)
+
+
+def start_worker(queue: SubmissionQueue):
+    """Start this process's worker thread of a queue, unless it runs already"""
+    with _queues_lock:
+        worker = _workers.get(str(queue.path))
+        if worker is None or not worker.is_alive():
+            worker = threading.Thread(target=run_worker, args=(queue,), name='quiz-submissions', daemon=True)
+            _workers[str(queue.path)] = worker
+            worker.start()
+
+
+def enqueue_submission(subject: Optional[str], quiz_id: str, attempt_id: str, payload: Dict) -> bool:
+    """Queue a submission for the worker, returns False if the attempt id is already queued"""
+    queue = get_queue()
+    start_worker(queue)
+    return queue.enqueue(Submission(attempt_id, subject, quiz_id, payload))
+
+
+def submission_status(attempt_id: str) -> Optional[Dict]:
+    """The state of a queued submission, None if it isn't queued (anymore)"""
+    if not queue_enabled():
+        # Submissions queued before the queue was switched off are still
+        # reported, 'python manage.py process_submissions' saves them
+        return get_queue().status(attempt_id) if spool_path().exists() else None
+    queue = get_queue()
+    start_worker(queue)
+    return queue.status(attempt_id)
@@ -0,0 +1,145 @@
+"""
+Synthetic quiz data for benchmarks and stress tests.
+Records have the same shape as the ones created through the views.
+"""
+
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+WORDS = (
+    'usability heuristic interface evaluation prototype stakeholder schedule budget '
+    'risk scope agile sprint feedback consistency affordance mapping constraint '
+    'visibility memory recall recognition error recovery task analysis persona'
+).split()
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    """Build a sentence of random vocabulary words"""
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def make_category(index: int) -> Dict:
+    """Build a category record"""
+    return {
+        'id': str(uuid.uuid4()),
+        'name': f'Chapter {index + 1}',
+        'description': f'Synthetic category {index + 1}',
+    }
+
+
+def make_question(rng: random.Random, category_id: str, question_type: str = 'single_choice') -> Dict:
+    """Build a question record of the given type"""
+    now = datetime.now().isoformat()
+    question = {
+        'id': str(uuid.uuid4()),
+        'question_text': make_text(rng, 12) + '?',
+        'question_type': question_type,
+        'category_id': category_id,
+        'explanation': make_text(rng, 20),
+        'points': 1,
+        'created_at': now,
+        'updated_at': now,
+    }
+    
+    if question_type in ['single_choice', 'multiple_choice']:
+        correct = {0} if question_type == 'single_choice' else {0, 2}
+        question['choices'] = [
+            {'id': str(uuid.uuid4()), 'option_text': make_text(rng, 8), 'is_correct': i in correct, 'order': i}
+            for i in range(4)
+        ]
+    elif question_type == 'matching':
+        definitions = [
+            {'id': str(uuid.uuid4()), 'right_item': make_text(rng, 4), 'order': i}
+            for i in range(5)
+        ]
+        question['matching_definitions'] = definitions
+        question['matching_pairs'] = [
+            {
+                'id': str(uuid.uuid4()),
+                'left_item': make_text(rng, 3),
+                'right_item': definitions[i]['right_item'],
+                'correct_match': i,
+                'order': i,
+            }
+            for i in range(4)
+        ]
+    return question
+
+
+def make_question_bank(rng: random.Random, size: int, num_categories: int = 10) -> Dict[str, List[Dict]]:
+    """Build categories and a mixed-type question bank of the given size"""
+    categories = [make_category(i) for i in range(num_categories)]
+    question_types = ['single_choice'] * 6 + ['multiple_choice'] * 3 + ['matching']
+    questions = [
+        make_question(rng, rng.choice(categories)['id'], rng.choice(question_types))
+        for _ in range(size)
+    ]
+    return {'categories': categories, 'questions': questions}
+
+
+def make_quiz(rng: random.Random, questions: List[Dict], size: int) -> Dict:
+    """Build a published quiz over a random sample of questions"""
+    now = datetime.now().isoformat()
+    return {
+        'id': str(uuid.uuid4()),
+        'title': f'Synthetic quiz ({size} questions)',
+        'description': '',
+        'instructions': '',
+        'time_limit': 60,
+        'is_published': True,
+        'questions': [
+            {'id': q['id'], 'text': q['question_text'], 'points': 10}
+            for q in rng.sample(questions, min(size, len(questions)))
+        ],
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def make_answers(rng: random.Random, questions: List[Dict]) -> Dict[str, Dict]:
+    """Build a submission answering every question, right or wrong at random"""
+    answers = {}
+    for question in questions:
+        if question['question_type'] == 'matching':
+            # Same shape as the quiz_take form: term index -> definition index
+            answers[question['id']] = {
+                'matching_answer': {
+                    str(i): str(p['correct_match'] if rng.random() < 0.7 else rng.randrange(5))
+                    for i, p in enumerate(question['matching_pairs'])
+                }
+            }
+        else:
+            choices = question['choices']
+            answers[question['id']] = {'selected_choices': [rng.choice(choices)['id']]}
+    return answers
+
+
+def make_attempt(rng: random.Random, quiz: Dict, questions_by_id: Dict[str, Dict]) -> Dict:
+    """Build a graded-looking attempt record for a quiz"""
+    answers = make_answers(rng, [questions_by_id[q['id']] for q in quiz['questions']])
+    graded = []
+    earned = 0
+    for q in quiz['questions']:
+        is_correct = rng.random() < 0.6
+        earned += q['points'] if is_correct else 0
+        graded.append({
+            'question_id': q['id'],
+            'user_answer': answers[q['id']],
+            'is_correct': is_correct,
+            'points_earned': q['points'] if is_correct else 0,
+        })
+    total = sum(q['points'] for q in quiz['questions'])
+    now = datetime.now().isoformat()
+    return {
+        'id': str(uuid.uuid4()),
+        'quiz_id': quiz['id'],
+        'student_name': f'Student {rng.randrange(1000)}',
+        'completed_at': now,
+        'score': earned / total * 100 if total else 0,
+        'total_points': total,
+        'earned_points': earned,
+        'answers': graded,
+        'started_at': now,
+    }
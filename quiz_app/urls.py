@@ -7,6 +7,7 @@ urlpatterns = [
     
     # Subject Management
     path('switch-subject/', views.switch_subject, name='switch_subject'),
+    path('overview/', views.overview, name='overview'),
     
     # Question Bank
     path('questions/', views.question_bank, name='question_bank'),
@@ -22,11 +23,25 @@ urlpatterns = [
     path('quizzes/<str:quiz_id>/delete/', views.quiz_delete, name='quiz_delete'),
     path('quizzes/<str:quiz_id>/take/', views.quiz_take, name='quiz_take'),
     path('quizzes/<str:quiz_id>/submit/', views.quiz_submit, name='quiz_submit'),
+    path('quizzes/<str:quiz_id>/analytics/', views.quiz_analytics, name='quiz_analytics'),
+    path('quizzes/<str:quiz_id>/export/', views.quiz_export, name='quiz_export'),
+    
+    # Question images (resized variants)
+    path('images/<str:digest>/<int:width>.<str:variant_format>', views.question_image, name='question_image'),
     
     # Results
     path('results/<str:attempt_id>/', views.quiz_results, name='quiz_results'),
     
+    # Questions API
+    path('api/questions/', views.questions_api, name='questions_api'),
+    path('api/questions/import/', views.questions_import_api, name='questions_import_api'),
+    path('api/questions/bulk/', views.questions_bulk_api, name='questions_bulk_api'),
+    path('api/search/', views.search_api, name='search_api'),
+    
     # Categories API
     path('api/categories/', views.category_list_create, name='category_list_create'),
     path('api/categories/<str:category_id>/delete/', views.category_delete, name='category_delete_api'),
+    
+    # Analytics API
+    path('api/quizzes/<str:quiz_id>/analytics/', views.quiz_analytics_api, name='quiz_analytics_api'),
 ]
@@ -1,14 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 import json
 import uuid
 import random
 from datetime import datetime
 from .storage import storage, get_storage, get_available_subjects
+from .analytics import summarize
+from .catalog import aggregate, merge_rankings
+from .generation import GENERATION_PRESETS, GenerationError, GenerationSpec, get_generator
+from .grading import valid_answers
+from .export import CONTENT_TYPES, EXPORT_FORMATS, ROW_LEVELS, export_attempts, export_filename
+from .images import (IMMUTABLE_CACHE_CONTROL, VARIANT_FORMATS, VARIANT_WIDTHS, InvalidImage, get_variant,
+                     image_sources, release_images, store_upload)
+from .importer import ImportFormatError, QuestionImporter, detect_format
+from .pagination import DEFAULT_PAGE_SIZE, page_size
+from .serialization import dumps, loads
+from .snapshot import SHUFFLE_MODES, get_snapshot
+from .submissions import enqueue_submission, queue_enabled, submission_status
 
 
 # Helper function to get current storage based on session
@@ -18,6 +28,32 @@ def get_current_storage(request):
     return get_storage(current_subject)
 
 
+def resolve_quiz_questions(subject_storage, quiz):
+    """
+    Resolve the questions of a quiz with a single storage lookup.
+    Returns (quiz entry, question data) pairs in quiz order, skipping
+    entries whose question no longer exists.
+    """
+    entries = []
+    for q in quiz.get('questions', []):
+        # Handle both 'id' and 'question_id' for backward compatibility
+        question_id = q.get('id') or q.get('question_id')
+        if question_id:
+            entries.append((q, question_id))
+    
+    questions = subject_storage.get_questions_by_ids([question_id for _, question_id in entries])
+    questions_by_id = {question['id']: question for question in questions}
+    return [(q, questions_by_id[question_id]) for q, question_id in entries if question_id in questions_by_id]
+
+
+class CodecJsonResponse(HttpResponse):
+    """A JsonResponse serialized with the storage codec (orjson when it is installed)"""
+    
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
 # Subject Management
 def switch_subject(request):
     """Switch to a different subject database"""
@@ -33,75 +69,235 @@ def switch_subject(request):
             if subject in available_subjects:
                 request.session['current_subject'] = subject
             else:
-                return JsonResponse({'success': False, 'error': 'Invalid subject'})
+                return CodecJsonResponse({'success': False, 'error': 'Invalid subject'})
         
-        return JsonResponse({'success': True})
+        return CodecJsonResponse({'success': True})
     
-    return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    return CodecJsonResponse({'success': False, 'error': 'Invalid request method'})
 
 
 # Dashboard
 def dashboard(request):
-    """Main dashboard view"""
+    """Main dashboard view, served from the subject manifests"""
     # Get current subject from session or use default
     current_subject = request.session.get('current_subject', None)
-    subject_storage = get_storage(current_subject)
+    manifest = get_storage(current_subject).get_manifest()
     
-    questions = subject_storage.get_questions()
-    quizzes = subject_storage.get_quizzes()
-    categories = subject_storage.get_categories()
-    
-    # Get available subjects
+    # Get available subjects, with their question counts for the selector
     available_subjects = get_available_subjects()
+    subject_sizes = {subject: get_storage(subject).get_manifest()['questions']
+                     for subject in [None] + available_subjects}
     
     context = {
-        'total_questions': len(questions),
-        'total_quizzes': len(quizzes),
-        'total_categories': len(categories),
+        'total_questions': manifest['questions'],
+        'total_quizzes': manifest['quizzes'],
+        'total_categories': manifest['categories'],
+        'total_attempts': manifest['attempts'],
+        'questions_by_type': manifest['questions_by_type'],
         'current_subject': current_subject or 'Default',
-        'available_subjects': available_subjects,
+        'available_subjects': [(subject, subject_sizes[subject]) for subject in available_subjects],
+        'default_size': subject_sizes[None],
     }
     return render(request, 'dashboard.html', context)
 
 
+# Cross-subject overview
+def search_all_subjects(query, limit=50):
+    """Search the question banks of every subject, returns question summaries tagged with their subject"""
+    rankings = {}
+    for subject in [None] + get_available_subjects():
+        subject_storage = get_storage(subject)
+        matches = subject_storage.get_questions({'search': query})[:limit]
+        if matches:
+            rankings[subject] = (subject_storage, matches)
+    
+    results = []
+    category_names = {}
+    for subject, question in merge_rankings({s: matches for s, (_, matches) in rankings.items()}, limit):
+        if subject not in category_names:
+            category_names[subject] = {c['id']: c.get('name', '') for c in rankings[subject][0].get_categories()}
+        results.append(dict(question_summary(question, category_names[subject]), subject=subject))
+    return results
+
+
+def overview(request):
+    """Counts and recent activity of every subject, plus a search across all question banks"""
+    manifests = {subject: get_storage(subject).get_manifest() for subject in [None] + get_available_subjects()}
+    query = request.GET.get('q', '').strip()
+    
+    context = {
+        'overview': aggregate(manifests),
+        'query': query,
+        'results': search_all_subjects(query) if query else [],
+        'current_subject': request.session.get('current_subject') or 'Default',
+    }
+    return render(request, 'overview.html', context)
+
+
+def search_api(request):
+    """API endpoint searching the question banks of every subject"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return CodecJsonResponse({'success': False, 'error': 'Missing search query'}, status=400)
+    
+    return CodecJsonResponse({'success': True, 'results': search_all_subjects(query, page_size(request.GET.get('limit', 50)))})
+
+
 # Question Bank Management
+def question_filters(request):
+    """Get the question filters of a request's category, type and search parameters"""
+    filters = {}
+    if request.GET.get('category'):
+        filters['category_id'] = request.GET['category']
+    if request.GET.get('type'):
+        filters['question_type'] = request.GET['type']
+    if request.GET.get('search'):
+        filters['search'] = request.GET['search']
+    return filters
+
+
+def question_summary(question, category_names):
+    """Get the fields of a question shown in question lists"""
+    try:
+        created_at = datetime.fromisoformat(question['created_at'])
+    except (KeyError, TypeError, ValueError):
+        created_at = None
+    return {
+        'id': question['id'],
+        'question_text': question.get('question_text', ''),
+        'question_type': question.get('question_type'),
+        'category_id': question.get('category_id'),
+        'category_name': category_names.get(question.get('category_id'), ''),
+        'points': question.get('points', 1),
+        'created_at': created_at,
+    }
+
+
 def question_bank(request):
-    """View all questions"""
+    """View the first page of questions; further pages are fetched from questions_api"""
     # Get current subject from session
     current_subject = request.session.get('current_subject', None)
     subject_storage = get_storage(current_subject)
     
-    questions = subject_storage.get_questions()
     categories = subject_storage.get_categories()
-    
-    # Apply filters if provided
-    category_filter = request.GET.get('category')
-    type_filter = request.GET.get('type')
-    search_query = request.GET.get('search')
-    
-    filters = {}
-    if category_filter:
-        filters['category_id'] = category_filter
-    if type_filter:
-        filters['question_type'] = type_filter
-    if search_query:
-        filters['search'] = search_query
-    
-    if filters:
-        questions = subject_storage.get_questions(filters)
+    page = subject_storage.get_questions_page(question_filters(request) or None)
     
     # Get available subjects
     available_subjects = get_available_subjects()
     
+    category_names = {c['id']: c.get('name', '') for c in categories}
+    
     context = {
-        'questions': questions,
+        'questions': [question_summary(q, category_names) for q in page['questions']],
+        'total_questions': page['total'],
+        'next_cursor': page['next_cursor'],
         'categories': categories,
+        'quizzes': [{'id': q['id'], 'title': q.get('title', '')} for q in subject_storage.get_quizzes()],
         'current_subject': current_subject or 'Default',
         'available_subjects': available_subjects,
     }
     return render(request, 'question_bank.html', context)
 
 
+def questions_api(request):
+    """API endpoint returning one page of questions, filtered by category, type and search"""
+    subject_storage = get_current_storage(request)
+    
+    try:
+        page = subject_storage.get_questions_page(question_filters(request) or None,
+                                                  request.GET.get('cursor'),
+                                                  page_size(request.GET.get('limit', DEFAULT_PAGE_SIZE)))
+    except ValueError as e:
+        return CodecJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    category_names = {c['id']: c.get('name', '') for c in subject_storage.get_categories()}
+    return CodecJsonResponse({
+        'success': True,
+        'questions': [question_summary(q, category_names) for q in page['questions']],
+        'total': page['total'],
+        'next_cursor': page['next_cursor'],
+    })
+
+
+BULK_ACTIONS = ('delete', 'move', 'points', 'add_to_quiz')
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def questions_bulk_api(request):
+    """
+    Apply one action to many questions with a single storage write. The
+    JSON body holds 'action' and 'question_ids', plus 'category_id' (move,
+    '' for no group), 'points' (points, optional for add_to_quiz) or
+    'quiz_id' (add_to_quiz).
+    """
+    subject_storage = get_current_storage(request)
+    
+    try:
+        data = loads(request.body)
+    except ValueError:
+        return CodecJsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    action = data.get('action')
+    question_ids = data.get('question_ids')
+    if action not in BULK_ACTIONS:
+        return CodecJsonResponse({'success': False, 'error': f'action must be one of {", ".join(BULK_ACTIONS)}'},
+                                 status=400)
+    if not isinstance(question_ids, list) or not all(isinstance(i, str) for i in question_ids):
+        return CodecJsonResponse({'success': False, 'error': 'question_ids must be a list of ids'}, status=400)
+    
+    points = data.get('points')
+    if points is not None and (not isinstance(points, int) or isinstance(points, bool) or points < 1):
+        return CodecJsonResponse({'success': False, 'error': 'points must be a positive whole number'}, status=400)
+    
+    if action == 'delete':
+        images = [q.get('image') for q in subject_storage.get_questions_by_ids(question_ids)]
+        updated = subject_storage.delete_questions(question_ids)
+        release_images(images)
+    elif action == 'move':
+        category_id = data.get('category_id') or None
+        if category_id is not None and subject_storage.get_category(category_id) is None:
+            return CodecJsonResponse({'success': False, 'error': 'Category not found'}, status=404)
+        updated = subject_storage.update_questions(question_ids, {'category_id': category_id})
+    elif action == 'points':
+        if points is None:
+            return CodecJsonResponse({'success': False, 'error': 'points is required'}, status=400)
+        updated = subject_storage.update_questions(question_ids, {'points': points})
+    else:
+        if subject_storage.get_quiz(data.get('quiz_id') or '') is None:
+            return CodecJsonResponse({'success': False, 'error': 'Quiz not found'}, status=404)
+        updated = subject_storage.add_questions_to_quiz(data['quiz_id'], question_ids, points)
+    
+    return CodecJsonResponse({'success': True, 'action': action, 'updated': updated})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def questions_import_api(request):
+    """
+    Bulk import questions from an uploaded JSON, JSONL or CSV file (field
+    'file'), or from the request body with ?format=json|jsonl|csv.
+    ?dry_run=1 only validates.
+    """
+    subject_storage = get_current_storage(request)
+    
+    upload = request.FILES.get('file')
+    if upload is not None:
+        stream = upload.file
+        file_format = request.GET.get('format') or detect_format(upload.name)
+    else:
+        stream = request
+        file_format = request.GET.get('format')
+    if file_format is None:
+        return CodecJsonResponse({'success': False, 'error': 'Unknown input format'}, status=400)
+    
+    try:
+        report = QuestionImporter(subject_storage).run(stream, file_format,
+                                                       dry_run=request.GET.get('dry_run') == '1')
+    except ImportFormatError as e:
+        return CodecJsonResponse({'success': False, 'error': str(e)}, status=400)
+    return CodecJsonResponse({'success': True, 'report': report})
+
+
 def question_create(request):
     """Create a new question"""
     subject_storage = get_current_storage(request)
@@ -126,10 +322,10 @@ def question_create(request):
         
         # Handle image upload
         if 'image' in request.FILES:
-            image_file = request.FILES['image']
-            file_name = f'question_images/{question_id}_{image_file.name}'
-            file_path = default_storage.save(file_name, ContentFile(image_file.read()))
-            question_data['image'] = file_path
+            try:
+                question_data['image'] = store_upload(request.FILES['image'])
+            except InvalidImage as e:
+                return HttpResponse(str(e), status=400)
         
         # Handle question type specific data
         question_type = question_data['question_type']
@@ -207,19 +403,24 @@ def question_edit(request, question_id):
         return render(request, 'question_editor.html', context)
     
     elif request.method == 'POST':
-        # Update question data
+        # Handle image upload first, so a rejected image leaves the question untouched
+        previous_image = question.get('image')
+        image = None
+        if 'image' in request.FILES:
+            try:
+                image = store_upload(request.FILES['image'])
+            except InvalidImage as e:
+                return HttpResponse(str(e), status=400)
+        
+        # Edit a copy: the stored record is shared with the file cache until the save succeeds
+        question = dict(question)
         question['question_text'] = request.POST.get('question_text')
         question['question_type'] = request.POST.get('question_type')
         question['category_id'] = request.POST.get('category_id')
         question['explanation'] = request.POST.get('explanation', '')
         question['points'] = int(request.POST.get('points', 1))
-        
-        # Handle image upload
-        if 'image' in request.FILES:
-            image_file = request.FILES['image']
-            file_name = f'question_images/{question_id}_{image_file.name}'
-            file_path = default_storage.save(file_name, ContentFile(image_file.read()))
-            question['image'] = file_path
+        if image is not None:
+            question['image'] = image
         
         # Handle question type specific data (similar to create)
         question_type = question['question_type']
@@ -274,6 +475,8 @@ def question_edit(request, question_id):
             question['matching_definitions'] = definitions
         
         subject_storage.save_question(question)
+        if previous_image != question.get('image'):
+            release_images([previous_image])
         return redirect('question_bank')
 
 
@@ -281,9 +484,12 @@ def question_delete(request, question_id):
     """Delete a question"""
     if request.method == 'POST':
         subject_storage = get_current_storage(request)
+        question = subject_storage.get_question(question_id)
         subject_storage.delete_question(question_id)
-        return JsonResponse({'success': True})
-    return JsonResponse({'success': False}, status=405)
+        if question:
+            release_images([question.get('image')])
+        return CodecJsonResponse({'success': True})
+    return CodecJsonResponse({'success': False}, status=405)
 
 
 # Quiz Management
@@ -303,15 +509,23 @@ def quiz_list(request):
     return render(request, 'quiz_list.html', context)
 
 
+def quiz_shuffle_mode(request):
+    """Get the posted question order mode of a quiz"""
+    shuffle = request.POST.get('shuffle', 'none')
+    return shuffle if shuffle in SHUFFLE_MODES else 'none'
+
+
 def quiz_create(request):
     """Create a new quiz"""
     subject_storage = get_current_storage(request)
     
     if request.method == 'GET':
-        questions = subject_storage.get_questions()
+        page = subject_storage.get_questions_page()
         categories = subject_storage.get_categories()
+        category_names = {c['id']: c.get('name', '') for c in categories}
         context = {
-            'questions': questions,
+            'questions': [question_summary(q, category_names) for q in page['questions']],
+            'next_cursor': page['next_cursor'],
             'categories': categories
         }
         return render(request, 'quiz_creation_interface.html', context)
@@ -330,10 +544,13 @@ def quiz_create(request):
             'instructions': request.POST.get('instructions', ''),
             'time_limit': int(request.POST.get('time_limit', 0)) if request.POST.get('time_limit') else None,
             'is_published': request.POST.get('is_published', 'false') == 'true',
+            'shuffle': quiz_shuffle_mode(request),
             'questions': selected_questions  # List of {question_id, order, points}
         }
         
         subject_storage.save_quiz(quiz_data)
+        # Compile the quiz page now rather than on the first student's request
+        get_snapshot(subject_storage, quiz_id)
         return redirect('quiz_list')
 
 
@@ -346,24 +563,23 @@ def quiz_edit(request, quiz_id):
         return HttpResponse('Quiz not found', status=404)
     
     if request.method == 'GET':
-        questions = subject_storage.get_questions()
+        page = subject_storage.get_questions_page()
         categories = subject_storage.get_categories()
+        category_names = {c['id']: c.get('name', '') for c in categories}
         
         # Get full question data for questions in this quiz
         quiz_questions = []
-        for q in quiz.get('questions', []):
-            # Handle both 'id' and 'question_id' for backward compatibility
-            question_id = q.get('id') or q.get('question_id')
-            if question_id:
-                question_data = subject_storage.get_question(question_id)
-                if question_data:
-                    question_data['quiz_points'] = q.get('points', 1)
-                    question_data['quiz_order'] = q.get('order', 0)
-                    quiz_questions.append(question_data)
+        for q, question_data in resolve_quiz_questions(subject_storage, quiz):
+            # Copy before annotating: storage records are shared
+            question_data = dict(question_data)
+            question_data['quiz_points'] = q.get('points', 1)
+            question_data['quiz_order'] = q.get('order', 0)
+            quiz_questions.append(question_data)
         
         context = {
             'quiz': quiz,
-            'questions': questions,
+            'questions': [question_summary(q, category_names) for q in page['questions']],
+            'next_cursor': page['next_cursor'],
             'categories': categories,
             'quiz_questions': quiz_questions,
             'is_edit': True
@@ -375,14 +591,18 @@ def quiz_edit(request, quiz_id):
         selected_questions_json = request.POST.get('selected_questions', '[]')
         selected_questions = json.loads(selected_questions_json)
         
+        # Edit a copy: the stored record is shared with the file cache until the save succeeds
+        quiz = dict(quiz)
         quiz['title'] = request.POST.get('title')
         quiz['description'] = request.POST.get('description', '')
         quiz['instructions'] = request.POST.get('instructions', '')
         quiz['time_limit'] = int(request.POST.get('time_limit', 0)) if request.POST.get('time_limit') else None
         quiz['is_published'] = request.POST.get('is_published', 'false') == 'true'
+        quiz['shuffle'] = quiz_shuffle_mode(request)
         quiz['questions'] = selected_questions
         
         subject_storage.save_quiz(quiz)
+        get_snapshot(subject_storage, quiz_id)
         return redirect('quiz_list')
 
 
@@ -391,211 +611,220 @@ def quiz_delete(request, quiz_id):
     if request.method == 'POST':
         subject_storage = get_current_storage(request)
         subject_storage.delete_quiz(quiz_id)
-        return JsonResponse({'success': True})
-    return JsonResponse({'success': False}, status=405)
+        return CodecJsonResponse({'success': True})
+    return CodecJsonResponse({'success': False}, status=405)
 
 
 def quiz_generate(request):
-    """Auto-generate a quiz from question bank"""
+    """
+    Auto-generate quizzes from the question bank: one, or several exam
+    variants in one call, meeting the constraints of the request (see
+    generation.GenerationSpec)
+    """
     if request.method != 'POST':
-        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+        return CodecJsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
     
     subject_storage = get_current_storage(request)
     
     try:
-        data = json.loads(request.body)
+        data = loads(request.body)
         generation_type = data.get('generation_type', 'random')
         quiz_title = data.get('title', 'Auto-Generated Quiz')
-        
-        all_questions = subject_storage.get_questions()
-        
-        if not all_questions:
-            return JsonResponse({'success': False, 'error': 'No questions available in question bank'})
-        
-        selected_questions = []
-        
-        if generation_type == 'random':
-            # Random selection: Select 50 questions randomly
-            num_to_select = min(50, len(all_questions))
-            random_questions = random.sample(all_questions, num_to_select)
+        # The same seed picks the same questions from the same bank
+        seed = data.get('seed')
+        if not isinstance(seed, int) or isinstance(seed, bool):
+            seed = random.randrange(2 ** 32)
+        rng = random.Random(seed)
+        
+        if generation_type not in GENERATION_PRESETS:
+            return CodecJsonResponse({'success': False, 'error': f'Unknown generation type: {generation_type}'},
+                                     status=400)
+        try:
+            spec = GenerationSpec.from_dict(dict(GENERATION_PRESETS[generation_type], **data))
+            variants = get_generator(subject_storage).generate(spec, rng)
+        except GenerationError as e:
+            return CodecJsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        question_ids = list(dict.fromkeys(question_id for selection in variants for question_id, _ in selection))
+        texts = {q['id']: q.get('question_text', '') for q in subject_storage.get_questions_by_ids(question_ids)}
+        
+        # Create the new quizzes
+        quizzes = []
+        for number, selection in enumerate(variants, 1):
             selected_questions = [
-                {
-                    'id': q['id'],
-                    'text': q['question_text'],
-                    'points': 10
-                }
-                for q in random_questions
+                {'id': question_id, 'text': texts.get(question_id, ''), 'points': points}
+                for question_id, points in selection
             ]
+            quizzes.append({
+                'id': str(uuid.uuid4()),
+                'title': quiz_title if len(variants) == 1 else f'{quiz_title} (Variant {number})',
+                'description': f'Auto-generated quiz with {len(selected_questions)} questions',
+                'instructions': 'Please answer all questions to the best of your ability.',
+                'time_limit': 60,
+                'is_published': False,
+                'generation_seed': seed,
+                'questions': selected_questions,
+                'created_at': datetime.now().isoformat(),
+                'updated_at': datetime.now().isoformat()
+            })
         
-        elif generation_type == 'category':
-            # Category balanced: Select 5 questions from each category
-            categories = subject_storage.get_categories()
-            questions_by_category = {}
-            
-            # Group questions by category
-            for q in all_questions:
-                cat_id = q.get('category_id')
-                if cat_id:
-                    if cat_id not in questions_by_category:
-                        questions_by_category[cat_id] = []
-                    questions_by_category[cat_id].append(q)
-            
-            # Select 5 from each category
-            for cat_id, questions in questions_by_category.items():
-                num_to_select = min(5, len(questions))
-                random_from_category = random.sample(questions, num_to_select)
-                for q in random_from_category:
-                    selected_questions.append({
-                        'id': q['id'],
-                        'text': q['question_text'],
-                        'points': 10
-                    })
-        
-        if not selected_questions:
-            return JsonResponse({'success': False, 'error': 'Could not generate quiz with selected criteria'})
-        
-        # Create new quiz
-        quiz_id = str(uuid.uuid4())
-        quiz_data = {
-            'id': quiz_id,
-            'title': quiz_title,
-            'description': f'Auto-generated quiz with {len(selected_questions)} questions',
-            'instructions': 'Please answer all questions to the best of your ability.',
-            'time_limit': 60,
-            'is_published': False,
-            'questions': selected_questions,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
-        
-        subject_storage.save_quiz(quiz_data)
+        # One write for all variants
+        subject_storage.save_quizzes(quizzes)
         
-        return JsonResponse({
+        return CodecJsonResponse({
             'success': True,
-            'quiz_id': quiz_id,
-            'num_questions': len(selected_questions)
+            'quiz_id': quizzes[0]['id'],
+            'quiz_ids': [quiz['id'] for quiz in quizzes],
+            'num_questions': len(quizzes[0]['questions']),
+            'seed': seed
         })
     
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)})
+        return CodecJsonResponse({'success': False, 'error': str(e)})
 
 
 # Taking Quiz
 def quiz_take(request, quiz_id):
-    """Take a quiz"""
+    """Take a quiz, rendered from its compiled snapshot"""
     subject_storage = get_current_storage(request)
     
-    quiz = subject_storage.get_quiz(quiz_id)
-    if not quiz:
+    snapshot = get_snapshot(subject_storage, quiz_id)
+    if snapshot is None:
         return HttpResponse('Quiz not found', status=404)
     
-    # Get full question data
-    quiz_questions = []
-    for q in quiz.get('questions', []):
-        # Handle both 'id' and 'question_id' for backward compatibility
-        question_id = q.get('id') or q.get('question_id')
-        if question_id:
-            question_data = subject_storage.get_question(question_id)
-            if question_data:
-                # Create a structure matching template expectations
-                quiz_questions.append({
-                    'question': question_data,
-                    'points': q.get('points', 1)
-                })
-    
+    # The attempt id is chosen now: it seeds this student's question order
+    attempt_id = str(uuid.uuid4())
     context = {
-        'quiz': quiz,
-        'quiz_questions': quiz_questions
+        'quiz': snapshot.quiz,
+        'questions_html': snapshot.render(attempt_id),
+        'question_count': len(snapshot.questions),
+        'attempt_id': attempt_id,
     }
     return render(request, 'quiz_take.html', context)
 
 
 def quiz_submit(request, quiz_id):
-    """Submit quiz answers"""
+    """
+    Submit quiz answers: graded and saved now, or queued for the submission
+    worker when QUIZ_SUBMISSION_QUEUE is enabled (see submissions.py)
+    """
     if request.method != 'POST':
-        return JsonResponse({'success': False}, status=405)
+        return CodecJsonResponse({'success': False}, status=405)
     
     subject_storage = get_current_storage(request)
     
-    quiz = subject_storage.get_quiz(quiz_id)
-    if not quiz:
-        return JsonResponse({'success': False, 'error': 'Quiz not found'}, status=404)
+    # Compiled once per quiz version, so grading needs no further storage access
+    answer_key = subject_storage.get_answer_key(quiz_id)
+    if answer_key is None:
+        return CodecJsonResponse({'success': False, 'error': 'Quiz not found'}, status=404)
     
-    # Create attempt
-    attempt_id = str(uuid.uuid4())
+    # Use the attempt id of the quiz page, which seeded the order the questions were shown in
+    try:
+        attempt_id = str(uuid.UUID(request.POST.get('attempt_id', '')))
+    except ValueError:
+        attempt_id = str(uuid.uuid4())
+    else:
+        if subject_storage.get_attempt(attempt_id) is not None or submission_status(attempt_id) is not None:
+            return CodecJsonResponse({'success': False, 'error': 'This attempt was already submitted'}, status=409)
     
     # Parse answers from request
     answers_json = request.POST.get('answers', '{}')
-    answers = json.loads(answers_json)
+    try:
+        answers = loads(answers_json)
+    except ValueError:
+        answers = None
+    if not valid_answers(answers):
+        return CodecJsonResponse({'success': False, 'error': 'Invalid answers'}, status=400)
+    student_name = request.POST.get('student_name', 'Anonymous')
+    completed_at = datetime.now().isoformat()
+    
+    if queue_enabled():
+        # Graded and saved by the worker; the results page shows it as pending until then
+        payload = {'student_name': student_name, 'answers': answers, 'completed_at': completed_at}
+        if not enqueue_submission(subject_storage.subject, quiz_id, attempt_id, payload):
+            return CodecJsonResponse({'success': False, 'error': 'This attempt was already submitted'}, status=409)
+        return CodecJsonResponse({'success': True, 'attempt_id': attempt_id, 'pending': True}, status=202)
+    
+    # Grade the quiz and save the attempt
+    attempt_data = answer_key.attempt(attempt_id, answers, student_name, completed_at)
+    subject_storage.save_attempt(attempt_data)
     
-    # Grade the quiz
-    total_points = 0
-    earned_points = 0
-    graded_answers = []
+    return CodecJsonResponse({
+        'success': True,
+        'attempt_id': attempt_id,
+        'score': attempt_data['score']
+    })
+
+
+def quiz_report(subject_storage, quiz):
+    """Build the analytics report of a quiz from its running aggregates"""
+    questions = [question_data for _, question_data in resolve_quiz_questions(subject_storage, quiz)]
+    return summarize(subject_storage.get_quiz_stats(quiz['id']), quiz, questions)
+
+
+def quiz_analytics(request, quiz_id):
+    """Show score statistics, question difficulty and choice frequencies of a quiz"""
+    subject_storage = get_current_storage(request)
     
-    for q in quiz.get('questions', []):
-        # Handle both 'id' and 'question_id' for backward compatibility
-        question_id = q.get('id') or q.get('question_id')
-        if not question_id:
-            continue
-            
-        question_data = subject_storage.get_question(question_id)
-        if not question_data:
-            continue
-        
-        points = q.get('points', 1)
-        total_points += points
-        
-        user_answer = answers.get(question_id, {})
-        is_correct = False
-        
-        # Check answer based on question type
-        if question_data['question_type'] in ['single_choice', 'multiple_choice']:
-            correct_choices = [c['id'] for c in question_data.get('choices', []) if c['is_correct']]
-            selected_choices = user_answer.get('selected_choices', [])
-            
-            if question_data['question_type'] == 'single_choice':
-                is_correct = len(selected_choices) == 1 and selected_choices[0] in correct_choices
-            else:  # multiple_choice
-                is_correct = set(selected_choices) == set(correct_choices)
-        
-        elif question_data['question_type'] == 'matching':
-            correct_pairs = {p['left_item']: p['right_item'] for p in question_data.get('matching_pairs', [])}
-            user_pairs = user_answer.get('matching_answer', {})
-            is_correct = correct_pairs == user_pairs
-        
-        if is_correct:
-            earned_points += points
-        
-        graded_answers.append({
-            'question_id': question_id,
-            'user_answer': user_answer,
-            'is_correct': is_correct,
-            'points_earned': points if is_correct else 0
-        })
+    quiz = subject_storage.get_quiz(quiz_id)
+    if not quiz:
+        return HttpResponse('Quiz not found', status=404)
     
-    # Calculate score percentage
-    score = (earned_points / total_points * 100) if total_points > 0 else 0
-    
-    # Save attempt
-    attempt_data = {
-        'id': attempt_id,
-        'quiz_id': quiz_id,
-        'student_name': request.POST.get('student_name', 'Anonymous'),
-        'completed_at': datetime.now().isoformat(),
-        'score': score,
-        'total_points': total_points,
-        'earned_points': earned_points,
-        'answers': graded_answers
+    context = {
+        'quiz': quiz,
+        'report': quiz_report(subject_storage, quiz)
     }
+    return render(request, 'quiz_analytics.html', context)
+
+
+def quiz_analytics_api(request, quiz_id):
+    """API endpoint returning the analytics report of a quiz"""
+    subject_storage = get_current_storage(request)
     
-    subject_storage.save_attempt(attempt_data)
+    quiz = subject_storage.get_quiz(quiz_id)
+    if not quiz:
+        return CodecJsonResponse({'success': False, 'error': 'Quiz not found'}, status=404)
     
-    return JsonResponse({
-        'success': True,
-        'attempt_id': attempt_id,
-        'score': score
-    })
+    return CodecJsonResponse({'success': True, 'analytics': quiz_report(subject_storage, quiz)})
+
+
+def quiz_export(request, quiz_id):
+    """
+    Download the attempts of a quiz as CSV or JSON Lines
+    (?format=csv|jsonl, ?rows=attempts|answers), streamed row by row
+    """
+    subject_storage = get_current_storage(request)
+    
+    quiz = subject_storage.get_quiz(quiz_id)
+    if not quiz:
+        return HttpResponse('Quiz not found', status=404)
+    
+    file_format = request.GET.get('format', 'csv')
+    level = request.GET.get('rows', 'attempts')
+    if file_format not in EXPORT_FORMATS or level not in ROW_LEVELS:
+        return HttpResponse('Invalid export format or rows', status=400)
+    
+    response = StreamingHttpResponse(export_attempts(subject_storage, quiz, level, file_format),
+                                     content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(quiz, level, file_format)}"'
+    return response
+
+
+def question_image(request, digest, width, variant_format):
+    """
+    Serve a resized variant of a question image. The URL names the content
+    (by digest), so the response can be cached for good.
+    """
+    if width not in VARIANT_WIDTHS or variant_format not in VARIANT_FORMATS:
+        raise Http404('Unknown image variant')
+    path = get_variant(digest, width, variant_format)
+    if path is None:
+        raise Http404('Image not found')
+    
+    response = FileResponse(open(path, 'rb'), content_type=VARIANT_FORMATS[variant_format][1])
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response['ETag'] = f'"{digest[:16]}-{width}-{variant_format}"'
+    return response
 
 
 def quiz_results(request, attempt_id):
@@ -604,7 +833,15 @@ def quiz_results(request, attempt_id):
     
     attempt = subject_storage.get_attempt(attempt_id)
     if not attempt:
-        return HttpResponse('Attempt not found', status=404)
+        submission = submission_status(attempt_id)
+        if submission is None:
+            return HttpResponse('Attempt not found', status=404)
+        # Still queued: the page reloads itself until the attempt is saved
+        return render(request, 'quiz_results_pending.html', {
+            'attempt_id': attempt_id,
+            'submission': submission,
+            'quiz': subject_storage.get_quiz(submission['quiz_id']),
+        }, status=202 if submission['status'] == 'pending' else 200)
     
     quiz = subject_storage.get_quiz(attempt['quiz_id'])
     
@@ -615,12 +852,18 @@ def quiz_results(request, attempt_id):
         if question_id:
             question_points_map[question_id] = q.get('points', 1)
     
-    # Get full question data with answers
+    # Get full question data with answers, resolving all questions in one lookup
+    attempt_answers = attempt.get('answers', [])
+    questions_by_id = {
+        question['id']: question
+        for question in subject_storage.get_questions_by_ids([a['question_id'] for a in attempt_answers])
+    }
+    
     answers = []
     correct_count = 0
-    for answer_data in attempt.get('answers', []):
+    for answer_data in attempt_answers:
         question_id = answer_data['question_id']
-        question_data = subject_storage.get_question(question_id)
+        question_data = questions_by_id.get(question_id)
         if question_data:
             is_correct = answer_data.get('is_correct', False)
             if is_correct:
@@ -662,11 +905,12 @@ def quiz_results(request, attempt_id):
             elif question_data['question_type'] == 'short_answer':
                 user_answer_text = user_answer_data.get('answer', 'Not answered')
             
-            # Add question with points from quiz
-            question_data['points'] = question_points
+            # Add question with points from quiz (on a copy, storage records are shared)
+            question_data = dict(question_data, points=question_points)
             
             answers.append({
                 'question': question_data,
+                'image': image_sources(question_data.get('image')),
                 'user_answer': user_answer_text,
                 'user_answer_ids': user_answer_ids,
                 'user_matching': user_matching,
@@ -677,6 +921,13 @@ def quiz_results(request, attempt_id):
     
     total_questions = len(answers)
     
+    # Show the answers in the order the questions were asked
+    snapshot = get_snapshot(subject_storage, attempt['quiz_id'])
+    if snapshot is not None and snapshot.shuffle != 'none':
+        positions = {snapshot.questions[index]['question']['id']: position
+                     for position, index in enumerate(snapshot.question_order(attempt['id']))}
+        answers.sort(key=lambda answer: positions.get(answer['question']['id'], len(positions)))
+    
     context = {
         'attempt': attempt,
         'quiz': quiz,
@@ -728,10 +979,10 @@ def category_list_create(request):
     
     if request.method == 'GET':
         categories = subject_storage.get_categories()
-        return JsonResponse({'categories': categories})
+        return CodecJsonResponse({'categories': categories})
     
     elif request.method == 'POST':
-        data = json.loads(request.body)
+        data = loads(request.body)
         category_id = str(uuid.uuid4())
         
         category_data = {
@@ -741,7 +992,7 @@ def category_list_create(request):
         }
         
         subject_storage.save_category(category_data)
-        return JsonResponse({'success': True, 'category': category_data})
+        return CodecJsonResponse({'success': True, 'category': category_data})
 
 
 @csrf_exempt
@@ -750,4 +1001,4 @@ def category_delete(request, category_id):
     """Delete a category"""
     subject_storage = get_current_storage(request)
     subject_storage.delete_category(category_id)
-    return JsonResponse({'success': True})
+    return CodecJsonResponse({'success': True})
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_system.settings')
+# Tells quiz_app that this process serves requests (see QuizAppConfig.serves_requests)
+os.environ.setdefault('QUIZ_SERVER_PROCESS', '1')
 
 application = get_asgi_application()
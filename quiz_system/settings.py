@@ -125,3 +125,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # JSON Storage Directory
 JSON_STORAGE_DIR = BASE_DIR / 'data'
+
+# Attempts are appended to data/<subject>/attempts.log.jsonl and folded into
+# attempts.json once the log holds this many attempts
+QUIZ_ATTEMPT_LOG_COMPACT_AT = 500
+
+# Queue submissions at deadlines: quiz_submit stores each submission in a SQLite
+# spool and answers at once, and a background worker grades and saves them in
+# batches (see quiz_app/submissions.py). The spool defaults to
+# data/submissions.sqlite3; set QUIZ_SUBMISSION_SPOOL to put it elsewhere
+QUIZ_SUBMISSION_QUEUE = False
+QUIZ_SUBMISSION_SPOOL = None
+
+# Storage engine behind get_storage(): JSON files under JSON_STORAGE_DIR, or the
+# database through the ORM ('quiz_app.orm_storage.ORMStorage'; load existing
+# data with 'python manage.py import_json_storage')
+QUIZ_STORAGE_BACKEND = 'quiz_app.storage.JSONStorage'
+
+# On-disk format of the JSON storage files: 'json' (indented, git-friendly),
+# 'compact' (no whitespace, matching definitions stored once) or 'msgpack'
+# (needs the msgpack package). Files in any format are read; convert existing
+# files with 'python manage.py convert_storage'
+QUIZ_STORAGE_FORMAT = 'json'
+
+# Subjects whose data is loaded into memory in the background when a server
+# process starts, e.g. ['*'] ('default' is the root data folder, '*' every subject)
+QUIZ_WARM_UP_SUBJECTS = []